@@ -12,6 +12,6 @@ import hac
 
 
 if __name__ == '__main__':
-    from hac.core import main
+    from hac.server import main
     sys.exit(main())
 
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Copyright (C) 2014-2015  Zoran Plesivčak <z@plesiv.com>
+# This software is distributed under the terms of the GNU GPL version 2.
+
+"""Benchmark of runner discovery (templating) for growing number of runner
+templating parts. Invoke as 'python bench/bench_runners.py'.
+
+Synthetic runner directory contains TEMPLATES runner templates and, for every
+template, LANGS * PARTS templating parts.
+"""
+import os
+import sys
+import shutil
+import tempfile
+import timeit
+from os.path import dirname, realpath
+
+sys.path.insert(0, dirname(dirname(realpath(__file__))))
+
+from hac.util_data import _plugin_discover_runners
+
+
+# (TEMPLATES, LANGS, PARTS)
+SIZES = [
+    (1, 10, 10),
+    (5, 10, 10),
+    (10, 10, 10),
+    (20, 10, 10),
+]
+
+REPEAT = 5
+
+
+def make_runners(cdir, templates, langs, parts):
+    """Creates synthetic runner templates and templating parts in cdir.
+    """
+    for prio in range(templates):
+        with open(os.path.join(cdir, "temp.{0}.sh".format(prio)), 'w') as f:
+            f.write("#!/bin/sh\n")
+            for part in range(parts):
+                f.write("    $part{0}\n".format(part))
+
+        for lang in range(langs):
+            for part in range(parts):
+                fname = "lang{0}.part{1}.{2}.sh".format(lang, part, prio)
+                with open(os.path.join(cdir, fname), 'w') as f:
+                    f.write("echo {0}\necho {1}\n".format(lang, part))
+
+
+def main():
+    print("{0:>10} {1:>10} {2:>12}".format("templates", "part files",
+                                             "time [ms]"))
+    for templates, langs, parts in SIZES:
+        cdir = tempfile.mkdtemp()
+        try:
+            make_runners(cdir, templates, langs, parts)
+            timer = timeit.Timer(lambda: _plugin_discover_runners([cdir]))
+            best = min(timer.repeat(repeat=REPEAT, number=1))
+        finally:
+            shutil.rmtree(cdir)
+
+        print("{0:>10} {1:>10} {2:>12.2f}".format(templates,
+                                                  templates * langs * parts,
+                                                  best * 1000))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
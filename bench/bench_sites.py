@@ -0,0 +1,262 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Copyright (C) 2014-2015  Zoran Plesivčak <z@plesiv.com>
+# This software is distributed under the terms of the GNU GPL version 2.
+
+"""Benchmark of site processors (without network access). Invoke as
+'python bench/bench_sites.py [--save] [--tolerance=FRACTION] [--latency=MS]
+[--jobs=N]'.
+
+Synthetic pages from "bench/fixtures" (see "bench/fixtures/README") are served
+by the transport adapter mounted on the HTTP session instead of the web-sites.
+For every site and contest size (number of problems) following is measured:
+    - fetch+parse: contest and problems fetched and parsed by the site
+      processor,
+    - prep: whole "prep" command (configuration, fetching, parsing and
+      preparation of the files in the temporary working directory).
+
+Results are compared with the baseline "bench/baseline_sites.json" and the ones
+slower by more than the tolerance are reported as regressions (exit status is
+non-zero then). Timings depend on the machine, so the baseline isn't versioned:
+save it locally with "--save" (e.g. before the change that is benchmarked).
+"""
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import timeit
+from os.path import dirname, join, realpath
+
+DIR_ROOT = dirname(dirname(realpath(__file__)))
+DIR_FIXTURES = join(DIR_ROOT, "bench", "fixtures")
+DIR_SITES = join(DIR_ROOT, "hac", "config", "site")
+FILE_BASELINE = join(DIR_ROOT, "bench", "baseline_sites.json")
+
+# User's configuration (and cache) is kept in the temporary directory.
+DIR_CONFIG = tempfile.mkdtemp()
+os.environ['HAC_CONFIG_DIR'] = DIR_CONFIG
+
+sys.path.insert(0, DIR_ROOT)
+
+import requests
+
+import hac.util_data
+from hac.core import main as hac_main, _contest_fetch
+from hac.util_data import _plugin_load_module, RequestsCache
+
+
+# (URL pattern, fixture page)
+ROUTES = [
+    (r"codeforces\.com/api/contest\.standings\?contestId=\d+",
+     "codeforces-api-standings.json"),
+    (r"codeforces\.com/contest/\d+$", "codeforces-contest.html"),
+    (r"codeforces\.com/contest/\d+/problem/\w+$", "codeforces-problem.html"),
+    (r"codechef\.com/api/contests/\w+$", "codechef-api-contest.json"),
+    (r"codechef\.com/api/contests/\w+/problems/\w+$",
+     "codechef-api-problem.json"),
+    (r"spoj\.com/problems/\w+$", "spoj-problem.html"),
+    (r"rosalind\.info/problems/\w+/$", "rosalind-problem.html"),
+]
+
+_ids_codechef = ["SUBINC", "WDTBAM", "TIMEASR", "KSPHERES", "ADTRI",
+                 "CHEFSTLT", "CHEFKEY", "BWKNIGHT", "SEAGM", "CHEFPATH"]
+_ids_archive = ["p" + c for c in "abcdefghij"]
+
+# (site, location, problems for every contest size)
+SITES = [
+    ("codeforces", "http://codeforces.com/contest/512",
+     [["A"], ["A", "B", "C"], ["A", "B", "C", "D", "E", "F"]]),
+    ("codechef", "https://www.codechef.com/LTIME22",
+     [_ids_codechef[:1], _ids_codechef[:5], _ids_codechef]),
+    ("spoj", "http://www.spoj.com",
+     [_ids_archive[:1], _ids_archive[:5], _ids_archive]),
+    ("rosalind", "http://rosalind.info",
+     [_ids_archive[:1], _ids_archive[:5], _ids_archive]),
+]
+
+# Every measurement is the best of REPEAT averages of NUMBER runs.
+REPEAT = 5
+NUMBER = 5
+
+
+class FixtureAdapter(requests.adapters.BaseAdapter):
+    """Transport adapter which serves synthetic pages (after "latency"
+    seconds) instead of fetching them from the web.
+    """
+
+    # Synthetic pages (loaded once): [(URL pattern, content type, page)].
+    pages = []
+
+    # Content types by the extension of the synthetic page.
+    content_types = {
+        '.html': 'text/html; charset=utf-8',
+        '.json': 'application/json;charset=UTF-8',
+    }
+
+    def __init__(self, latency=0):
+        super(FixtureAdapter, self).__init__()
+        self.latency = latency
+        if not FixtureAdapter.pages:
+            for pattern, fixture in ROUTES:
+                content_type = FixtureAdapter.content_types[
+                                   os.path.splitext(fixture)[1]]
+                with open(join(DIR_FIXTURES, fixture), 'rb') as f:
+                    FixtureAdapter.pages.append((re.compile(pattern),
+                                                 content_type, f.read()))
+
+    def send(self, request, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        response = requests.models.Response()
+        response.request = request
+        response.url = request.url
+        response.connection = self
+        response.status_code = 404
+        response._content = b''
+        for pattern, content_type, body in FixtureAdapter.pages:
+            if pattern.search(request.url):
+                response.status_code = 200
+                response.headers['content-type'] = content_type
+                response._content = body
+        response.encoding = requests.utils.get_encoding_from_headers(
+                                response.headers)
+        return response
+
+    def close(self):
+        pass
+
+
+def fixture_session(latency=0):
+    """Creates HTTP session which serves saved pages.
+    """
+    session = requests.Session()
+    adapter = FixtureAdapter(latency)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+class _Quiet(object):
+    """Suppresses standard output (site processors print their info).
+    """
+
+    def __enter__(self):
+        self.stdout = sys.stdout
+        sys.stdout = open(os.devnull, 'w')
+
+    def __exit__(self, *exc):
+        sys.stdout.close()
+        sys.stdout = self.stdout
+
+
+def bench_fetch(site, location, problems, jobs, latency):
+    """Fetches contest and problems with the site processor.
+    """
+    site._proxy = RequestsCache(session=fixture_session(latency))
+    conf = {'location': location, 'problems': problems, 'jobs': jobs}
+    with _Quiet():
+        contest, probs = _contest_fetch(site, conf)
+    assert len(probs) == len(problems), \
+           "{0}: {1} problems fetched".format(site.id, len(probs))
+    assert all(p.inputs and len(p.inputs) == len(p.outputs) for p in probs), \
+           "{0}: samples not extracted".format(site.id)
+
+
+def bench_prep(site, location, problems, jobs):
+    """Runs the whole "prep" command in the temporary working directory.
+    """
+    dir_working = tempfile.mkdtemp()
+    try:
+        args = ['--workdir=' + dir_working, '--jobs=' + str(jobs),
+                '--cache-size=0', '--rate-limit=' + site.id + ':0',
+                'prep', location] + problems
+        with _Quiet():
+            status = hac_main(args)
+        infos = [f for _, _, files in os.walk(dir_working) for f in files
+                 if f.endswith(os.extsep + "json")]
+        assert not status and len(infos) == len(problems), \
+               "{0}: prep failed".format(site.id)
+    finally:
+        shutil.rmtree(dir_working)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="bench_sites.py")
+    parser.add_argument("--save", action="store_true",
+                        help="save results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.5,
+                        help="allowed slowdown (fraction of the baseline)")
+    parser.add_argument("--latency", type=float, default=0,
+                        help="simulated latency of requests (milliseconds)")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="concurrent requests")
+    args = parser.parse_args()
+
+    latency = args.latency / 1000.0
+    session = hac.util_data.requests_session
+    hac.util_data.requests_session = lambda *a, **kw: \
+                                         fixture_session(latency)
+
+    baseline = {}
+    if os.path.exists(FILE_BASELINE) and not args.save:
+        with open(FILE_BASELINE) as f:
+            baseline = json.load(f)
+    elif not args.save:
+        print('No baseline "' + FILE_BASELINE + '" (save it with "--save"), '
+              'results are not compared.')
+
+    results = {}
+    regressions = []
+    print("{0:>12} {1:>9} {2:>18} {3:>18}".format("site", "problems",
+                                                  "fetch+parse [ms]",
+                                                  "prep [ms]"))
+    try:
+        for site_id, location, sizes in SITES:
+            site = _plugin_load_module(join(DIR_SITES, site_id +
+                                            os.extsep + "py"))[0]
+            for problems in sizes:
+                key = "{0}/{1}".format(site_id, len(problems))
+                times = {}
+                for phase, bench in (
+                    ("fetch", lambda: bench_fetch(site, location, problems,
+                                                  args.jobs, latency)),
+                    ("prep", lambda: bench_prep(site, location, problems,
+                                                args.jobs))):
+                    timer = timeit.Timer(bench)
+                    times[phase] = min(timer.repeat(repeat=REPEAT,
+                                                    number=NUMBER)) * \
+                                   1000 / NUMBER
+                results[key] = times
+
+                cols = []
+                for phase in ("fetch", "prep"):
+                    col = "{0:.1f}".format(times[phase])
+                    if phase in baseline.get(key, {}):
+                        ratio = times[phase] / baseline[key][phase]
+                        col += " ({0:+.0%})".format(ratio - 1)
+                        if ratio > 1 + args.tolerance:
+                            regressions.append((key, phase, ratio))
+                    cols.append(col)
+                print("{0:>12} {1:>9} {2:>18} {3:>18}".format(
+                      site_id, len(problems), *cols))
+    finally:
+        hac.util_data.requests_session = session
+        shutil.rmtree(DIR_CONFIG)
+
+    if args.save:
+        with open(FILE_BASELINE, 'w') as f:
+            json.dump(results, f, indent=4, sort_keys=True)
+        print('Baseline saved to "' + FILE_BASELINE + '".')
+
+    for key, phase, ratio in regressions:
+        print("REGRESSION: {0} ({1}) is {2:.0%} slower than the baseline!"
+              .format(key, phase, ratio - 1))
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Copyright (C) 2014-2015  Zoran Plesivčak <z@plesiv.com>
+# This software is distributed under the terms of the GNU GPL version 2.
+
+"""Benchmark of HTML extraction by site processors. Invoke as
+'python bench/bench_xpath.py'.
+
+Synthetic pages from "bench/fixtures" (see "bench/fixtures/README") are
+processed as:
+    - before: page decoded to text (with encoding detection if the HTTP
+      headers don't give one), parsed and queried with XPath strings (as
+      the site processors used to do),
+    - after: page parsed from bytes with "html_tree" and queried with
+      precompiled XPath selectors of the site processor.
+"""
+import os
+import sys
+import timeit
+from os.path import dirname, join, realpath
+
+sys.path.insert(0, dirname(dirname(realpath(__file__))))
+
+import requests
+from lxml import html
+
+from hac.util_data import _plugin_load_module, html_tree
+
+
+DIR_ROOT = dirname(dirname(realpath(__file__)))
+DIR_FIXTURES = join(DIR_ROOT, "bench", "fixtures")
+DIR_SITES = join(DIR_ROOT, "hac", "config", "site")
+
+# (site, fixture page, {selector: XPath string used before})
+PAGES = [
+    ("codeforces", "codeforces-contest.html", {
+        "xpath_contest_name": '//*[@id="sidebar"]'
+                              '//a[contains(@href, "contest")]/text()',
+        "xpath_problem_ids": '//*[@id="pageContent"]'
+                             '//*[@class="id"]//a/text()',
+    }),
+    ("codeforces", "codeforces-problem.html", {
+        "xpath_problem_name": '//*[@id="pageContent"]//*[@class="header"]'
+                              '//*[@class="title"]/text()',
+        "xpath_problem_time": '//*[@id="pageContent"]'
+                              '//*[@class="time-limit"]/text()',
+        "xpath_problem_memory": '//*[@id="pageContent"]'
+                                '//*[@class="memory-limit"]/text()',
+        "xpath_problem_ins": '//*[@id="pageContent"]'
+                             '//*[@class="sample-tests"]'
+                             '//*[@class="input"]//pre',
+        "xpath_problem_outs": '//*[@id="pageContent"]'
+                              '//*[@class="sample-tests"]'
+                              '//*[@class="output"]//pre',
+    }),
+]
+
+# Content types of the responses (with and without the charset).
+CONTENT_TYPES = ["text/html;charset=UTF-8", "text/html"]
+
+REPEAT = 5
+NUMBER = 20
+
+
+def make_page(fixture, content_type):
+    """Creates response object with the synthetic page.
+    """
+    page = requests.models.Response()
+    page.status_code = 200
+    page.headers = requests.structures.CaseInsensitiveDict(
+                        {'content-type': content_type})
+    page.encoding = requests.utils.get_encoding_from_headers(page.headers)
+    with open(join(DIR_FIXTURES, fixture), 'rb') as f:
+        page._content = f.read()
+    return page
+
+
+def extract_before(page, selectors):
+    """Extracts data the way site processors used to.
+    """
+    # Decoded text is cached by response objects, start afresh every time.
+    page.encoding = requests.utils.get_encoding_from_headers(page.headers)
+    if 'charset' not in page.headers['content-type']:
+        page.encoding = None
+    t = html.fromstring(page.text)
+    return [t.xpath(s) for s in selectors]
+
+
+def extract_after(page, selectors):
+    """Extracts data the way site processors do.
+    """
+    t = html_tree(page)
+    return [s(t) for s in selectors]
+
+
+def normalized(results):
+    """Returns extracted results comparable across parsed trees.
+    """
+    return [["".join(e.itertext()) if hasattr(e, "itertext") else e
+             for e in result] for result in results]
+
+
+def main():
+    sites = {}
+    for site in _plugin_load_module(join(DIR_SITES, "codeforces.py")):
+        sites[site.id] = site
+
+    print("{0:>24} {1:>24} {2:>12} {3:>12}".format("page", "content type",
+                                                   "before [ms]",
+                                                   "after [ms]"))
+    for site, fixture, legacy in PAGES:
+        names = sorted(legacy)
+        selectors = ([legacy[n] for n in names],
+                     [getattr(type(sites[site]), n) for n in names])
+        for content_type in CONTENT_TYPES:
+            page = make_page(fixture, content_type)
+            assert normalized(extract_before(page, selectors[0])) == \
+                   normalized(extract_after(page, selectors[1]))
+
+            times = []
+            for extract, sel in zip((extract_before, extract_after),
+                                    selectors):
+                timer = timeit.Timer(lambda: extract(page, sel))
+                times.append(min(timer.repeat(repeat=REPEAT,
+                                              number=NUMBER)) / NUMBER)
+
+            print("{0:>24} {1:>24} {2:>12.2f} {3:>12.2f}".format(
+                  fixture, content_type, times[0] * 1000, times[1] * 1000))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
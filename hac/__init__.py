@@ -31,6 +31,7 @@ SETTINGS_CONST = {
     "hac_root_path": os.path.abspath(os.path.dirname(__file__)),
     "config_filename": "hacrc",
     "config_dir": "config",
+    "cache_dir": "cache",
     "config_user_path": os.environ.get('HAC_CONFIG_DIR',
                                        os.path.expanduser('~/.config/hac')),
     "plugin_dir": {
@@ -14,22 +14,39 @@ Commands can access following entries from dictionary "args":
                       designation to the dictionary which map language template
                       designation to the contents of processed runner template
                       file
-    - plugin_sites: list of all available site-processors (objects whose classes
-             inherit from hac.data.ISite),
+    - plugin_sites: list of manifests of all available site-processors
+                    (instances of hac.data.SiteManifest),
+    - config_paths: list of configuration directories (user's directory
+                    first),
     - site_obj: selected site-processor (object whose class inherit from
                 hac.data.ISite),
     - contest_obj: selected contest (instance of hac.data.Contest),
-    - problems_objs: list of selected problems (instances of hac.data.Problem).
+    - problems_objs: iterable of selected problems (instances of
+                     hac.data.Problem), possibly generated lazily as they are
+                     fetched (iterable only once).
+
+Local commands (listed in "app_commands_local") don't fetch any remote data,
+so they don't get "site_obj", "contest_obj" and "problems_objs" entries.
 """
 import sys
 import os
+import json
+import random
+import time
+import shutil
+import tempfile
 from os.path import expanduser, exists, isdir, join
 from pprint import PrettyPrinter
 
 import hac
 from hac import DataType, ExitStatus
 from hac.util_common import warn, error, safe_mkdir, safe_fwrite
-from hac.data import ISite, Contest, Problem
+from hac.util_data import plugin_collect_parts
+from hac.util_trace import tracer
+from hac.util_run import runner_ext, solution_compile, testcases_find, \
+    testcases_run, stress_run, tests_archive_suffix, tests_archive_write, \
+    Verdict
+from hac.data import ISite, SiteManifest, Contest, Problem
 
 
 def _command_prep(**args):
@@ -56,16 +73,6 @@ def _command_prep(**args):
     # Proceed if there exists directory hierachy until this point
     if (isdir(dir_contest)):
 
-        # 3) Establish problems directories.
-        problems_objs = args['problems_objs']
-        if conf_all['subdir_depth'] >= 1:
-            problems_dirs = {}
-            for prob in problems_objs:
-                problems_dirs[prob] = join(dir_contest, prob.id)
-                safe_mkdir(problems_dirs[prob], force=conf_all['force'])
-        else:
-            problems_dirs = {prob: dir_contest for prob in problems_objs}
-
         plugin_langs = args['plugin_langs']
         selected_langs = conf_all['lang']
         sep_langs = hac.SETTINGS_CONST['plugin_temp_sep'][DataType.LANG]
@@ -74,11 +81,21 @@ def _command_prep(**args):
         selected_runners = conf_all['runner']
         sep_runners = hac.SETTINGS_CONST['plugin_temp_sep'][DataType.RUNNER]
 
-        # 4) Create language and runner templates.
-        # For each problem ...
-        for prob in problems_objs:
-            if isdir(problems_dirs[prob]):
-                problem_path = join(problems_dirs[prob], prob.id)
+        # Problems are prepared one by one as soon as they are fetched (so the
+        # first problem is ready while the others are still downloading).
+        for prob in args['problems_objs']:
+            prep_start = time.time()
+
+            # 3) Establish problem directory.
+            if conf_all['subdir_depth'] >= 1:
+                problem_dir = join(dir_contest, prob.id)
+                safe_mkdir(problem_dir, force=conf_all['force'])
+            else:
+                problem_dir = dir_contest
+
+            # 4) Create language and runner templates.
+            if isdir(problem_dir):
+                problem_path = join(problem_dir, prob.id)
 
                 # ... create language for all selected languages.
                 for lang in selected_langs:
@@ -114,17 +131,43 @@ def _command_prep(**args):
                 # 5) Dump inputs and outputs.
                 if conf_all['tests'] >= 1:
                     for i, inp in enumerate(prob.inputs):
-                        in_file = join(problems_dirs[prob],
+                        in_file = join(problem_dir,
                                        prob.id + os.extsep + str(i+1) +
                                        os.extsep + 'in')
                         safe_fwrite(in_file, inp, force=conf_all['force'])
 
                     for i, out in enumerate(prob.outputs):
-                        out_file = join(problems_dirs[prob],
+                        out_file = join(problem_dir,
                                        prob.id + os.extsep + str(i+1) +
                                        os.extsep + 'out')
                         safe_fwrite(out_file, out, force=conf_all['force'])
 
+                # ... and full testcases (streamed into the archive).
+                if conf_all['tests'] >= 2:
+                    archive_file = problem_path + os.extsep + \
+                                   tests_archive_suffix
+                    if exists(archive_file) and not conf_all['force']:
+                        warn('File named "' + archive_file +
+                             '" already exists!')
+                    else:
+                        tests = args['site_obj'].get_tests(prob)
+                        if tests is None:
+                            warn('Full testcases for problem "' + prob.id +
+                                 '" are not available!')
+                        else:
+                            tests_archive_write(archive_file, tests)
+
+                # 6) Dump problem info (limits are enforced by "run").
+                info_file = problem_path + os.extsep + 'json'
+                info = {k: prob.__dict__[k] for k in Problem.get_props(True)
+                                            if k not in ('inputs', 'outputs')}
+                safe_fwrite(info_file, json.dumps(info, indent=4,
+                                                  sort_keys=True),
+                            force=conf_all['force'])
+
+            tracer.add('prep', 'fs', prep_start, time.time() - prep_start,
+                       problem=prob.id)
+
     return ExitStatus.OK
 
 
@@ -134,8 +177,13 @@ def _command_show(**args):
         - command line arguments.
 
     Expects labels for arguments to be contained in "args_text" argument.
+
+    In "ndjson" format, every entry (and every problem) is printed as the
+    separate JSON object {"type": ..., "data": ...} on its own line, as soon
+    as it is available.
     """
     verbose = args['conf_all']['verbose']
+    output_format = args['conf_all']['format']
 
     # Prepare labels for printing
     #  -> TERSE (opposite of verbose)
@@ -164,51 +212,374 @@ def _command_show(**args):
         'conf_all': args['conf_all'],
 
         # args_printable['plugin_langs'] = ['cpp.0', 'cpp.1', 'py.0']
-        'plugin_langs': args['plugin_langs'].keys(),
+        'plugin_langs': sorted(args['plugin_langs'].keys()),
 
         # args_printable['plugin_langs'] = {'sh.0': ['cpp', 'py'],
         #                                   'sh.1': ['cpp', 'py']},
-        'plugin_runners': {r: args['plugin_runners'][r].keys()
+        'plugin_runners': {r: sorted(args['plugin_runners'][r].keys())
                            for r in args['plugin_runners']},
 
         # Prepare for TERSE or VERBOSE
         'plugin_sites': [{k: site.__dict__[k]
-                          for k in ISite.get_props(verbose)}
+                          for k in SiteManifest.get_props(verbose)}
                          for site in args['plugin_sites']],
         'site_obj': {k: args['site_obj'].__dict__[k]
                      for k in ISite.get_props(verbose)},
         'contest_obj': {k: args['contest_obj'].__dict__[k]
                         for k in Contest.get_props(verbose)},
-        'problems_objs': [{k: prob.__dict__[k]
-                           for k in Problem.get_props(verbose)}
-                          for prob in args['problems_objs']]
     }
+    # Problems are prepared as they are fetched.
+    problems_printable = ({k: prob.__dict__[k]
+                           for k in Problem.get_props(verbose)}
+                          for prob in args['problems_objs'])
 
     #TODO display language x runner matrix
 
+    # Stream entries (in the order of labels) and problems one per line.
+    if output_format == 'ndjson':
+        for key in sorted(args_labels, key=args_labels.get):
+            if key == 'problems_objs':
+                for prob in problems_printable:
+                    _print_record('problem', prob)
+            else:
+                _print_record(_show_types.get(key, key), args_printable[key])
+        return ExitStatus.OK
+
+    args_printable['problems_objs'] = list(problems_printable)
+
     # Construct dictionary with data to print
-    data = {args_labels[key]: args_printable[key] for key in args_labels}
+    if output_format == 'json':
+        data = {key: args_printable[key] for key in args_labels}
+        print(json.dumps(data, indent=4, sort_keys=True))
+    else:
+        data = {args_labels[key]: args_printable[key] for key in args_labels}
 
-    # Pretty-print data
-    printer = PrettyPrinter(indent=1, width=1)
-    printer.pprint(data)
+        # Pretty-print data
+        printer = PrettyPrinter(indent=1, width=1)
+        printer.pprint(data)
 
     return ExitStatus.OK
 
 
+# Types of records printed by the "show" command in "ndjson" format.
+_show_types = {
+    'site_obj': 'site',
+    'contest_obj': 'contest',
+}
+
+
+def _print_record(record_type, data):
+    """Prints the record as the single line of JSON (and flushes it, so that
+    consumers can process it right away).
+    """
+    print(json.dumps({'type': record_type, 'data': data}, sort_keys=True))
+    sys.stdout.flush()
+
+
+def _solution_resolve(args, source):
+    """Resolves task, language and runner templating parts (compile and run
+    commands) of the source file.
+
+    Returns tuple (source path, directory, task, templating parts) or None if
+    the source file can't be compiled (error is reported).
+    """
+    conf_all = args['conf_all']
+    sep_langs = hac.SETTINGS_CONST['plugin_temp_sep'][DataType.LANG]
+    sep_runners = hac.SETTINGS_CONST['plugin_temp_sep'][DataType.RUNNER]
+
+    # 1) Resolve task and language from the source file. When source is
+    #    given without extension, first selected language that has source
+    #    file is used.
+    source = join(expanduser(conf_all['workdir']), expanduser(source))
+    cdir, fname = os.path.split(os.path.abspath(source))
+    task = fname.split(os.extsep)[0]
+
+    if os.extsep in fname:
+        lang_ext = fname.split(os.extsep)[-1]
+    else:
+        lang_exts = [lang.split(sep_langs)[0] for lang in conf_all['lang']]
+        lang_exts = [ext for ext in lang_exts
+                     if exists(join(cdir, task + os.extsep + ext))]
+        lang_ext = lang_exts and lang_exts[0]
+
+    if not lang_ext or not exists(join(cdir, task + os.extsep + lang_ext)):
+        error('Source file for "' + source + '" does not exist!')
+        return None
+
+    # 2) Get runner templating parts (compile and run commands) of the
+    #    selected (or highest priority available) shell runner.
+    runners = [runn for runn in conf_all['runner']
+               if runn.split(sep_runners)[0] == runner_ext] or \
+              [runn for runn in sorted(args['plugin_runners'])
+               if runn.split(sep_runners)[0] == runner_ext]
+    parts = runners and plugin_collect_parts(args['config_paths'],
+                                             runners[0]).get(lang_ext)
+    if not parts:
+        error("Runner for [{0}/{1}] combo doesn't exist!"
+              .format(runner_ext, lang_ext))
+        return None
+
+    return source, cdir, task, parts
+
+
+def _solution_compile(source, cdir, task, parts):
+    """Compiles the source file (unless the same source was compiled
+    already). Returns True if compilation succeeded (error is reported
+    otherwise).
+    """
+    cache_dir = join(hac.SETTINGS_CONST['config_user_path'],
+                     hac.SETTINGS_CONST['cache_dir'], 'builds')
+    if not solution_compile(parts, cdir, task, cache_dir):
+        error('Compilation of "' + source + '" failed!')
+        return False
+    return True
+
+
+def _limits(conf_all, cdir, task):
+    """Returns time and memory limits of the task (command-line arguments
+    override problem info dumped by the "prep" command).
+    """
+    info_file = join(cdir, task + os.extsep + 'json')
+    info = {}
+    if exists(info_file):
+        with open(info_file, 'r') as f:
+            info = json.load(f)
+    return (conf_all['time_limit'] or info.get('time_limit_ms'),
+            conf_all['memory_limit'] or info.get('memory_limit_kbyte'))
+
+
+def _command_run(**args):
+    """Compiles the solution (source file given instead of CONTEST / PROBLEM),
+    runs it on all (or selected) testcases in parallel and compares outputs
+    with the expected answers.
+    """
+    conf_all = args['conf_all']
+
+    # 1) Resolve the source file.
+    solution = _solution_resolve(args, conf_all['location'])
+    if not solution:
+        return ExitStatus.ERROR
+    source, cdir, task, parts = solution
+
+    # 2) Get limits.
+    time_limit_ms, memory_limit_kbyte = _limits(conf_all, cdir, task)
+
+    # 3) Compile.
+    if not _solution_compile(source, cdir, task, parts):
+        return ExitStatus.ERROR
+
+    # 4) Run on testcases and report results as they come.
+    testcases = testcases_find(cdir, task, conf_all['problems'])
+    if not testcases:
+        warn('No testcases for "' + task + '" found in "' + cdir + '"!')
+
+    results = []
+    row = "{0:<16} {1:<8} {2:>12} {3:>12} {4:>14}  {5}"
+    if conf_all['format'] == 'text':
+        print(row.format("TESTCASE", "VERDICT", "WALL [ms]", "CPU [ms]",
+                         "MEMORY [KB]", "DETAILS"))
+
+    for result in testcases_run(parts, cdir, task, testcases,
+                                jobs = conf_all['jobs'],
+                                time_limit_ms = time_limit_ms,
+                                memory_limit_kbyte = memory_limit_kbyte,
+                                check = _check_options(conf_all)):
+        results.append(result)
+        if conf_all['format'] == 'ndjson':
+            _print_record('testcase', result)
+        elif conf_all['format'] == 'text':
+            print(row.format(result['testcase'],
+                             result['verdict'],
+                             result['wall_ms'],
+                             _usage(result['cpu_ms'], time_limit_ms),
+                             _memory_usage(result, memory_limit_kbyte),
+                             result['details'] or ""))
+            sys.stdout.flush()
+
+    passed = len([r for r in results if r['verdict'] == Verdict.OK])
+    if conf_all['format'] == 'text':
+        print("Passed {0}/{1}".format(passed, len(testcases)))
+    elif conf_all['format'] == 'ndjson':
+        _print_record('summary', {
+            'source': source,
+            'time_limit_ms': time_limit_ms,
+            'memory_limit_kbyte': memory_limit_kbyte,
+            'passed': passed,
+        })
+    else:
+        print(json.dumps({
+            'source': source,
+            'time_limit_ms': time_limit_ms,
+            'memory_limit_kbyte': memory_limit_kbyte,
+            'passed': passed,
+            'testcases': results,
+        }, indent=4, sort_keys=True))
+
+    return ExitStatus.OK if passed == len(testcases) else ExitStatus.ERROR
+
+
+def _command_stress(**args):
+    """Stress-tests the solution (source file given instead of CONTEST /
+    PROBLEM): compares its outputs with outputs of the reference solution on
+    inputs created by the generator, in parallel, until the first
+    counterexample is found. Counterexample is saved as a new testcase.
+    """
+    conf_all = args['conf_all']
+    if not conf_all['generator'] or not conf_all['reference']:
+        error('Stress-testing needs generator and reference solution '
+              '(options "--generator" and "--reference")!')
+        return ExitStatus.ERROR
+
+    # 1) Resolve and compile all programs.
+    programs = []
+    for source in [conf_all['generator'], conf_all['location'],
+                   conf_all['reference']]:
+        program = _solution_resolve(args, source)
+        if not program or not _solution_compile(*program):
+            return ExitStatus.ERROR
+        programs.append(program)
+    source, cdir, task, _ = programs[1]
+    time_limit_ms, _ = _limits(conf_all, cdir, task)
+
+    # 2) Run iterations until the first failed one (first seed is printed,
+    #    so that the stress-test can be repeated with "--seed").
+    seed = conf_all['seed']
+    if seed is None:
+        seed = random.randint(1, 10**9)
+    if conf_all['format'] == 'text':
+        print("Stress-testing with seeds from {0}".format(seed))
+        sys.stdout.flush()
+    tmpdir = tempfile.mkdtemp(prefix='hac-stress-')
+    try:
+        start = time.time()
+        passed = 0
+        counterexample = None
+        results = stress_run(*[(parts, pdir, ptask)
+                               for _, pdir, ptask, parts in programs],
+                             tmpdir = tmpdir,
+                             iterations = conf_all['iterations'] or 1,
+                             jobs = conf_all['jobs'],
+                             time_limit_ms = time_limit_ms,
+                             check = _check_options(conf_all),
+                             seed = seed)
+        for result in results:
+            if result['verdict'] != Verdict.OK:
+                counterexample = result
+                break
+            passed += 1
+        results.close()
+        elapsed = time.time() - start
+
+        # 3) Save counterexample as the next testcase.
+        if counterexample and not counterexample['failed']:
+            labels = [int(tc.split(os.extsep)[-1])
+                      for tc in testcases_find(cdir, task)
+                      if tc.split(os.extsep)[-1].isdigit()]
+            testcase = task + os.extsep + str(max(labels + [0]) + 1)
+            shutil.copyfile(counterexample['input'],
+                            join(cdir, testcase + os.extsep + 'in'))
+            shutil.copyfile(counterexample['answer'],
+                            join(cdir, testcase + os.extsep + 'out'))
+            counterexample['testcase'] = testcase
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+    # 4) Report.
+    rate = passed / elapsed if elapsed > 0 else 0.0
+    if counterexample:
+        del counterexample['input'], counterexample['answer']
+    if conf_all['format'] == 'text':
+        print("Passed {0} iterations ({1:.1f} per second)".format(passed,
+                                                                  rate))
+        if counterexample and counterexample['failed']:
+            error('Stress-testing failed (seed {0}), {1}!'
+                  .format(counterexample['seed'], counterexample['details']))
+        elif counterexample:
+            print('Counterexample (seed {0}): {1} {2}'
+                  .format(counterexample['seed'], counterexample['verdict'],
+                          counterexample['details'] or ""))
+            print('Saved as testcase "' + counterexample['testcase'] + '"')
+    else:
+        summary = {
+            'source': source,
+            'seed': seed,
+            'passed': passed,
+            'iterations_per_second': rate,
+            'counterexample': counterexample,
+        }
+        if conf_all['format'] == 'ndjson':
+            _print_record('summary', summary)
+        else:
+            print(json.dumps(summary, indent=4, sort_keys=True))
+
+    return ExitStatus.ERROR if counterexample else ExitStatus.OK
+
+
+def _check_options(conf_all):
+    """Returns options for comparing outputs with answers.
+    """
+    return {
+        'lines': conf_all['whitespace'] != 'tokens',
+        'ignore_case': conf_all['ignore_case'],
+        'abs_eps': conf_all['abs_eps'] or 0,
+        'rel_eps': conf_all['rel_eps'] or 0,
+    }
+
+
+def _usage(value, limit):
+    """Formats used resource (with percentage of the limit if available).
+
+    >>> _usage(150, 1000)
+    '150 (15%)'
+    """
+    if not limit:
+        return str(value)
+    return "{0} ({1:.0f}%)".format(value, 100.0 * value / limit)
+
+
+def _memory_usage(result, limit):
+    """Formats memory used on the testcase. Memory that isn't above the
+    baseline (see "hac.util_run._measured_call") is given as its bound.
+
+    >>> _memory_usage({'memory_kbyte': None, 'memory_baseline_kbyte': 9000},
+    ...               None)
+    '<=9000'
+    """
+    if result['memory_kbyte'] is None:
+        return "<=" + _usage(result['memory_baseline_kbyte'], limit)
+    return _usage(result['memory_kbyte'], limit)
+
+
 # Application commands collected in dictionary
 app_commands = { "prep": _command_prep,
-                 "show": _command_show }
+                 "run": _command_run,
+                 "show": _command_show,
+                 "stress": _command_stress }
+
+# Commands that work with local files only (no remote data is fetched)
+app_commands_local = ["run", "stress"]
 
 app_commands_help = {
 "prep":
 """  - prep - prepare directories and files for
     specified problems""",
 
+"run":
+"""  - run - compile source file (given instead of
+    CONTEST / PROBLEM), run it on all (or selected)
+    testcases in parallel and compare outputs with
+    expected answers""",
+
 "show":
 """  - show - print relevant information about
     application configuration, available-plugins,
     identified contest and problems to be fetched
-    (changeable verbosity)"""
+    (changeable verbosity)""",
+
+"stress":
+"""  - stress - compare outputs of source file (given
+    instead of CONTEST / PROBLEM) and of reference
+    solution on generated inputs in parallel, save
+    the first counterexample as a new testcase"""
 }
 
@@ -43,6 +43,20 @@ die () {
     exit 1
 }
 
+#
+# Runs hac's helper module with the interpreter given in $HAC_PYTHON (set by
+# hac for the programs it executes, it can be exported in the shell as well),
+# otherwise with "python". In the latter case hac may not be importable, so
+# errors are ignored (callers fall back to shell implementations).
+#
+hac_python() {
+    if [ -n "$HAC_PYTHON" ]; then
+        "$HAC_PYTHON" "$@"
+    else
+        python "$@" 2>/dev/null
+    fi
+}
+
 #
 # Pipe function for whitespace-normalization of text.
 #
@@ -68,6 +82,19 @@ compare_files() {
         return 1
     fi
 
+    # Compare files with hac's streaming checker (if available)
+    CHECK_TMP=$(hac_python -m hac.util_check "$1" "$2")
+    CHECK_RET=$?
+
+    if [ $CHECK_RET -eq 0 ]; then
+        echo -e "Testcase ${TC}: ${C_OK}OK${C_END}"
+        return 0
+    elif [ $CHECK_RET -eq 1 ] && [ -n "$CHECK_TMP" ]; then
+        echo -e "Testcase ${TC}: ${C_ERROR}Wrong Answer${C_END}"
+        echo "$CHECK_TMP"
+        return 0
+    fi
+
     # Prepare files for comparison
     TMP1=$(mktemp -t tmp.XXXX)
     TMP2=$(mktemp -t tmp.XXXX)
@@ -88,6 +115,28 @@ compare_files() {
     rm "$TMP1" "$TMP2"
 }
 
+#
+# Build cache (see hac.util_run), keyed by the hash of the runner (i.e.
+# compiler command line) and of the source. Build of the kind $1 (exec or
+# dbg) is restored from the cache if possible, otherwise it's compiled and
+# all its products are saved to the cache.
+#
+BUILD_DIR="${HAC_CONFIG_DIR:-$HOME/.config/hac}/cache/builds"
+
+build_restore() {
+    BUILD_STATE=$(hac_python -m hac.util_run restore "$BUILD_DIR" "$1" "$0" \
+                  "${TASK}.${EXT_SRC}")
+    BUILD_RET=$?
+    [ $BUILD_RET -eq 0 ]
+}
+
+build_save() {
+    [ "$BUILD_RET" = 1 ] || return 0
+    printf "%s\n" "$BUILD_STATE" |
+        hac_python -m hac.util_run save "$BUILD_DIR" "$1" "$0" \
+                   "${TASK}.${EXT_SRC}" >/dev/null
+}
+
 
 # -- Process command line arguments -------------------------------------------
 COMMAND=
@@ -141,10 +190,13 @@ fi
 # 3) Compile source, run executable, compare output
 if [ "$COMMAND" == e ]; then
 
-    # Compile source
-    #vvv templated
-    $exec_compile
-    #^^^ templated
+    # Compile source (unless the build is cached)
+    if ! build_restore exec; then
+        #vvv templated
+        $exec_compile
+        #^^^ templated
+        [ $? -eq 0 ] && build_save exec
+    fi
 
     for FILE_IN in ${TASK}.*.${EXT_IN}
     do
@@ -165,10 +217,13 @@ fi
 # 4) Compile source, debug executable
 if [ "$COMMAND" == d ]; then
 
-    # Compile source
-    #vvv templated
-    $dbg_compile
-    #^^^ templated
+    # Compile source (unless the build is cached)
+    if ! build_restore dbg; then
+        #vvv templated
+        $dbg_compile
+        #^^^ templated
+        [ $? -eq 0 ] && build_save dbg
+    fi
 
     TC=${FILE_IN%%.$EXT_IN}
     FILE_IN="${TASK}.${LARG}.${EXT_IN}"
@@ -1,22 +1,28 @@
 # -*- coding: utf-8 -*-
 
-import os
 import re
 import sys
-from lxml import html
 
 if sys.version_info.major == 2:
     from urlparse import urlparse
+    from HTMLParser import HTMLParser
+    _unescape = HTMLParser().unescape
 else:
     from urllib.parse import urlparse
+    if sys.version_info >= (3, 4):
+        from html import unescape as _unescape
+    else:
+        from html.parser import HTMLParser
+        _unescape = HTMLParser().unescape
 
 from hac.data import ISite, Contest, Problem
 from hac.util_common import warn
-from hac.util_data import RequestsCache
+from hac.util_data import json_text
 
 
 class SiteCodeChef(ISite):
-    """CodeChef site processor.
+    """CodeChef site processor. Data is fetched from the JSON endpoints used
+    by the CodeChef web-pages (pages themselves are rendered by JavaScript).
 
     >>> path1 = "/OCT15/problems/SUBINC"
     >>> SiteCodeChef.pattern_contest.search(path1).group("PROBLEM")
@@ -43,21 +49,29 @@ class SiteCodeChef(ISite):
 
     pattern_problem = re.compile(r"[a-zA-Z0-9]+")
 
+    # Code blocks of the problem statement (HTML or Markdown) and labels of
+    # samples.
+    pattern_block = re.compile(
+        r"<pre[^>]*>(?P<PRE>.*?)</pre>|```[^\n]*\n(?P<FENCE>.*?)```",
+        re.S | re.I)
+    pattern_block_inline = re.compile(
+        r"<b>\s*input:?\s*</b>(?P<IN>.*?)<b>\s*output:?\s*</b>(?P<OUT>.*)",
+        re.S | re.I)
+    pattern_label = re.compile(r"\b(input|output)\b", re.I)
+    pattern_tag = re.compile(r"<[^>]*>")
+
+    # Politeness limits (requests per second, requests at once).
+    rate_limit = 2
+    rate_burst = 4
+
     # URL templates.
     url_template_contest = "https://www.codechef.com/{0}"
     url_template_suffix_problem = "/problems/{0}"
 
-    # Xpath selectors.
-    xpath_contest_name = '/html/head/title/text()'
-    xpath_problem_ids = '//*[@class="problems"]//*[@class="problemrow"]//*[substring(@title,1,6) = "Submit"]/text()'
-    xpath_problem_name = '//*[@id="pageContent"]//*[@class="header"]//*[@class="title"]/text()' #TODO fix
-    xpath_problem_time = '//*[@id="pageContent"]//*[@class="time-limit"]/text()' #TODO fix
-    xpath_problem_memory = '//*[@id="pageContent"]//*[@class="memory-limit"]/text()' #TODO fix
-    xpath_problem_ins = '//*[@id="pageContent"]//*[@class="sample-tests"]//*[@class="input"]//pre' #TODO fix
-    xpath_problem_outs = '//*[@id="pageContent"]//*[@class="sample-tests"]//*[@class="output"]//pre' #TODO fix
-
-    # Proxy for HTTP requests (handles request caching during single run of the program).
-    _proxy = RequestsCache()
+    # URL templates of JSON endpoints: contest (with all its problems listed)
+    # and problem (with the statement).
+    url_template_api_contest = "https://www.codechef.com/api/contests/{0}"
+    url_template_api_problem = "https://www.codechef.com/api/contests/{0}/problems/{1}"
 
     # Helper methods
     @staticmethod
@@ -103,6 +117,54 @@ class SiteCodeChef(ISite):
 
         return sorted(set(selected_ids))
 
+    @staticmethod
+    def parse_samples(markup):
+        """Extracts sample inputs and outputs from the problem statement (HTML
+        or Markdown). Returns tuple (inputs, outputs).
+
+        Code block is a sample input (output) if the line before it mentions
+        input (output), or if it contains both parts labeled in bold.
+
+        >>> SiteCodeChef.parse_samples("<h3>Example</h3><pre><b>Input:</b>"
+        ...                            "\\n1\\n1 2\\n\\n<b>Output:</b>\\n1 &lt; 2\\n</pre>")
+        (['1\\n1 2'], ['1 < 2'])
+
+        >>> SiteCodeChef.parse_samples("### Example Input\\n```\\n1\\n5\\n```\\n"
+        ...                            "### Example Output\\n```\\n5\\n```\\n"
+        ...                            "### Explanation\\n```\\n-\\n```")
+        (['1\\n5'], ['5'])
+        """
+        def clean_html(text):
+            text = SiteCodeChef.pattern_tag.sub("", text)
+            return clean(_unescape(text))
+
+        def clean(text):
+            return text.replace("\r\n", "\n").strip()
+
+        inputs, outputs = [], []
+        label_start = 0
+        for block in SiteCodeChef.pattern_block.finditer(markup):
+            if block.group("PRE") is not None:
+                text, clean_block = block.group("PRE"), clean_html
+            else:
+                text, clean_block = block.group("FENCE"), clean
+
+            inline = SiteCodeChef.pattern_block_inline.search(text)
+            if inline:
+                inputs.append(clean_block(inline.group("IN")))
+                outputs.append(clean_block(inline.group("OUT")))
+            else:
+                lines = markup[label_start:block.start()].strip().splitlines()
+                labels = SiteCodeChef.pattern_label.findall(
+                             lines[-1] if lines else "")
+                if labels and labels[-1].lower() == "input":
+                    inputs.append(clean_block(text))
+                elif labels:
+                    outputs.append(clean_block(text))
+            label_start = block.end()
+
+        return inputs, outputs
+
 
     def __init__(self):
         self.url = "www.codechef.com"
@@ -112,7 +174,17 @@ class SiteCodeChef(ISite):
         self.memory_limit_kbyte = 262144
         self.source_limit_kbyte = 50
 
-        self._info = "[SiteCodeChef] Fetching test inputs/outputs not supported!"
+        self._info = None
+
+
+    def _get_api(self, url):
+        """Fetches data from the JSON endpoint. Returns the decoded document
+        (None if the request didn't succeed).
+        """
+        page, data = self._proxy.get_json(url)
+        if isinstance(data, dict) and data.get("status") == "success":
+            return data
+        return None
 
 
     def match_contest(self, conf):
@@ -134,14 +206,13 @@ class SiteCodeChef(ISite):
         tokens = SiteCodeChef.pattern_contest.search(url_path)
         contest.id = tokens.group("CONTEST")
 
-        page = SiteCodeChef._proxy.get(url)
+        data = self._get_api(
+            SiteCodeChef.url_template_api_contest.format(contest.id))
 
         # Data from web:
         #   - contest name.
-        if page.status_code == 200:
-            t = html.fromstring(page.text)
-            e = t.xpath(SiteCodeChef.xpath_contest_name)
-            contest.name = (e and str(e[0])) or ""
+        if data is not None:
+            contest.name = json_text(data.get("name"))
 
         return contest
 
@@ -152,14 +223,23 @@ class SiteCodeChef(ISite):
         url_contest = self.match_contest(conf)
         url_template_problem = url_contest + SiteCodeChef.url_template_suffix_problem
 
-        page = SiteCodeChef._proxy.get(url_contest)
+        contest_id = SiteCodeChef.pattern_contest.search(
+                         urlparse(url_contest).path).group("CONTEST")
+        data = self._get_api(
+            SiteCodeChef.url_template_api_contest.format(contest_id))
 
-        # Data from web:
+        # Data from web (all problems are listed in the single request):
         #   - available problem ids.
-        if page.status_code == 200:
-            t = html.fromstring(page.text)
-            e = t.xpath(SiteCodeChef.xpath_problem_ids)
-            ids_available = [str(e.strip()) for e in e]
+        if data is not None:
+            problems = data.get("problems") or []
+            if isinstance(problems, dict):
+                ids_available = [str(code) for code in problems]
+            else:
+                try:
+                    ids_available = [str(p["code"]) for p in problems]
+                except (KeyError, TypeError):
+                    raise ValueError('Unexpected list of problems of "' +
+                                     url_contest + '"')
         else:
             warn('Unable to fetch: ' + url_contest)
             return []
@@ -187,43 +267,55 @@ class SiteCodeChef(ISite):
         return [url_template_problem.format(id) for id in ids]
 
 
-    def get_problems(self, urls):
+    def get_problem(self, url):
         """Overridden.
         """
-        problems = []
-        for url in urls:
-            problem = Problem()
-            problem.url = url
-            url_path = urlparse(url).path
-            assert url_path
-            tokens = SiteCodeChef.pattern_contest.search(url_path)
-            problem.id = tokens.group("PROBLEM")
-            assert problem.id
-            problem.source_limit_kbyte = self.source_limit_kbyte
-
-            page = SiteCodeChef._proxy.get(url)
-
-            #TODO Implement the rest from here...
-            # Data from web (for each problem):
-            if page.status_code == 200:
-                t = html.fromstring(page.text)
-                #   - problem name,
-                e = t.xpath(SiteCodeChef.xpath_problem_name)
-                problem.name = (e and str(e[0])) or None
-                #   - problem time limit,
-                e = t.xpath(SiteCodeChef.xpath_problem_time)
-                limit = e and float(e[0].split()[0]) * 1000
-                problem.time_limit_ms = limit or self.time_limit_ms
-                #   - problem memory limit,
-                e = t.xpath(SiteCodeChef.xpath_problem_memory)
-                limit = e and float(e[0].split()[0]) * 2**10
-                problem.memory_limit_kbyte = limit or self.memory_limit_kbyte
-                #   - test inputs,
-                e = t.xpath(SiteCodeChef.xpath_problem_ins)
-                problem.inputs = [os.linesep.join(inp.itertext()) for inp in e]
-                #   - test outputs.
-                e = t.xpath(SiteCodeChef.xpath_problem_outs)
-                problem.outputs = [os.linesep.join(out.itertext()) for out in e]
-
-                problems.append(problem)
-        return problems
+        problem = Problem()
+        problem.url = url
+        url_path = urlparse(url).path
+        assert url_path
+        tokens = SiteCodeChef.pattern_contest.search(url_path)
+        problem.id = tokens.group("PROBLEM")
+        assert problem.id
+        problem.source_limit_kbyte = self.source_limit_kbyte
+        problem.memory_limit_kbyte = self.memory_limit_kbyte
+
+        data = self._get_api(SiteCodeChef.url_template_api_problem.format(
+                                 tokens.group("CONTEST"), problem.id))
+
+        # Data from web (for each problem):
+        if data is not None:
+            #   - problem name,
+            problem.name = json_text(data.get("problem_name")) or None
+            #   - problem time limit (in seconds),
+            try:
+                problem.time_limit_ms = float(data["max_timelimit"]) * 1000
+            except (KeyError, TypeError, ValueError):
+                problem.time_limit_ms = self.time_limit_ms
+            #   - problem source limit (in bytes),
+            try:
+                problem.source_limit_kbyte = \
+                    float(data["source_sizelimit"]) / 1000
+            except (KeyError, TypeError, ValueError):
+                pass
+            #   - test inputs and outputs (listed separately or contained in
+            #     the statement).
+            try:
+                samples = (data.get("problemComponents") or {}).get(
+                              "sampleTestCases")
+                if samples:
+                    problem.inputs = [s["input"].strip() for s in samples
+                                      if not s.get("isDeleted")]
+                    problem.outputs = [s["output"].strip() for s in samples
+                                       if not s.get("isDeleted")]
+            except (AttributeError, KeyError, TypeError):
+                raise ValueError('Unexpected samples of the problem "' +
+                                 url + '"')
+            if not samples:
+                problem.inputs, problem.outputs = \
+                    SiteCodeChef.parse_samples(data.get("body") or "")
+
+            return problem
+
+        warn('Problem "' + problem.id + '" does not exist on CodeChef!')
+        return None
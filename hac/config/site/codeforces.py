@@ -3,7 +3,7 @@
 import os
 import re
 import sys
-from lxml import html
+from lxml import etree
 
 if sys.version_info.major == 2:
     from urlparse import urlparse
@@ -12,7 +12,7 @@ else:
 
 from hac.data import ISite, Contest, Problem
 from hac.util_common import warn
-from hac.util_data import RequestsCache
+from hac.util_data import json_text
 
 
 class SiteCodeforces(ISite):
@@ -47,21 +47,28 @@ class SiteCodeforces(ISite):
     )
     pattern_problem = re.compile(r"[a-zA-Z0-9]+")
 
+    # Politeness limits (requests per second, requests at once).
+    rate_limit = 2
+    rate_burst = 4
+
     # URL templates.
     url_template_contest = "http://codeforces.com/contest/{0}"
     url_template_suffix_problem = "/problem/{0}"
 
-    # Xpath selectors.
-    xpath_contest_name = '//*[@id="sidebar"]//a[contains(@href, "contest")]/text()'
-    xpath_problem_ids = '//*[@id="pageContent"]//*[@class="id"]//a/text()'
-    xpath_problem_name = '//*[@id="pageContent"]//*[@class="header"]//*[@class="title"]/text()'
-    xpath_problem_time = '//*[@id="pageContent"]//*[@class="time-limit"]/text()'
-    xpath_problem_memory = '//*[@id="pageContent"]//*[@class="memory-limit"]/text()'
-    xpath_problem_ins = '//*[@id="pageContent"]//*[@class="sample-tests"]//*[@class="input"]//pre'
-    xpath_problem_outs = '//*[@id="pageContent"]//*[@class="sample-tests"]//*[@class="output"]//pre'
-
-    # Proxy for HTTP requests (handles request caching during single run of the program).
-    _proxy = RequestsCache()
+    # URL template of the API method that returns contest name and list of
+    # problems in the single (small) response. Contest page is used if the API
+    # is not available (set to None to always use the contest page).
+    url_template_api_contest = \
+        "http://codeforces.com/api/contest.standings?contestId={0}&from=1&count=1"
+
+    # Xpath selectors (compiled once).
+    xpath_contest_name = etree.XPath('id("sidebar")//a[contains(@href, "contest")]/text()')
+    xpath_problem_ids = etree.XPath('id("pageContent")//*[@class="id"]//a/text()')
+    xpath_problem_name = etree.XPath('id("pageContent")//*[@class="header"]//*[@class="title"]/text()')
+    xpath_problem_time = etree.XPath('id("pageContent")//*[@class="time-limit"]/text()')
+    xpath_problem_memory = etree.XPath('id("pageContent")//*[@class="memory-limit"]/text()')
+    xpath_problem_ins = etree.XPath('id("pageContent")//*[@class="sample-tests"]//*[@class="input"]//pre')
+    xpath_problem_outs = etree.XPath('id("pageContent")//*[@class="sample-tests"]//*[@class="output"]//pre')
 
     # Helper methods
     @staticmethod
@@ -96,6 +103,54 @@ class SiteCodeforces(ISite):
 
         return None
 
+    @staticmethod
+    def parse_limit(texts, unit):
+        """Returns limit (in units "unit") from the text of the limit element,
+        e.g. "2 seconds" (None if there's no such element). Raises ValueError
+        if the text isn't a limit.
+
+        >>> SiteCodeforces.parse_limit(['256 megabytes'], 2**10)
+        262144.0
+
+        >>> SiteCodeforces.parse_limit([], 1000) is None
+        True
+
+        >>> SiteCodeforces.parse_limit([' '], 1000)
+        Traceback (most recent call last):
+        ...
+        ValueError: Unexpected limit " "
+        """
+        if not texts:
+            return None
+        tokens = texts[0].split()
+        if not tokens:
+            raise ValueError('Unexpected limit "' + texts[0] + '"')
+        return float(tokens[0]) * unit
+
+    @staticmethod
+    def parse_standings(data):
+        """Extracts tuple (contest name, problem ids) from the response of the
+        "contest.standings" API method (None if the request failed).
+
+        >>> SiteCodeforces.parse_standings({"status": "OK", "result": {
+        ...     "contest": {"id": 512, "name": "Codeforces Round #290"},
+        ...     "problems": [{"index": "A", "name": "Fox And Names"},
+        ...                  {"index": "B", "name": "Fox And Jumping"}],
+        ...     "rows": []}})
+        ('Codeforces Round #290', ['A', 'B'])
+
+        >>> SiteCodeforces.parse_standings({"status": "FAILED",
+        ...     "comment": "contestId: Contest with id 999999 not found"})
+        """
+        try:
+            if data["status"] != "OK":
+                return None
+            result = data["result"]
+            return (json_text(result["contest"]["name"]),
+                    [str(problem["index"]) for problem in result["problems"]])
+        except (KeyError, TypeError):
+            return None
+
 
     def __init__(self):
         self.url = "codeforces.com"
@@ -108,6 +163,18 @@ class SiteCodeforces(ISite):
         self._info = None
 
 
+    def _contest_api(self, contest_id):
+        """Fetches contest data through the API. Returns tuple (contest name,
+        problem ids) or None if the API is not available.
+        """
+        if not SiteCodeforces.url_template_api_contest:
+            return None
+
+        page, data = self._proxy.get_json(
+            SiteCodeforces.url_template_api_contest.format(contest_id))
+        return SiteCodeforces.parse_standings(data)
+
+
     def match_contest(self, conf):
         """Overridden.
         """
@@ -127,13 +194,19 @@ class SiteCodeforces(ISite):
         tokens = SiteCodeforces.pattern_contest.search(url_path)
         contest.id = tokens.group('CONTEST')
 
-        page = SiteCodeforces._proxy.get(url)
+        # Data from API:
+        #   - contest name.
+        api = self._contest_api(contest.id)
+        if api is not None:
+            contest.name = api[0] or None
+            return contest
+
+        page, t = self._proxy.get_tree(url)
 
-        # Data from web:
+        # Data from web (if API is not available):
         #   - contest name.
         if page.status_code == 200:
-            t = html.fromstring(page.text)
-            e = t.xpath(SiteCodeforces.xpath_contest_name)
+            e = SiteCodeforces.xpath_contest_name(t)
             contest.name = (e and str(e[0])) or None
 
         return contest
@@ -145,14 +218,20 @@ class SiteCodeforces(ISite):
         url_contest = self.match_contest(conf)
         url_template_problem = url_contest + SiteCodeforces.url_template_suffix_problem
 
-        page = SiteCodeforces._proxy.get(url_contest)
-
-        # Data from web:
+        # Data from API (or from web if API is not available):
         #   - available problem ids.
-        if page.status_code == 200:
-            t = html.fromstring(page.text)
-            e = t.xpath(SiteCodeforces.xpath_problem_ids)
-            ids_available = [str(e.strip()) for e in e]
+        tokens = SiteCodeforces.pattern_contest.search(urlparse(url_contest).path)
+        api = self._contest_api(tokens.group('CONTEST'))
+        if api is not None:
+            ids_available = api[1]
+        else:
+            page, t = self._proxy.get_tree(url_contest)
+            if page.status_code == 200:
+                e = SiteCodeforces.xpath_problem_ids(t)
+                ids_available = [str(e.strip()) for e in e]
+            else:
+                warn('Unable to fetch: ' + url_contest)
+                return []
 
         ids = []
         # Match single problem from 'location'.
@@ -187,42 +266,40 @@ class SiteCodeforces(ISite):
         return sorted(urls)
 
 
-    def get_problems(self, urls):
+    def get_problem(self, url):
         """Overridden.
         """
-        problems = []
-        for url in urls:
-            problem = Problem()
-            problem.url = url
-            url_path = urlparse(url).path
-            assert url_path
-            tokens = SiteCodeforces.pattern_contest.search(url_path)
-            problem.id = tokens.group('PROBLEM')
-            assert problem.id
-            problem.source_limit_kbyte = self.source_limit_kbyte
-
-            page = SiteCodeforces._proxy.get(url)
-
-            # Data from web (for each problem):
-            if page.status_code == 200:
-                t = html.fromstring(page.text)
-                #   - problem name,
-                e = t.xpath(SiteCodeforces.xpath_problem_name)
-                problem.name = (e and str(e[0])) or None
-                #   - problem time limit,
-                e = t.xpath(SiteCodeforces.xpath_problem_time)
-                limit = e and float(e[0].split()[0]) * 1000
-                problem.time_limit_ms = limit or self.time_limit_ms
-                #   - problem memory limit,
-                e = t.xpath(SiteCodeforces.xpath_problem_memory)
-                limit = e and float(e[0].split()[0]) * 2**10
-                problem.memory_limit_kbyte = limit or self.memory_limit_kbyte
-                #   - test inputs,
-                e = t.xpath(SiteCodeforces.xpath_problem_ins)
-                problem.inputs = [os.linesep.join(inp.itertext()) for inp in e]
-                #   - test outputs.
-                e = t.xpath(SiteCodeforces.xpath_problem_outs)
-                problem.outputs = [os.linesep.join(out.itertext()) for out in e]
-
-                problems.append(problem)
-        return problems
+        problem = Problem()
+        problem.url = url
+        url_path = urlparse(url).path
+        assert url_path
+        tokens = SiteCodeforces.pattern_contest.search(url_path)
+        problem.id = tokens.group('PROBLEM')
+        assert problem.id
+        problem.source_limit_kbyte = self.source_limit_kbyte
+
+        page, t = self._proxy.get_tree(url)
+
+        # Data from web (for each problem):
+        if page.status_code == 200:
+            #   - problem name,
+            e = SiteCodeforces.xpath_problem_name(t)
+            problem.name = (e and str(e[0])) or None
+            #   - problem time limit,
+            limit = SiteCodeforces.parse_limit(
+                        SiteCodeforces.xpath_problem_time(t), 1000)
+            problem.time_limit_ms = limit or self.time_limit_ms
+            #   - problem memory limit,
+            limit = SiteCodeforces.parse_limit(
+                        SiteCodeforces.xpath_problem_memory(t), 2**10)
+            problem.memory_limit_kbyte = limit or self.memory_limit_kbyte
+            #   - test inputs,
+            e = SiteCodeforces.xpath_problem_ins(t)
+            problem.inputs = [os.linesep.join(inp.itertext()) for inp in e]
+            #   - test outputs.
+            e = SiteCodeforces.xpath_problem_outs(t)
+            problem.outputs = [os.linesep.join(out.itertext()) for out in e]
+
+            return problem
+
+        return None
@@ -101,21 +101,18 @@ class SiteLocal(ISite):
         return urls
 
 
-    def get_problems(self, urls):
+    def get_problem(self, url):
         """Overridden.
         """
-        problems = []
-        for url in urls:
-            problem = Problem()
-            problem.url = url
-            url_path = urlparse(url).path
-            assert url_path
-            tokens = SiteLocal.pattern_contest.search(url_path)
-            problem.id = tokens.group('PROBLEM')
-            assert problem.id
-            problem.name = problem.id
-            problem.time_limit_ms = self.time_limit_ms
-            problem.memory_limit_kbyte = self.memory_limit_kbyte
-            problem.source_limit_kbyte = self.source_limit_kbyte
-            problems.append(problem)
-        return problems
+        problem = Problem()
+        problem.url = url
+        url_path = urlparse(url).path
+        assert url_path
+        tokens = SiteLocal.pattern_contest.search(url_path)
+        problem.id = tokens.group('PROBLEM')
+        assert problem.id
+        problem.name = problem.id
+        problem.time_limit_ms = self.time_limit_ms
+        problem.memory_limit_kbyte = self.memory_limit_kbyte
+        problem.source_limit_kbyte = self.source_limit_kbyte
+        return problem
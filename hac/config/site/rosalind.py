@@ -2,7 +2,7 @@
 
 import re
 import sys
-from lxml import html
+from lxml import etree
 
 if sys.version_info.major == 2:
     from urlparse import urlparse
@@ -11,7 +11,6 @@ else:
 
 from hac.data import ISite, Contest, Problem
 from hac.util_common import warn
-from hac.util_data import RequestsCache
 
 
 class SiteRosalind(ISite):
@@ -41,17 +40,18 @@ class SiteRosalind(ISite):
     )
     pattern_problem = re.compile(r"[a-zA-Z]+")
 
+    # Politeness limits (requests per second, requests at once).
+    rate_limit = 1
+    rate_burst = 2
+
     # URL templates.
     url_contest = "http://rosalind.info"
     url_template_suffix_problem = "/problems/{0}/"
 
-    # Xpath selectors.
-    xpath_problem_name = '//h1/text()'
-    xpath_problem_ins = '//*[@id="sample-dataset"]/following::div[1]//pre/text()'
-    xpath_problem_outs = '//*[@id="sample-output"]/following::div[1]//pre/text()'
-
-    # Proxy for HTTP requests (handles request caching during single run of the program).
-    _proxy = RequestsCache()
+    # Xpath selectors (compiled once).
+    xpath_problem_name = etree.XPath('//h1/text()')
+    xpath_problem_ins = etree.XPath('id("sample-dataset")/following::div[1]//pre/text()')
+    xpath_problem_outs = etree.XPath('id("sample-output")/following::div[1]//pre/text()')
 
 
     def __init__(self):
@@ -109,39 +109,36 @@ class SiteRosalind(ISite):
         return sorted(urls)
 
 
-    def get_problems(self, urls):
+    def get_problem(self, url):
         """Overridden.
         """
-        problems = []
-        for url in urls:
-            problem = Problem()
-            problem.url = url
-            url_path = urlparse(url).path
-            assert url_path
-            tokens = SiteRosalind.pattern_contest.search(url_path)
-            problem.id = tokens.group('PROBLEM')
-            assert problem.id
-
-            page = SiteRosalind._proxy.get(url)
-
-            # Data from web (for each problem):
-            if page.status_code == 200:
-                t = html.fromstring(page.text)
-                #   - problem name,
-                e = t.xpath(SiteRosalind.xpath_problem_name)
-                problem.name = (e and str(e[0]).strip()) or None
-                #   - test input, (single fetched)
-                e = t.xpath(SiteRosalind.xpath_problem_ins)
-                problem.inputs = e and [str(e[0]).strip()]
-                #   - test outputs, (single fetched)
-                e = t.xpath(SiteRosalind.xpath_problem_outs)
-                problem.outputs = e and [str(e[0]).strip()]
-
-                if (problem.name and
-                    problem.inputs and
-                    problem.outputs):
-                        problems.append(problem)
-            else:
-                warn('Problem "' + problem.id + '" does not exist on Rosalind!')
-
-        return problems
+        problem = Problem()
+        problem.url = url
+        url_path = urlparse(url).path
+        assert url_path
+        tokens = SiteRosalind.pattern_contest.search(url_path)
+        problem.id = tokens.group('PROBLEM')
+        assert problem.id
+
+        page, t = self._proxy.get_tree(url)
+
+        # Data from web (for each problem):
+        if page.status_code == 200:
+            #   - problem name,
+            e = SiteRosalind.xpath_problem_name(t)
+            problem.name = (e and str(e[0]).strip()) or None
+            #   - test input, (single fetched)
+            e = SiteRosalind.xpath_problem_ins(t)
+            problem.inputs = e and [str(e[0]).strip()]
+            #   - test outputs, (single fetched)
+            e = SiteRosalind.xpath_problem_outs(t)
+            problem.outputs = e and [str(e[0]).strip()]
+
+            if (problem.name and
+                problem.inputs and
+                problem.outputs):
+                    return problem
+        else:
+            warn('Problem "' + problem.id + '" does not exist on Rosalind!')
+
+        return None
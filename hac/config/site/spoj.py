@@ -2,7 +2,7 @@
 
 import re
 import sys
-from lxml import html
+from lxml import etree
 
 if sys.version_info.major == 2:
     from urlparse import urlparse
@@ -11,7 +11,6 @@ else:
 
 from hac.data import ISite, Contest, Problem
 from hac.util_common import warn
-from hac.util_data import RequestsCache
 
 
 class SiteSpoj(ISite):
@@ -40,19 +39,20 @@ class SiteSpoj(ISite):
     )
     pattern_problem = re.compile(r"[a-zA-Z0-9]+")
 
+    # Politeness limits (requests per second, requests at once).
+    rate_limit = 1
+    rate_burst = 2
+
     # URL templates.
     url_contest = "http://www.spoj.com"
     url_template_suffix_problem = "/problems/{0}"
 
-    # Xpath selectors.
-    xpath_problem_name = '//*[@id="problem-name"]/text()'
-    xpath_problem_time = '//*[@id="problem-meta"]/tbody/tr[3]/td[2]/text()'
-    xpath_problem_source = '//*[@id="problem-meta"]/tbody/tr[4]/td[2]/text()'
-    xpath_problem_memory = '//*[@id="problem-meta"]/tbody/tr[5]/td[2]/text()'
-    xpath_problem_ins_outs = '//*[@id="problem-body"]//pre/text()'
-
-    # Proxy for HTTP requests (handles request caching during single run of the program).
-    _proxy = RequestsCache()
+    # Xpath selectors (compiled once).
+    xpath_problem_name = etree.XPath('id("problem-name")/text()')
+    xpath_problem_time = etree.XPath('id("problem-meta")/tbody/tr[3]/td[2]/text()')
+    xpath_problem_source = etree.XPath('id("problem-meta")/tbody/tr[4]/td[2]/text()')
+    xpath_problem_memory = etree.XPath('id("problem-meta")/tbody/tr[5]/td[2]/text()')
+    xpath_problem_ins_outs = etree.XPath('id("problem-body")//pre/text()')
 
 
     def __init__(self):
@@ -109,55 +109,52 @@ class SiteSpoj(ISite):
         return sorted(urls)
 
 
-    def get_problems(self, urls):
+    def get_problem(self, url):
         """Overridden.
         """
-        problems = []
-        for url in urls:
-            problem = Problem()
-            problem.url = url
-            url_path = urlparse(url).path
-            assert url_path
-            tokens = SiteSpoj.pattern_contest.search(url_path)
-            problem.id = tokens.group('PROBLEM')
-            assert problem.id
-
-            page = SiteSpoj._proxy.get(url)
-
-            # Data from web (for each problem):
-            if page.status_code == 200:
-                t = html.fromstring(page.text)
-                #   - problem name,
-                e = t.xpath(SiteSpoj.xpath_problem_name)
-                problem.name = (e and str(e[0])) or None
-                #   - problem time limit,
-                e = t.xpath(SiteSpoj.xpath_problem_time)
-                p = e and e[0].strip()[:-1] # remove whitespace characters and 's' at the end
-                problem.time_limit_ms = p and float(p) * 1000
-                #   - problem source limit,
-                e = t.xpath(SiteSpoj.xpath_problem_source)
-                p = e and e[0].strip()[:-1] # remove whitespace characters and 'B' at the end
-                problem.source_limit_kbyte = p and float(p) / 1000
-                #   - problem memory limit,
-                e = t.xpath(SiteSpoj.xpath_problem_memory)
-                p = e and e[0].strip()[:-2] # remove whitespace characters and 'MB' at the end
-                problem.memory_limit_kbyte = p and float(p) * 2**10
-                #   - test inputs and outputs.
-                e = t.xpath(SiteSpoj.xpath_problem_ins_outs)
-                problem.inputs = [i.strip() for i in e[0:][::2]]
-                problem.outputs = [o.strip() for o in e[1:][::2]]
-
-                if (problem.name and
-                    problem.time_limit_ms and
-                    problem.source_limit_kbyte and
-                    problem.memory_limit_kbyte and
-                    problem.inputs and
-                    problem.outputs):
-                        problems.append(problem)
-                else:
-                    warn('Problem "' + problem.id + '" not fetched successfully!')
-
+        problem = Problem()
+        problem.url = url
+        url_path = urlparse(url).path
+        assert url_path
+        tokens = SiteSpoj.pattern_contest.search(url_path)
+        problem.id = tokens.group('PROBLEM')
+        assert problem.id
+
+        page, t = self._proxy.get_tree(url)
+
+        # Data from web (for each problem):
+        if page.status_code == 200:
+            #   - problem name,
+            e = SiteSpoj.xpath_problem_name(t)
+            problem.name = (e and str(e[0])) or None
+            #   - problem time limit,
+            e = SiteSpoj.xpath_problem_time(t)
+            p = e and e[0].strip()[:-1] # remove whitespace characters and 's' at the end
+            problem.time_limit_ms = p and float(p) * 1000
+            #   - problem source limit,
+            e = SiteSpoj.xpath_problem_source(t)
+            p = e and e[0].strip()[:-1] # remove whitespace characters and 'B' at the end
+            problem.source_limit_kbyte = p and float(p) / 1000
+            #   - problem memory limit,
+            e = SiteSpoj.xpath_problem_memory(t)
+            p = e and e[0].strip()[:-2] # remove whitespace characters and 'MB' at the end
+            problem.memory_limit_kbyte = p and float(p) * 2**10
+            #   - test inputs and outputs.
+            e = SiteSpoj.xpath_problem_ins_outs(t)
+            problem.inputs = [i.strip() for i in e[0:][::2]]
+            problem.outputs = [o.strip() for o in e[1:][::2]]
+
+            if (problem.name and
+                problem.time_limit_ms and
+                problem.source_limit_kbyte and
+                problem.memory_limit_kbyte and
+                problem.inputs and
+                problem.outputs):
+                    return problem
             else:
-                warn('Problem "' + problem.id + '" does not exist on Spoj!')
+                warn('Problem "' + problem.id + '" not fetched successfully!')
+
+        else:
+            warn('Problem "' + problem.id + '" does not exist on Spoj!')
 
-        return problems
+        return None
@@ -3,21 +3,42 @@
 """
 import os
 import sys
+import copy
+import time
+import random
 import textwrap
+import threading
 from os.path import dirname, realpath
 
 import hac
 from hac import DataType, ExitStatus
-from hac.commands import app_commands
+from hac.commands import app_commands, app_commands_local
 from hac.parse_common import get_pargs_pack_common, pargs_packed_add
 from hac.parse_config import get_bare_config_parser
 from hac.parse_cli import get_pargs_pack_cli, get_bare_cli_parser
 from hac.util_common import error, dict_override, list_reduce, mainargs_index,\
-    choice_generate, choice_normal, safe_cpdir
-from hac.util_data import plugin_collect, plugin_match_site
+    choice_generate, choice_normal, safe_cpdir, map_parallel, \
+    warnings_captured
+from hac.util_data import plugin_collect_cached, plugin_match_site, \
+    plugin_load_site, RequestsStore, RequestsCache
+from hac.util_trace import tracer
 
 
-def main(args=sys.argv[1:]):
+# State kept warm between the commands executed by the same process (see
+# "hac.server"): parsed configuration and HTTP proxies.
+_config_cached = {}
+_proxies = {}
+
+# Polling of the contest with "--wait": interval between polls (in seconds)
+# grows from the shortest to the longest one by the backoff factor. Every
+# interval is randomized (by the jitter fraction), so that clients started at
+# the same time don't poll in sync.
+_wait_interval = (1.0, 10.0)
+_wait_backoff = 1.5
+_wait_jitter = 0.25
+
+
+def main(args=sys.argv[1:], served=False):
     """Execution flow of the application:
 
         1) discover and load plugins (languages, runners and sites)
@@ -28,8 +49,42 @@ def main(args=sys.argv[1:]):
             2b] override with user's hacrc
             2c] override with command-line arguments
         3) handle special command-line switches
-        4) fetch data from site
+        4) fetch data from site (for every contest of the batch)
         5) execute command (prep, show)
+
+    Time spent in every stage is recorded if "--profile" is given (summary is
+    printed at the end) or if HAC_TRACE environment variable is set (Chrome
+    trace is written to the file it names).
+
+    If "served" is set (command is executed by the hac server), parsed
+    configuration and HTTP proxies are kept for the following commands, and
+    local commands and commands with "--wait" are not executed (None is
+    returned, the client executes them itself).
+    """
+    trace_file = os.environ.get("HAC_TRACE")
+    # "--profile" may be given in hacrc files as well, so stages are traced
+    # until the configuration is resolved (tracing stops there if it's not
+    # needed).
+    tracer.enable()
+
+    conf_all = {}
+    executed = True
+    try:
+        with tracer.span("main", "stage"):
+            status = _main(args, served, conf_all)
+            executed = status is not None or not served
+            return status
+    finally:
+        if executed:
+            if conf_all.get("profile"):
+                sys.stderr.write(tracer.summary() + os.linesep)
+            if trace_file:
+                tracer.write_chrome(trace_file)
+
+
+def _main(args, served=False, resolved=None):
+    """Executes the application (see "main"). Resolved configuration is
+    stored to the dictionary "resolved" (if given).
     """
 
     # -- PLUGIN-SYSTEM -------------------------------------------------------
@@ -39,11 +94,16 @@ def main(args=sys.argv[1:]):
     # User configs override global configs
     config_paths = [config_user_path, config_global_path]
 
+    # Cached data (plug-ins index, web-pages) is kept in user's directory.
+    cache_path = os.path.join(config_user_path,
+                              hac.SETTINGS_CONST["cache_dir"])
+
     #TODO NOW separate/refactor templating from plugin collection
     # Discover plug-ins (sites) and templates (runners, languages).
-    plugin_langs = plugin_collect(config_paths, DataType.LANG)
-    plugin_runners = plugin_collect(config_paths, DataType.RUNNER)
-    plugin_sites = plugin_collect(config_paths, DataType.SITE)
+    with tracer.span("plugins", "stage"):
+        plugin_langs, plugin_runners, plugin_sites = plugin_collect_cached(
+                config_paths,
+                os.path.join(cache_path, "plugins" + os.extsep + "json"))
 
     # Generating auxiliary data.
     #
@@ -61,40 +121,13 @@ def main(args=sys.argv[1:]):
 
     # -- READ CONFIG FILES ---------------------------------------------------
     # Construct and use parsers (utilize data from plug-ins).
-
-    # Get parser arguments.
-    pargs_pack_common = get_pargs_pack_common(
-            choice_langs = choice_langs,
-            choice_runners = choice_runners,
-    )
-    pargs_pack_cli = get_pargs_pack_cli()
-
-    # Add arguments to parsers.
-    parser_config = get_bare_config_parser()
-    parser_cli = get_bare_cli_parser()
-
-    pargs_packed_add(parser_config, pargs_pack_common)
-    pargs_packed_add(parser_cli, pargs_pack_common)
-    pargs_packed_add(parser_cli, pargs_pack_cli)
-
-    # Get default application configuration (from files).
-    config_global_file = os.path.join(hac.SETTINGS_CONST["hac_root_path"],
-                                      hac.SETTINGS_CONST["config_dir"],
-                                      hac.SETTINGS_CONST["config_filename"])
-    assert os.path.exists(config_global_file)
-    env_global = parser_config.parse_args(['@' + config_global_file])
-    conf_global = vars(env_global)
-
-    # Get user specific configuration (from files).
-    config_user_file = os.path.join(hac.SETTINGS_CONST["config_user_path"],
-                                    hac.SETTINGS_CONST["config_filename"])
-
-    if os.path.exists(config_user_file):
-        env_user = parser_config.parse_args(['@' + config_user_file])
-        # Resolve configuration read from files
-        conf_user = dict_override(conf_global, vars(env_user))
+    config_start = time.time()
+    if served:
+        parser_cli, conf_global, conf_user = _config_read_cached(
+                choice_langs, choice_runners)
     else:
-        conf_user = conf_global
+        parser_cli, conf_global, conf_user = _config_read(
+                choice_langs, choice_runners)
 
 
     # -- READ CLI ------------------------------------------------------------
@@ -140,15 +173,6 @@ def main(args=sys.argv[1:]):
     if (margs_ind == len(args)) or (args[margs_ind] not in app_commands):
         args.insert(margs_ind, conf_user["command"])
 
-    # Notify user and exit if:
-    #
-    #   - no location (legal CONTEST / PROBLEM) given
-    #
-    if (len(args) == margs_ind + 1) and (args[margs_ind] in app_commands):
-        error("No CONTEST / PROBLEM given!")
-        sys.exit(ExitStatus.ERROR)
-
-
     # Regular handling of CLI arguments. Parse CLI arguments and resolve with
     # respect to configuration files.
     env_cli = parser_cli.parse_args(args=args)
@@ -157,6 +181,23 @@ def main(args=sys.argv[1:]):
     else:
         conf_all = conf_user
 
+    # Notify user and exit if:
+    #
+    #   - no location (legal CONTEST / PROBLEM) and no batch file given
+    #
+    if not conf_all["location"] and not conf_all["batch"]:
+        error("No CONTEST / PROBLEM given!")
+        sys.exit(ExitStatus.ERROR)
+
+    # Notify user and exit if:
+    #
+    #   - batch file is given to the local command (it takes no contests)
+    #
+    if conf_all["batch"] and conf_all["command"] in app_commands_local:
+        error('Option "--batch" can\'t be used with the "' +
+              conf_all["command"] + '" command!')
+        sys.exit(ExitStatus.ERROR)
+
     # -- PROCESS CONFIG / CLI ------------------------------------------------
     # Normalize aggregated configuration.
 
@@ -171,49 +212,396 @@ def main(args=sys.argv[1:]):
     # ['cpp.0', 'py.15']
     conf_all["lang"] = choice_normal(conf_all["lang"], available_langs)
     conf_all["runner"] = choice_normal(conf_all["runner"], available_runners)
+    tracer.add("config", "stage", config_start, time.time() - config_start)
+    if resolved is not None:
+        resolved.update(conf_all)
+    if not conf_all["profile"] and not os.environ.get("HAC_TRACE"):
+        tracer.reset()
+
+    # -- EXECUTE LOCAL COMMAND -----------------------------------------------
+    # Commands that don't need remote data are executed right away.
+    if conf_all["command"] in app_commands_local:
+        # Programs executed by local commands write to the terminal directly,
+        # so the client of the server has to execute them itself.
+        if served:
+            return None
+        with tracer.span("command", "stage", command=conf_all["command"]):
+            return app_commands[conf_all["command"]](
+                conf_global = conf_global,
+                conf_user = conf_user,
+                conf_all = conf_all,
+                plugin_langs = plugin_langs,
+                plugin_runners = plugin_runners,
+                plugin_sites = plugin_sites,
+                config_paths = config_paths)
+
+    # Waiting for the problems would block the server (client of the server
+    # waits itself).
+    if served and conf_all["wait"]:
+        return None
 
-    # Normalize location member (should be URL).
-    if not conf_all['location'].startswith('http://') and \
-       not conf_all['location'].startswith('https://'):
-        conf_all['location'] = 'http://' + conf_all['location']
+    # -- FETCH / PROCESS / PREPARE DATA --------------------------------------
+    # Single HTTP proxy (pooled connections, pages persisted in user's
+    # configuration directory) shared by all site-processors.
+    proxy = _proxy_get(conf_all, cache_path, served)
+    sites_loaded = set()
 
+    # Arguments of the command that are common to all contests.
+    command_args = dict(
+        conf_global = conf_global,
+        conf_user = conf_user,
+        plugin_langs = plugin_langs,
+        plugin_runners = plugin_runners,
+        plugin_sites = plugin_sites,
+        config_paths = config_paths)
+
+    if not conf_all["batch"]:
+        conf = _location_conf(conf_all, conf_all["location"],
+                              conf_all["problems"])
+        site_obj = _site_load(plugin_sites, conf, proxy, sites_loaded)
+        if conf["wait"] and not _contest_wait(site_obj, conf):
+            return ExitStatus.ERROR
+        # Problems are prepared in the order they arrive (the others are
+        # displayed in the order they were requested).
+        contest_obj, problems_objs = _contest_fetch(
+            site_obj, conf, lazy=True, ordered=conf["command"] != "prep")
+        return _command_execute(conf, site_obj, contest_obj, problems_objs,
+                                command_args)
+
+    # Batch of contests (possibly from different sites) is fetched
+    # concurrently: contests from the same site are fetched one after
+    # another (each with "--jobs" concurrent requests) and different sites
+    # are fetched in parallel.
+    try:
+        confs = [_location_conf(conf_all, location, problems)
+                 for location, problems in _batch_read(conf_all["batch"])]
+    except IOError as e:
+        error('Batch file "' + conf_all["batch"] + '" can\'t be read (' +
+              str(e) + ')!')
+        return ExitStatus.ERROR
+
+    sites = [_site_load(plugin_sites, conf, proxy, sites_loaded)
+             for conf in confs]
+    groups = {}
+    for i, site_obj in enumerate(sites):
+        groups.setdefault(site_obj.url, []).append(i)
+
+    # Interrupt reaches only the main thread, threads waiting for problems
+    # are stopped with the event.
+    cancelled = threading.Event()
+
+    # Network errors and errors of parsing unexpected pages fail only their
+    # contest (site-processors raise ValueError for pages they can't parse),
+    # errors of site-processors themselves are raised.
+    from requests.exceptions import RequestException
+    from lxml.etree import LxmlError
+    fetch_errors = (RequestException, IOError, OSError, LxmlError, ValueError)
+
+    def fetch_group(indices):
+        fetched = []
+        for i in indices:
+            try:
+                if confs[i]["wait"] and not _contest_wait(sites[i], confs[i],
+                                                          cancelled):
+                    fetched.append((i, (None, [])))
+                    continue
+                fetched.append((i, _contest_fetch(sites[i], confs[i])))
+            except fetch_errors as e:
+                fetched.append((i, e))
+        return fetched
+
+    try:
+        fetched = dict(item for group in map_parallel(fetch_group,
+                                                      list(groups.values()),
+                                                      len(groups))
+                            for item in group)
+    except KeyboardInterrupt:
+        cancelled.set()
+        error("Fetching of the batch interrupted!")
+        return ExitStatus.ERROR
+
+    # Commands are executed in the order of the batch file.
+    failed = []
+    for i, conf in enumerate(confs):
+        if isinstance(fetched[i], fetch_errors):
+            reason = "fetching failed (" + str(fetched[i]) + ")"
+        elif not fetched[i][1]:
+            reason = "no problems fetched"
+        elif _command_execute(conf, sites[i], fetched[i][0], fetched[i][1],
+                              command_args) != ExitStatus.OK:
+            reason = "command failed"
+        else:
+            reason = None
+        if reason:
+            failed.append((conf["location"], reason))
+
+    print("Prepared {0}/{1} contests".format(len(confs) - len(failed),
+                                             len(confs)))
+    for location, reason in failed:
+        error('Contest "' + location + '": ' + reason + '!')
+    return ExitStatus.ERROR if failed else ExitStatus.OK
+
+
+def _config_read(choice_langs, choice_runners):
+    """Constructs parsers (for the given choices of languages and runners)
+    and reads configuration files. Returns tuple (CLI parser, application
+    global configuration, user's configuration).
+    """
+    # Get parser arguments.
+    pargs_pack_common = get_pargs_pack_common(
+            choice_langs = choice_langs,
+            choice_runners = choice_runners,
+    )
+    pargs_pack_cli = get_pargs_pack_cli()
 
-    # -- FETCH / PROCESS / PREPARE DATA --------------------------------------
+    # Add arguments to parsers.
+    parser_config = get_bare_config_parser()
+    parser_cli = get_bare_cli_parser()
+
+    pargs_packed_add(parser_config, pargs_pack_common)
+    pargs_packed_add(parser_cli, pargs_pack_common)
+    pargs_packed_add(parser_cli, pargs_pack_cli)
+
+    # Get default application configuration (from files).
+    config_global_file, config_user_file = _config_files()
+    assert os.path.exists(config_global_file)
+    env_global = parser_config.parse_args(['@' + config_global_file])
+    conf_global = vars(env_global)
+
+    # Get user specific configuration (from files).
+    if os.path.exists(config_user_file):
+        env_user = parser_config.parse_args(['@' + config_user_file])
+        # Resolve configuration read from files
+        conf_user = dict_override(conf_global, vars(env_user))
+    else:
+        conf_user = conf_global
+
+    return parser_cli, conf_global, conf_user
+
+
+def _config_read_cached(choice_langs, choice_runners):
+    """Reads configuration (see "_config_read") once and reuses it as long as
+    choices and configuration files (their modification times and sizes) stay
+    the same. Configurations are copied, so commands can modify them.
+    """
+    key = [tuple(choice_langs), tuple(choice_runners)]
+    for path in _config_files():
+        if os.path.exists(path):
+            fstat = os.stat(path)
+            key.append((path, fstat.st_mtime, fstat.st_size))
+    key = tuple(key)
+
+    if key not in _config_cached:
+        _config_cached.clear()
+        _config_cached[key] = _config_read(choice_langs, choice_runners)
+    parser_cli, conf_global, conf_user = _config_cached[key]
+    return parser_cli, copy.deepcopy(conf_global), copy.deepcopy(conf_user)
+
+
+def _config_files():
+    """Returns tuple (application global hacrc path, user's hacrc path).
+    """
+    return (os.path.join(hac.SETTINGS_CONST["hac_root_path"],
+                         hac.SETTINGS_CONST["config_dir"],
+                         hac.SETTINGS_CONST["config_filename"]),
+            os.path.join(hac.SETTINGS_CONST["config_user_path"],
+                         hac.SETTINGS_CONST["config_filename"]))
+
+
+def _proxy_get(conf_all, cache_path, served=False):
+    """Returns HTTP proxy for the configuration. If "served" is set, proxy is
+    kept for the following commands with the same configuration (connections
+    stay open and memoized pages younger than "--cache-ttl" are reused).
+    """
+    key = (conf_all["cache_size"], conf_all["cache_ttl"], conf_all["offline"],
+           conf_all["http_timeout"], conf_all["jobs"],
+           conf_all["http_retries"])
+    if served and key in _proxies:
+        proxy = _proxies[key]
+        proxy.expire(proxy.ttl)
+        return proxy
+
+    if conf_all["cache_size"]:
+        store = RequestsStore(os.path.join(cache_path, "pages"),
+                              conf_all["cache_size"])
+    else:
+        store = None
+
+    proxy = RequestsCache(
+        store = store,
+        ttl = conf_all["cache_ttl"],
+        offline = conf_all["offline"],
+        timeout = conf_all["http_timeout"],
+        pool_size = conf_all["jobs"] or 1,
+        retries = conf_all["http_retries"] or 0)
+    if served:
+        _proxies[key] = proxy
+    return proxy
+
+
+def _batch_read(path):
+    """Reads batch file: every line contains location (CONTEST / PROBLEM)
+    optionally followed by additional problems. Empty lines and comments
+    (starting with "#") are ignored.
+
+    Returns list of tuples (location, problems).
+    """
+    batch = []
+    with open(os.path.expanduser(path), 'r') as f:
+        for line in f:
+            tokens = line.split('#')[0].split()
+            if tokens:
+                batch.append((tokens[0], tokens[1:]))
+    return batch
+
+
+def _location_conf(conf_all, location, problems):
+    """Returns configuration for the location (normalized to URL) and its
+    problems.
+    """
+    conf = dict(conf_all)
+    if not location.startswith('http://') and \
+       not location.startswith('https://'):
+        location = 'http://' + location
+    conf['location'] = location
+    conf['problems'] = problems
+    return conf
+
+
+def _site_load(plugin_sites, conf, proxy, loaded):
+    """Returns site-processor that matches location of the configuration.
+    Site-processor is set up (proxy, rate limits) the first time it's loaded
+    during the command ("loaded" tracks URLs of loaded site-processors).
+    """
     # NOTE: Matching done in two steps for testability.
 
     # Get site processor:
-    #     1) Match site-processor, gets url of matched processor.
-    site_url = plugin_match_site(plugin_sites, conf_all)
-    #     2) Extract site-processor.
-    site_matched = [site for site in plugin_sites if site_url == site.url]
-    assert site_matched
-    site_obj = site_matched[0]
+    #     1) Match site-processor (by manifest), gets url of matched processor.
+    with tracer.span("site", "stage", location=conf["location"]):
+        site_url = plugin_match_site(plugin_sites, conf)
+        #     2) Extract site-processor (load only the matched one).
+        site_matched = [site for site in plugin_sites if site_url == site.url]
+        assert site_matched
+        site_obj = plugin_load_site(site_matched[0])
+    if site_obj.url not in loaded:
+        loaded.add(site_obj.url)
+        site_obj._proxy = proxy
+
+        # Rate limit requests to the site (configuration overrides limits
+        # declared by the site-processor).
+        rate, burst = site_obj.rate_limit, site_obj.rate_burst
+        for spec in conf['rate_limit'] or []:
+            site_ref, spec_rate, spec_burst = _rate_limit_parse(spec)
+            if site_ref in (site_obj.id, site_obj.url):
+                rate, burst = spec_rate, spec_burst or burst
+        proxy.limit(site_obj.url, rate, burst)
+
+        # Print the site specific info (once per site).
+        if site_obj._info:
+            print(site_obj._info)
+    return site_obj
+
+
+def _rate_limit_parse(spec):
+    """Parses rate limit specification "SITE:RATE[:BURST]". Returns tuple
+    (site, rate, burst).
+
+    >>> _rate_limit_parse('codeforces:2:4')
+    ('codeforces', 2.0, 4)
+
+    >>> _rate_limit_parse('www.spoj.com:0.5')
+    ('www.spoj.com', 0.5, None)
+    """
+    tokens = spec.split(':')
+    try:
+        return (tokens[0], float(tokens[1]),
+                int(tokens[2]) if len(tokens) > 2 else None)
+    except (IndexError, ValueError):
+        error('Invalid rate limit "' + spec + '" (SITE:RATE[:BURST])!')
+        sys.exit(ExitStatus.ERROR)
 
-    # Print the site specific info.
-    if site_obj._info:
-        print(site_obj._info)
 
-    # Get contest data (utilize web-site processor).
-    contest_url = site_obj.match_contest(conf_all)
-    contest_obj = site_obj.get_contest(contest_url)
+def _contest_wait(site_obj, conf, cancelled=None):
+    """Polls the contest until its problems are published (until
+    site-processor matches any problems). Returns True if they are
+    available, False if waiting was interrupted or cancelled (event
+    "cancelled" is set, e.g. by the main thread while waiting in a batch).
 
-    # Get problems data (utilize web-site processor).
-    problems_urls = site_obj.match_problems(conf_all)
-    problems_objs = site_obj.get_problems(problems_urls)
+    While polling, stored pages are never fresh: they are revalidated with
+    conditional requests (see "RequestsCache.revalidating"), and requests are
+    rate limited as usual. Only warnings of the last poll are printed.
+    """
+    proxy = site_obj._proxy
+    if proxy.offline:
+        error("Problems can't be waited for in offline mode!")
+        return False
+
+    cancelled = cancelled or threading.Event()
+    interval = _wait_interval[0]
+    polls = 0
+    warnings = []
+    try:
+        with tracer.span("wait", "stage", location=conf["location"]) as span:
+            while not cancelled.is_set():
+                polls += 1
+                span.set(polls=polls)
+                with warnings_captured() as warnings, proxy.revalidating():
+                    urls = site_obj.match_problems(conf)
+                if urls:
+                    sys.stderr.write("".join(warnings))
+                    return True
+
+                if polls == 1:
+                    print('Waiting for problems of "' + conf["location"] +
+                          '" (interrupt to stop)...')
+                    sys.stdout.flush()
+                cancelled.wait(interval * random.uniform(1 - _wait_jitter,
+                                                         1 + _wait_jitter))
+                interval = min(_wait_interval[1], interval * _wait_backoff)
+    except KeyboardInterrupt:
+        # Remaining contests of the batch aren't waited for either.
+        cancelled.set()
+    sys.stderr.write("".join(warnings))
+    error('Waiting for problems of "' + conf["location"] + '" interrupted!')
+    return False
+
+
+def _contest_fetch(site_obj, conf, lazy=False, ordered=True):
+    """Fetches contest and problems data. Returns tuple (contest object, list
+    of problem objects). If "lazy" is set, problem objects are generated as
+    they are fetched instead (in the order of completion if "ordered" is not
+    set).
+    """
+    with tracer.span("contest", "stage", location=conf["location"]):
+        # Get contest data (utilize web-site processor).
+        contest_url = site_obj.match_contest(conf)
+        contest_obj = site_obj.get_contest(contest_url)
 
+        # Get problems data (utilize web-site processor).
+        problems_urls = site_obj.match_problems(conf)
 
-    # -- EXECUTE -------------------------------------------------------------
-    assert conf_all["command"] in app_commands
+    if lazy:
+        problems_objs = site_obj.iter_problems(problems_urls, conf['jobs'],
+                                               ordered)
+    else:
+        # Not "get_problems": legacy site-processors override it with
+        # "get_problems(self, urls)" (see "ISite.iter_problems").
+        problems_objs = list(site_obj.iter_problems(problems_urls,
+                                                    conf['jobs']))
+
+    return contest_obj, problems_objs
 
-    # Execute selected command with all relevant information
-    return app_commands[conf_all["command"]](
-        conf_global = conf_global,
-        conf_user = conf_user,
-        conf_all = conf_all,
-        plugin_langs = plugin_langs,
-        plugin_runners = plugin_runners,
-        plugin_sites = plugin_sites,
-        site_obj = site_obj,
-        contest_obj = contest_obj,
-        problems_objs = problems_objs)
 
+def _command_execute(conf, site_obj, contest_obj, problems_objs,
+                     command_args):
+    """Executes selected command with all relevant information.
+    """
+    assert conf["command"] in app_commands
+    with tracer.span("command", "stage", command=conf["command"],
+                     location=conf["location"]):
+        return app_commands[conf["command"]](
+            conf_all = conf,
+            site_obj = site_obj,
+            contest_obj = contest_obj,
+            problems_objs = problems_objs,
+            **command_args)
@@ -7,7 +7,8 @@
 from abc import ABCMeta, abstractmethod
 
 import hac
-from hac.util_common import with_metaclass
+from hac.util_common import with_metaclass, imap_parallel
+from hac.util_trace import tracer
 
 
 # -- Dynamic data (plugins) ---------------------------------------------------
@@ -25,6 +26,16 @@ class ISite(object):
     """Site template.
     """
 
+    # Proxy for HTTP requests (instance of hac.util_data.RequestsCache shared
+    # by all site-processors, injected before any data is fetched).
+    _proxy = None
+
+    # Politeness: at most "rate_burst" requests at once and "rate_limit"
+    # requests per second on average are sent to the site (no limit if
+    # "rate_limit" is None). Can be overridden in the configuration.
+    rate_limit = None
+    rate_burst = 1
+
     def __init__(self, name=None, id=None, url=None, time_limit_ms=2000,
                  memory_limit_kbyte=262144, source_limit_kbyte=64):
         self.name = name
@@ -63,12 +74,95 @@ class ISite(object):
         """
         pass
 
-    @abstractmethod
-    def get_problems(self, urls):
+    def get_problems(self, urls, workers=1):
         """Fetches data from the provided problem URLs and generates list of
         problem objects.
+
+        Problems are fetched concurrently (using at most "workers" threads),
+        but the order of problem objects follows the order of URLs. Problems
+        that couldn't be fetched are left out.
+
+        NOTE: site-processors written before "get_problem" was introduced
+              override "get_problems(self, urls)" instead (problems are
+              fetched one after another then, see "iter_problems").
         """
-        pass
+        return list(self.iter_problems(urls, workers))
+
+    def iter_problems(self, urls, workers=1, ordered=True):
+        """Same as "get_problems", but generates problem objects one by one,
+        as soon as they are fetched (in the order of URLs, or in the order of
+        completion if "ordered" is not set).
+        """
+        if self._legacy():
+            for prob in self.get_problems(urls):
+                if prob is not None:
+                    yield prob
+            return
+
+        for prob in imap_parallel(self._get_problem_traced, urls, workers,
+                                  ordered):
+            if prob is not None:
+                yield prob
+
+    def _legacy(self):
+        """Returns True if the site-processor overrides "get_problems" instead
+        of "get_problem".
+        """
+        cls = type(self)
+        return _function(cls.get_problems) is not \
+               _function(ISite.get_problems) and \
+               _function(cls.get_problem) is _function(ISite.get_problem)
+
+    def _get_problem_traced(self, url):
+        with tracer.span('problem', 'stage', url=url):
+            return self.get_problem(url)
+
+    def get_problem(self, url):
+        """Fetches data from the provided problem URL and generates problem
+        object (None if problem couldn't be fetched).
+        """
+        raise NotImplementedError(
+            'Site-processor "' + type(self).__name__ + '" implements neither '
+            '"get_problem(self, url)" nor "get_problems(self, urls)"!')
+
+    def get_tests(self, problem):
+        """Fetches full testcases (system-tests) of the problem. Generates
+        pairs (input, output) one by one, so that large test-sets don't have
+        to be kept in memory.
+
+        Returns None if full testcases are not available (default).
+        """
+        return None
+
+
+def _function(method):
+    """Returns function of the (unbound in Python 2) method.
+    """
+    return getattr(method, '__func__', method)
+
+
+class SiteManifest(object):
+    """Lightweight description of the site-processor. Used to select the
+    site-processor without loading its module.
+
+    Manifest of site-processor "<NAME>.py" is read from "<NAME>.json" located
+    in the same directory.
+    """
+
+    def __init__(self, name=None, id=None, url=None, path=None, site=None):
+        self.name = name
+        self.id = id
+        # Should be equal to the 'url' member of the site-processor.
+        self.url = url
+        # Path to the module of the site-processor.
+        self.path = path
+        # Site-processor object (when loaded).
+        self.site = site
+
+    @staticmethod
+    def get_props(verbose=False):
+        return ['id', 'url'] if not verbose else \
+               ['name', 'id', 'url', 'path']
 
 
 # -- Containers ---------------------------------------------------------------
@@ -13,10 +13,13 @@ _pargs_pack_cli = [
     {
         "names": ("location",),
         "params": {
+            "nargs": "?",
+            "default": "",
             "help":
 """Contest or problem identifier. It can be either:
   - contest/problem URL
   - string of form "website-ID/contest-ID"
+Source file for the "run" and "stress" commands.
 """,
             "metavar": "(CONTEST | PROBLEM)",
         }
@@ -32,6 +35,7 @@ contest specified by previous argument. Identifiers
 can be either:
   - problem's ID
   - problem's index (counting from 1)
+Testcases for the "run" command (all by default).
 """,
             "metavar": "PROBLEM"
         }
@@ -55,6 +59,10 @@ To execute command that fetches remote data and processes it run:
 
     hac [options...] ({0}) (CONTEST | PROBLEM) [PROBLEM [PROBLEM ...]]
 
+To execute command for multiple contests (listed in the batch file) run:
+
+    hac [options...] ({0}) --batch=FILE
+
 """.format(" | ".join(sorted(app_commands.keys())))
 
 _parser_cli_epilog = \
@@ -43,6 +43,36 @@ HAC_CONFIG_DIR environment variable)
             "default": False,
         },
     },
+    {
+        "names": ("--server",),
+        "params": {
+            "action": "store_true",
+            "help":
+"""run hac server (keeps plug-ins, configuration and
+HTTP connections warm); while it's running, hac
+commands are forwarded to it
+
+""",
+            "dest": "server",
+            # Not overriding "--server" given in hacrc files.
+            "default": None,
+        },
+    },
+    {
+        "names": ("--profile",),
+        "params": {
+            "action": "store_true",
+            "help":
+"""print time spent in every stage (and fetching
+statistics) at the end, set HAC_TRACE=FILE to write
+Chrome trace of the stages to FILE
+
+""",
+            "dest": "profile",
+            # Not overriding "--profile" given in hacrc files.
+            "default": None,
+        },
+    },
     (
         {
             "names": ("-v", "--verbose"),
@@ -91,14 +121,241 @@ Current directory by default.""",
         "names": ("-t", "--tests"),
         "params": {
             "type": int,
-            "choices": [0, 1],
+            "choices": [0, 1, 2],
             "help":
 """Prepare testcases (I/O samples):
   0 - no testcases
-  1 - pretests""",
+  1 - pretests
+  2 - pretests and full testcases (system-tests,
+      where available) in the compressed archive""",
             "dest": "tests"
         }
     },
+    {
+        "names": ("-j", "--jobs"),
+        "params": {
+            "type": int,
+            "help":
+"""Number of problems to fetch (or testcases to run)
+concurrently. Also the number of kept-alive
+connections per web-site.""",
+            "metavar": "N",
+            "dest": "jobs"
+        }
+    },
+    {
+        "names": ("--cache-ttl",),
+        "params": {
+            "type": int,
+            "help":
+"""Seconds for which cached web-pages are used
+without revalidation.""",
+            "metavar": "SEC",
+            "dest": "cache_ttl"
+        }
+    },
+    {
+        "names": ("--cache-size",),
+        "params": {
+            "type": int,
+            "help":
+"""Size limit of the on-disk cache of web-pages
+(in kilobytes, 0 disables the cache).""",
+            "metavar": "KB",
+            "dest": "cache_size"
+        }
+    },
+    {
+        "names": ("--http-timeout",),
+        "params": {
+            "type": float,
+            "help":
+"""Seconds to wait for the web-site to respond.""",
+            "metavar": "SEC",
+            "dest": "http_timeout"
+        }
+    },
+    {
+        "names": ("--http-retries",),
+        "params": {
+            "type": int,
+            "help":
+"""Number of times failed web requests are retried
+(with exponential backoff).""",
+            "metavar": "N",
+            "dest": "http_retries"
+        }
+    },
+    {
+        "names": ("--rate-limit",),
+        "params": {
+            "action": "append",
+            "help":
+"""Override politeness limits of the site (given by
+site's ID or URL): at most RATE requests per second
+on average and at most BURST requests at once (RATE
+0 means no limit). Can be given multiple times.""",
+            "metavar": "SITE:RATE[:BURST]",
+            "dest": "rate_limit"
+        }
+    },
+    {
+        "names": ("--offline",),
+        "params": {
+            "action": "store_true",
+            "help": """Use only cached web-pages (no network access)""",
+            "dest": "offline",
+            # Not overriding "--offline" given in hacrc files.
+            "default": None,
+        }
+    },
+    {
+        "names": ("--wait",),
+        "params": {
+            "action": "store_true",
+            "help":
+"""Wait until problems of the contest are published
+(poll the contest until they appear or until
+interrupted), then prepare them right away.""",
+            "dest": "wait",
+            # Not overriding "--wait" given in hacrc files.
+            "default": None,
+        }
+    },
+    {
+        "names": ("--time-limit",),
+        "params": {
+            "type": int,
+            "help":
+"""Time limit for the "run" command in milliseconds
+(problem's time limit by default).""",
+            "metavar": "MS",
+            "dest": "time_limit"
+        }
+    },
+    {
+        "names": ("--memory-limit",),
+        "params": {
+            "type": int,
+            "help":
+"""Memory limit for the "run" command in kilobytes
+(problem's memory limit by default).""",
+            "metavar": "KB",
+            "dest": "memory_limit"
+        }
+    },
+    {
+        "names": ("--whitespace",),
+        "params": {
+            "choices": ["tokens", "lines"],
+            "help":
+"""How the "run" command compares outputs with answers:
+  tokens - tokens are compared, any whitespace separates them
+  lines - line breaks between tokens are significant too
+          (blank lines are ignored)""",
+            "dest": "whitespace"
+        }
+    },
+    {
+        "names": ("--ignore-case",),
+        "params": {
+            "action": "store_true",
+            "help": """Compare outputs with answers case-insensitively""",
+            "dest": "ignore_case",
+            # Not overriding "--ignore-case" given in hacrc files.
+            "default": None,
+        }
+    },
+    {
+        "names": ("--abs-eps",),
+        "params": {
+            "type": float,
+            "help":
+"""Numbers in outputs are accepted if they differ from
+the answers by at most EPS (absolute error).""",
+            "metavar": "EPS",
+            "dest": "abs_eps"
+        }
+    },
+    {
+        "names": ("--rel-eps",),
+        "params": {
+            "type": float,
+            "help":
+"""Numbers in outputs are accepted if they differ from
+the answers by at most EPS times the answer (relative
+error).""",
+            "metavar": "EPS",
+            "dest": "rel_eps"
+        }
+    },
+    {
+        "names": ("--batch",),
+        "params": {
+            "help":
+"""File with contests to process in one run (instead of
+CONTEST / PROBLEM). Every line contains contest (or
+problem) identifier, optionally followed by additional
+problems. Contests are fetched concurrently.""",
+            "metavar": "FILE",
+            "dest": "batch"
+        }
+    },
+    {
+        "names": ("--generator",),
+        "params": {
+            "help":
+"""Source file of the input generator for the "stress"
+command (it gets the seed on the standard input and
+in the environment variable HAC_SEED).""",
+            "metavar": "SOURCE",
+            "dest": "generator"
+        }
+    },
+    {
+        "names": ("--reference",),
+        "params": {
+            "help":
+"""Source file of the reference (e.g. brute-force)
+solution for the "stress" command.""",
+            "metavar": "SOURCE",
+            "dest": "reference"
+        }
+    },
+    {
+        "names": ("--iterations",),
+        "params": {
+            "type": int,
+            "help": """Number of iterations of the "stress" command.""",
+            "metavar": "N",
+            "dest": "iterations"
+        }
+    },
+    {
+        "names": ("--seed",),
+        "params": {
+            "type": int,
+            "help":
+"""Seed of the first iteration of the "stress" command
+(iterations use consecutive seeds, first seed is random by
+default).""",
+            "metavar": "N",
+            "dest": "seed"
+        }
+    },
+    {
+        "names": ("--format",),
+        "params": {
+            "choices": ["text", "json", "ndjson"],
+            "help":
+"""Output format:
+  text - human readable
+  json - machine readable (single JSON document)
+  ndjson - machine readable, streamed (one JSON
+           object per line, as soon as available)""",
+            "dest": "format"
+        }
+    },
     (
         {
             "names": ("-f", "--force"),
@@ -0,0 +1,368 @@
+# -*- coding: utf-8 -*-
+"""hac server and its thin client.
+
+Server (started with "hac --server") keeps the application warm between the
+commands: modules are imported, plug-ins (and site-processors) are loaded,
+configuration is parsed, HTTP connections and memoized pages are kept. It
+listens on the Unix socket in user's cache directory and executes commands
+forwarded by clients (one at a time) in client's working directory and
+environment, output of the command is streamed back to the client. Plug-ins
+and hacrc files are read again whenever they change.
+
+Client (the "hac" command) forwards the command to the server if it's running
+and executes the command itself otherwise. Local commands ("run", "stress")
+are always executed by the client (programs they run write to the terminal
+directly), and so are the commands that wait for problems ("--wait").
+
+Messages exchanged over the socket are JSON objects (one per line):
+
+    * client sends the request {"args": [...], "prog": ..., "cwd": ...,
+      "env": {...}},
+    * server sends the output {"stream": "out" | "err", "data": ...} and
+      finally the exit status {"status": ...} (null if the command wasn't
+      executed, e.g. the request is malformed).
+
+Command is interrupted when its client disconnects (e.g. the client is
+interrupted), the server keeps serving the other clients.
+
+NOTE: this module is imported by every "hac" command, so it shouldn't import
+      the rest of the application unless the command is executed locally.
+"""
+import os
+import sys
+import json
+import errno
+import time
+import signal
+import socket
+import threading
+import traceback
+try:
+    import _thread
+except ImportError:
+    import thread as _thread
+
+if sys.version_info.major == 2:
+    text_type = unicode
+else:
+    text_type = str
+
+import hac
+from hac import ExitStatus
+from hac.util_common import error
+
+
+def socket_path():
+    """Returns path of the server's socket.
+    """
+    return os.path.join(hac.SETTINGS_CONST["config_user_path"],
+                        hac.SETTINGS_CONST["cache_dir"],
+                        "server" + os.extsep + "sock")
+
+
+def _native(text):
+    """Returns text as the native string (decoded JSON strings are unicode in
+    Python 2).
+    """
+    if sys.version_info.major == 2 and isinstance(text, unicode):
+        return text.encode('utf-8')
+    return text
+
+
+class _Channel(object):
+    """Connection over which messages are exchanged (sending is thread-safe,
+    messages sent after the other side disconnects are dropped).
+    """
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.rfile = sock.makefile('rb')
+        self.closed = False
+        self.aborted = False
+        self._watched = False
+        self._lock = threading.Lock()
+
+    def send(self, **message):
+        data = (json.dumps(message) + "\n").encode('utf-8')
+        with self._lock:
+            if not self.closed:
+                try:
+                    self.sock.sendall(data)
+                except socket.error:
+                    self.closed = True
+
+    def receive(self):
+        """Returns next message (None if the other side disconnected). Raises
+        ValueError if the message is malformed.
+        """
+        line = self.rfile.readline()
+        if not line:
+            return None
+        return json.loads(line.decode('utf-8'))
+
+    def watch(self):
+        """Interrupts the main thread (KeyboardInterrupt is raised in it) if
+        the other side disconnects before "unwatch" is called. Nothing else
+        may be received meanwhile.
+        """
+        def wait():
+            try:
+                data = self.rfile.read(1)
+            except (socket.error, ValueError):
+                data = b''
+            with self._lock:
+                if self._watched and not data:
+                    self.aborted = True
+                    _thread.interrupt_main()
+
+        self._watched = True
+        thread = threading.Thread(target=wait)
+        thread.daemon = True
+        thread.start()
+
+    def unwatch(self):
+        """Stops watching. Returns True if the main thread was (or is about to
+        be) interrupted.
+        """
+        with self._lock:
+            self._watched = False
+            return self.aborted
+
+    def close(self):
+        # Shutdown wakes the thread that watches the connection.
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except socket.error:
+            pass
+        self.rfile.close()
+        self.sock.close()
+
+
+class _Stream(object):
+    """File-like object which sends written text to the client.
+    """
+
+    def __init__(self, channel, name):
+        self.channel = channel
+        self.name = name
+
+    def write(self, text):
+        if text:
+            if not isinstance(text, text_type):
+                text = text.decode('utf-8', 'replace')
+            self.channel.send(stream=self.name, data=text)
+
+    def flush(self):
+        pass
+
+    def isatty(self):
+        return False
+
+
+def _connect(path):
+    """Returns channel connected to the server (None if no server listens on
+    the socket).
+    """
+    if not hasattr(socket, 'AF_UNIX') or not os.path.exists(path):
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except socket.error:
+        sock.close()
+        return None
+    return _Channel(sock)
+
+
+def forward(args, path=None):
+    """Forwards the command (list of command-line arguments) to the server.
+    Returns exit status of the command, None if it wasn't executed by the
+    server (no server is running or command has to be executed locally).
+    """
+    channel = _connect(path or socket_path())
+    if channel is None:
+        return None
+
+    streams = {'out': sys.stdout, 'err': sys.stderr}
+    try:
+        channel.send(args=list(args), prog=sys.argv[0], cwd=os.getcwd(),
+                     env=dict(os.environ))
+        while True:
+            message = channel.receive()
+            if message is None:
+                error("Connection to the hac server was lost!")
+                return ExitStatus.ERROR
+            if 'status' in message:
+                return message['status']
+            stream = streams[message['stream']]
+            stream.write(_native(message['data']))
+            stream.flush()
+    finally:
+        channel.close()
+
+
+def _exit_status(code):
+    """Returns exit status for the code of SystemExit.
+    """
+    if code is None:
+        return ExitStatus.OK
+    if isinstance(code, int):
+        return code
+    sys.stderr.write(str(code) + os.linesep)
+    return ExitStatus.ERROR
+
+
+def _request_read(channel):
+    """Returns tuple (arguments, program name, working directory,
+    environment) of the command requested by the client, None if the client
+    disconnected. Raises ValueError if the request is malformed.
+    """
+    try:
+        request = channel.receive()
+        if request is None:
+            return None
+        return ([_native(arg) for arg in request['args']],
+                _native(request['prog']), _native(request['cwd']),
+                {_native(k): _native(v) for k, v in request['env'].items()})
+    except (KeyError, TypeError, AttributeError) as e:
+        raise ValueError("missing or invalid field " + str(e))
+
+
+def _interrupt_wait():
+    """Waits for the pending interrupt of the main thread.
+    """
+    while True:
+        time.sleep(0.01)
+
+
+def _execute(channel, execute):
+    """Executes command requested by the client (with output redirected to
+    the client). Command is interrupted if the client disconnects.
+    """
+    from hac.util_trace import tracer
+
+    try:
+        request = _request_read(channel)
+    except ValueError as e:
+        error("Invalid request (" + str(e) + ")!")
+        channel.send(status=None)
+        return
+    if request is None:
+        return
+    args, prog, cwd, environ = request
+
+    saved = sys.argv, os.getcwd(), dict(os.environ)
+    stdout, stderr = sys.stdout, sys.stderr
+    sys.stdout, sys.stderr = _Stream(channel, 'out'), _Stream(channel, 'err')
+    status = None
+    try:
+        try:
+            channel.watch()
+            try:
+                os.chdir(cwd)
+                os.environ.clear()
+                os.environ.update(environ)
+                tracer.reset()
+                # Program name is used in messages (e.g. in the help message).
+                sys.argv = [prog] + args
+                status = execute(args, served=True)
+            except SystemExit as e:
+                status = _exit_status(e.code)
+            except Exception:
+                traceback.print_exc()
+                status = ExitStatus.ERROR
+            finally:
+                aborted = channel.unwatch()
+            if aborted:
+                # Client disconnected after the command finished.
+                _interrupt_wait()
+        except KeyboardInterrupt:
+            if not channel.aborted:
+                raise
+    finally:
+        sys.argv, sys.stdout, sys.stderr = saved[0], stdout, stderr
+        os.environ.clear()
+        os.environ.update(saved[2])
+        os.chdir(saved[1])
+    if channel.aborted:
+        error("Command " + repr(args) + " interrupted (client disconnected)!")
+    else:
+        channel.send(status=status)
+
+
+def _interrupt(signum, frame):
+    raise KeyboardInterrupt()
+
+
+def serve(path=None):
+    """Executes commands forwarded by clients until interrupted (SIGINT or
+    SIGTERM).
+    """
+    from hac.core import main as execute
+
+    path = path or socket_path()
+    channel = _connect(path)
+    if channel is not None:
+        channel.close()
+        error('hac server is already running ("' + path + '")!')
+        return ExitStatus.ERROR
+
+    # Remove the socket left behind by the server that wasn't stopped.
+    try:
+        os.remove(path)
+    except OSError as e:
+        if e.errno != errno.ENOENT:
+            raise
+    if not os.path.isdir(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+
+    # Commands of disconnected clients are interrupted with SIGINT as well
+    # (so it can't be ignored).
+    handlers = [(signum, signal.signal(signum, _interrupt))
+                for signum in (signal.SIGINT, signal.SIGTERM)]
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    bound = False
+    try:
+        # Only the user can connect to the server.
+        umask = os.umask(0o077)
+        try:
+            sock.bind(path)
+            bound = True
+        finally:
+            os.umask(umask)
+        sock.listen(16)
+
+        print('hac server is listening on "' + path + '" (interrupt to '
+              'stop).')
+        sys.stdout.flush()
+        while True:
+            conn, _ = sock.accept()
+            channel = _Channel(conn)
+            try:
+                _execute(channel, execute)
+            finally:
+                channel.close()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sock.close()
+        if bound:
+            os.remove(path)
+        for signum, handler in handlers:
+            signal.signal(signum, handler)
+    return ExitStatus.OK
+
+
+def main(args=sys.argv[1:]):
+    """Entry point of the "hac" command: starts the server if "--server" is
+    given, otherwise forwards the command to the server (or executes it if
+    the server doesn't execute it).
+    """
+    if "--server" in args:
+        return serve()
+
+    status = forward(args)
+    if status is None:
+        from hac.core import main as execute
+        status = execute(args)
+    return status
@@ -0,0 +1,307 @@
+# -*- coding: utf-8 -*-
+"""Utilities for checking solution outputs against the expected answers.
+
+Files are read in chunks and compared token by token (tokens are separated by
+whitespace). Long tokens are compared piece by piece, so comparison works in
+constant memory irrespective of the size of the files.
+"""
+import re
+
+
+# Size of chunks read from files.
+_chunk_size = 2**16
+
+# Tokens at least this long are split into pieces of this size (so that
+# memory used doesn't depend on the length of tokens).
+_piece_size = _chunk_size
+
+# Separator of lines in the sequence of tokens (tokens never contain it).
+_line_break = b'\n'
+
+_whitespace = b' \t\n\r\f\v'
+_pattern_token = re.compile(b'[^' + _whitespace + b']+')
+_pattern_long = re.compile(b'[^' + _whitespace + b']{' +
+                           str(_piece_size).encode() + b'}')
+
+
+def _pieces(token):
+    """Splits token into pieces if it's too long. All pieces of the size
+    "_piece_size" are tuples (so that they differ from ordinary tokens) and
+    they are followed by the rest of the token (possibly empty).
+    """
+    if len(token) < _piece_size:
+        return [token]
+    pieces = [(token[i:i + _piece_size],)
+              for i in range(0, len(token) - _piece_size + 1, _piece_size)]
+    return pieces + [token[len(pieces) * _piece_size:]]
+
+
+class _Tokens(object):
+    """Reader of whitespace separated tokens from the binary file. Tokens are
+    read in batches (with a chunk of the file each). If "lines" is set, line
+    breaks between tokens are given as tokens "_line_break".
+    """
+
+    def __init__(self, f, lines=False):
+        self.f = f
+        self.lines = lines
+        self.eof = False
+        self.tail = b''        # Beginning of the token split by the chunk.
+        self.head = b''        # Part of the file with the current batch.
+        self.tokens = []       # Current batch of tokens.
+        self.i = 0             # Index of the current token in the batch.
+        self.line = 1          # Line and column of the beginning of the
+        self.col = 1           # current batch.
+        self.started = False   # True if any token was read.
+        self.newline = False   # True if line break follows the last token.
+        self.piece = False     # True if the batch ends inside of the token.
+        self.ended = False     # True if the batch starts with the (empty)
+                               # end of the token split into pieces.
+
+    def _split(self, head):
+        """Splits part of the file into tokens.
+        """
+        if not self.lines:
+            tokens = head.split()
+        else:
+            tokens = []
+            for k, line in enumerate(head.split(b'\n')):
+                words = line.split()
+                self.newline = self.newline or k > 0
+                if words:
+                    if self.newline and self.started:
+                        tokens.append(_line_break)
+                    self.newline = False
+                    self.started = True
+                    tokens.extend(words)
+
+        if _pattern_long.search(head):
+            tokens = [piece for token in tokens
+                      for piece in (_pieces(token) if token != _line_break
+                                    else [token])]
+        return tokens
+
+    def _next(self):
+        """Reads next batch of tokens.
+        """
+        nl = self.head.rfind(b'\n')
+        self.line += self.head.count(b'\n')
+        self.col = len(self.head) - nl if nl >= 0 else \
+                   self.col + len(self.head)
+
+        data = self.tail
+        if len(data) < _piece_size and not self.eof:
+            chunk = self.f.read(_chunk_size)
+            self.eof = not chunk
+            data += chunk
+
+        # Batch ends with the last whitespace in the chunk (or with the piece
+        # of the long token).
+        piece = False
+        if self.eof:
+            cut = len(data)
+        else:
+            cut = max(data.rfind(_whitespace[k:k + 1])
+                      for k in range(len(_whitespace))) + 1
+            if not cut and len(data) >= _piece_size:
+                cut, piece = _piece_size, True
+
+        self.i = 0
+        if not cut and not self.eof:
+            # Beginning of the token (shorter than the piece), rest of it
+            # follows in the next chunk (state of the batches is kept).
+            self.head, self.tail, self.tokens = b'', data, []
+            self.ended = False
+            return
+
+        self.head, self.tail = data[:cut], data[cut:]
+        self.tokens = self._split(self.head)
+        # Pieces of the long token don't depend on the batches: pieces are
+        # aligned with the beginning of the token and the last one (possibly
+        # empty) is never a tuple (see "_pieces").
+        self.ended = self.piece and not self.head[:1].strip()
+        if self.ended:
+            # Long token ended with the piece in the previous batch.
+            self.tokens.insert(0, b'')
+        if piece:
+            # Rest of the token follows in the next batch.
+            self.tokens.pop()
+        self.piece = piece
+
+    def remaining(self):
+        """Returns remaining tokens of the current batch (reads next batches
+        if needed). Returns empty list at the end of file.
+        """
+        while self.i >= len(self.tokens) and not (self.eof and
+                                                   not self.tail):
+            self._next()
+        return self.tokens[self.i:]
+
+    def position(self, k):
+        """Returns (line, column) of the k-th token of the current batch (or
+        of the end of the batch if there is no such token).
+        """
+        k = len([t for t in self.tokens[:k] if t != _line_break])
+        if self.ended:
+            # End of the token from the previous batch.
+            if k == 0:
+                return self.line, self.col
+            k -= 1
+        offset = len(self.head)
+        for match in _pattern_token.finditer(self.head):
+            parts = len(_pieces(match.group()))
+            if k < parts:
+                offset = match.start() + k * _piece_size
+                break
+            k -= parts
+
+        nl = self.head.rfind(b'\n', 0, offset)
+        return (self.line + self.head.count(b'\n', 0, offset),
+                offset - nl if nl >= 0 else self.col + offset)
+
+
+def _tokens_equal(a, b, ignore_case=False, abs_eps=0, rel_eps=0):
+    """Compares tokens. Tokens that are both numbers are equal if they differ
+    by at most "abs_eps" (absolute error) or by at most "rel_eps" times the
+    expected number (relative error).
+
+    >>> _tokens_equal(b'Yes', b'YES', ignore_case=True)
+    True
+
+    >>> _tokens_equal(b'0.333333', b'0.3333', abs_eps=1e-4)
+    True
+
+    >>> _tokens_equal(b'1000000', b'1000001', rel_eps=1e-6)
+    True
+
+    >>> _tokens_equal(b'1000000', b'1000002', rel_eps=1e-6)
+    False
+    """
+    if a == b:
+        return True
+    if isinstance(a, tuple) or isinstance(b, tuple):
+        # Pieces of long tokens are never numbers.
+        return ignore_case and isinstance(a, tuple) and \
+               isinstance(b, tuple) and a[0].lower() == b[0].lower()
+    if ignore_case and a.lower() == b.lower():
+        return True
+    if abs_eps or rel_eps:
+        try:
+            x, y = float(a), float(b)
+        except ValueError:
+            return False
+        return abs(x - y) <= abs_eps or abs(x - y) <= rel_eps * abs(x)
+    return False
+
+
+def _quoted(token):
+    """Returns printable (shortened) token.
+    """
+    if isinstance(token, tuple):
+        token = token[0]
+    text = token.decode('utf-8', 'replace')
+    return '"' + (text if len(text) <= 20 else text[:17] + '...') + '"'
+
+
+def compare_streams(f_ans, f_out, ignore_case=False, lines=False, abs_eps=0,
+                    rel_eps=0):
+    """Compares output (binary file object "f_out") with the expected answer
+    (binary file object "f_ans") token by token. Comparison stops at the
+    first mismatch.
+
+    If "lines" is set, line breaks between tokens are significant as well
+    (blank lines and whitespace at the beginning and end of lines are still
+    ignored).
+
+    Returns None if output matches the answer, otherwise returns description
+    of the first mismatch (line and column refer to the output).
+
+    >>> from io import BytesIO as B
+    >>> compare_streams(B(b'1 2\\n3\\n'), B(b'  1  2\\n\\n3'),
+    ...                 lines=True) is None
+    True
+
+    >>> compare_streams(B(b'1 2\\n3\\n'), B(b'1\\n2 3'), lines=True)
+    'line 2, column 1: expected "2" on the same line'
+
+    >>> compare_streams(B(b'1 2 3'), B(b'1 2 4'))
+    'line 1, column 5: expected "3", found "4"'
+
+    >>> compare_streams(B(b'1 2 3'), B(b'1 2\\n'))
+    'line 2, column 1: expected "3", found end of output'
+    """
+    ans, out = _Tokens(f_ans, lines), _Tokens(f_out, lines)
+    while True:
+        a, o = ans.remaining(), out.remaining()
+        n = min(len(a), len(o))
+
+        if n == 0:
+            if not a and not o:
+                return None
+            line, col = out.position(out.i)
+            where = "line {0}, column {1}: ".format(line, col)
+            if not o:
+                return where + "expected " + _quoted(a[0]) + \
+                       ", found end of output"
+            return where + "expected end of output, found " + _quoted(o[0])
+
+        # Batches are compared as a whole first (it's fast), tokens are
+        # compared one by one only if batches differ.
+        if a[:n] != o[:n]:
+            for k in range(n):
+                if _tokens_equal(a[k], o[k], ignore_case, abs_eps, rel_eps):
+                    continue
+                line, col = out.position(out.i + k)
+                where = "line {0}, column {1}: ".format(line, col)
+                if a[k] == _line_break:
+                    return where + "expected line break before " + \
+                           _quoted(o[k])
+                if o[k] == _line_break:
+                    return where + "expected " + _quoted(a[k]) + \
+                           " on the same line"
+                return where + "expected " + _quoted(a[k]) + \
+                       ", found " + _quoted(o[k])
+
+        ans.i += n
+        out.i += n
+
+
+def compare_files(path_ans, path_out, **options):
+    """Compares output file with the expected answer file (see
+    "compare_streams" for options).
+    """
+    with open(path_ans, 'rb') as f_ans:
+        with open(path_out, 'rb') as f_out:
+            return compare_streams(f_ans, f_out, **options)
+
+
+def main(argv=None):
+    """Compares output file with the answer file given on the command-line
+    (used by the shell runner). Exits with 0 if they match and with 1 (after
+    printing the first mismatch) otherwise.
+    """
+    import argparse
+    parser = argparse.ArgumentParser(prog="python -m hac.util_check")
+    parser.add_argument("answer")
+    parser.add_argument("output")
+    parser.add_argument("--whitespace", choices=["tokens", "lines"],
+                        default="lines")
+    parser.add_argument("--ignore-case", action="store_true")
+    parser.add_argument("--abs-eps", type=float, default=0)
+    parser.add_argument("--rel-eps", type=float, default=0)
+    args = parser.parse_args(argv)
+
+    mismatch = compare_files(args.answer, args.output,
+                             lines = args.whitespace == "lines",
+                             ignore_case = args.ignore_case,
+                             abs_eps = args.abs_eps,
+                             rel_eps = args.rel_eps)
+    if mismatch:
+        print(mismatch)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    import sys
+    sys.exit(main())
@@ -6,13 +6,42 @@ import sys
 import os
 import stat
 import shutil
+import threading
+from contextlib import contextmanager
 from os.path import exists, isdir
 from shutil import rmtree
 
 
 # -- Printing to CLI ----------------------------------------------------------
+# Warnings captured by the threads (see "warnings_captured").
+_captured = threading.local()
+
+
 def warn(msg):
-    sys.stderr.write("WARNING: " + msg + os.linesep)
+    text = "WARNING: " + msg + os.linesep
+    warnings = getattr(_captured, 'warnings', None)
+    if warnings is not None:
+        warnings.append(text)
+    else:
+        sys.stderr.write(text)
+
+
+@contextmanager
+def warnings_captured():
+    """Captures warnings of the current thread instead of printing them (other
+    threads print their warnings as usual). Yields list of captured warnings.
+
+    >>> with warnings_captured() as warnings:
+    ...     warn("Problem A does not exist!")
+    >>> warnings == ["WARNING: Problem A does not exist!" + os.linesep]
+    True
+    """
+    outer = getattr(_captured, 'warnings', None)
+    _captured.warnings = []
+    try:
+        yield _captured.warnings
+    finally:
+        _captured.warnings = outer
 
 def error(msg):
     sys.stderr.write("ERROR: " + msg + os.linesep)
@@ -309,6 +338,79 @@ def safe_fwrite(path, contents="", force=False, executable=False):
                                        stat.S_IXOTH)
 
 
+# -- Concurrency --------------------------------------------------------------
+def map_parallel(func, items, workers=1):
+    """Applies function to every item using at most "workers" threads.
+    Results are returned in the order of the items (irrespective of the order
+    in which they are computed).
+
+    >>> map_parallel(lambda x: x * x, [3, 1, 2], workers=2)
+    [9, 1, 4]
+
+    >>> map_parallel(lambda x: x * x, [], workers=4)
+    []
+    """
+    items = list(items)
+    if (workers or 1) <= 1 or len(items) <= 1:
+        return [func(item) for item in items]
+
+    from multiprocessing.pool import ThreadPool
+    pool = ThreadPool(min(workers, len(items)))
+    try:
+        results = pool.map(func, items)
+    except BaseException:
+        # Threads still busy (e.g. when interrupted) are abandoned.
+        pool.terminate()
+        raise
+    pool.close()
+    pool.join()
+    return results
+
+
+def imap_parallel(func, items, workers=1, ordered=True):
+    """Lazy version of "map_parallel": generates results one by one, in the
+    order of the items, as soon as they (and all results before them) are
+    computed. If "ordered" is not set, results are generated in the order of
+    completion instead.
+
+    >>> list(imap_parallel(lambda x: x * x, [3, 1, 2], workers=2))
+    [9, 1, 4]
+
+    >>> sorted(imap_parallel(lambda x: x * x, [3, 1, 2], 2, ordered=False))
+    [1, 4, 9]
+
+    Items not started yet are dropped when the generator is closed early:
+
+    >>> import time
+    >>> started = []
+    >>> results = imap_parallel(lambda x: started.append(x) or time.sleep(0.1),
+    ...                         range(50), workers=2)
+    >>> next(results)
+    >>> results.close()
+    >>> len(started) < 50
+    True
+    """
+    items = list(items)
+    if (workers or 1) <= 1 or len(items) <= 1:
+        for item in items:
+            yield func(item)
+        return
+
+    from multiprocessing.pool import ThreadPool
+    pool = ThreadPool(min(workers, len(items)))
+    try:
+        imap = pool.imap if ordered else pool.imap_unordered
+        for result in imap(func, items):
+            yield result
+    except BaseException:
+        # Items not started yet are dropped when the generator is closed
+        # before it's exhausted (or interrupted).
+        pool.terminate()
+        raise
+    pool.close()
+    pool.join()
+
+
 # -- Metaclassing (portable, works on Python2/Python3) ------------------------
 def with_metaclass(mcls):
     def decorator(cls):
@@ -6,28 +6,40 @@ NOTE: for simplicity, language and runner templates are referred to as plug-ins
 """
 import imp
 import os
+import codecs
 import sys
 import re
-import requests
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from contextlib import contextmanager
+from email.utils import parsedate_tz, mktime_tz
 from string import Template
 from difflib import SequenceMatcher
+from collections import OrderedDict
 
 if sys.version_info.major == 2:
     from urlparse import urlparse
+    text_type = unicode
 else:
     from urllib.parse import urlparse
+    text_type = str
 
 import hac
 from hac import DataType
-from hac.data import ISiteRegistry
-from hac.util_common import indent_distribute
+from hac.data import ISiteRegistry, SiteManifest
+from hac.util_common import warn, indent_distribute
+from hac.util_trace import tracer
 
 
 _plugin_fname_regex = {
     DataType.LANG: r"^(?P<temp>[^.]+)\.(?P<prio>[^.]+)\.(?P<ext>[^.]+)$",
     DataType.RUNNER: {
         'temp': r"^(?P<temp>[^.]+)\.(?P<prio>[^.]+)\.(?P<ext>[^.]+)$",
-        'part_u': r"^(?P<lang>[^.]+)\.(?P<part>[^.]+)\.{prio}\.{ext}$",
+        'part': r"^(?P<lang>[^.]+)\.(?P<part>[^.]+)\."
+                r"(?P<prio>[^.]+)\.(?P<ext>[^.]+)$",
     }
 }
 
@@ -125,93 +137,146 @@ def _plugin_discover_runners(dirs):
     "LANGUAGE-EXTENSION" to the contents of the prepared for that programming
     language.
     """
-    ftemp_pat = re.compile(_plugin_fname_regex[DataType.RUNNER]['temp'])
-    fpart_regex_u =_plugin_fname_regex[DataType.RUNNER]['part_u']
     sep_r = hac.SETTINGS_CONST['plugin_temp_sep'][DataType.RUNNER]
     pref_r = hac.SETTINGS_CONST['plugin_temp_part_prefix'][DataType.RUNNER]
 
+    temps, parts = _plugin_index_runners(dirs)
+
     runners = {}
-    for cdir_r in dirs:
-        if os.path.isdir(cdir_r):
-            for fname_r in os.listdir(cdir_r):
+    for (ext, prio), fpath_r in temps.items():
+        with open(fpath_r, 'r') as f:
+            contents_r = f.read()
+
+        # Do the templating.
+        langs = {}
+        for lang, lang_parts in parts.get((ext, prio), {}).items():
+            contents_p = {}
+            for part, fpath_p in lang_parts.items():
+                with open(fpath_p, 'r') as f:
+                    contents_p[part] = f.read()
+
+            rtemp, rparts = indent_distribute(contents_r, contents_p, pref_r)
+            template = Template(rtemp)
+            langs[lang] = template.safe_substitute(rparts)
+
+        runners[ext + sep_r + prio] = langs
+    return runners
+
+
+def _plugin_index_runners(dirs):
+    """Scans the given list of directories (each one exactly once) for runner
+    templates and runner templating parts (see "_plugin_discover_runners" for
+    the file-name formats).
+
+    Returns tuple of dictionaries:
+
+        * first maps (<RUNNER-EXTENSION>, <PRIORITY>) to the path of the
+          runner template,
+        * second maps (<RUNNER-EXTENSION>, <PRIORITY>) to the dictionary which
+          maps <LANGUAGE-EXTENSION> to the dictionary which maps <PART> to the
+          path of runner templating part.
+
+    Only the first occurrence of each template and part is indexed.
+    """
+    ftemp_pat = re.compile(_plugin_fname_regex[DataType.RUNNER]['temp'])
+    fpart_pat = re.compile(_plugin_fname_regex[DataType.RUNNER]['part'])
 
+    temps = {}
+    parts = {}
+    for cdir in dirs:
+        if os.path.isdir(cdir):
+            for fname in os.listdir(cdir):
                 # Is filename in proper runner-template format?
-                tok_r = ftemp_pat.search(fname_r)
-                if tok_r:
-                    ext = tok_r.group("ext")
-                    prio = tok_r.group("prio")
-
-                    key_r = ext + sep_r + prio
-                    fpart_regex = fpart_regex_u.format(ext=ext, prio=prio)
-                    fpart_pat = re.compile(fpart_regex)
-                    fpath_r = os.path.join(cdir_r, fname_r)
-                    with open(fpath_r, 'r') as f:
-                        contents_r = f.read()
-
-                    # Take first occurrence of runner template.
-                    if key_r not in runners:
-
-                        # Get available parts (get the first occurence).
-                        parts = {}
-                        for cdir_p in dirs:
-                            if os.path.isdir(cdir_p):
-                                for fname_p in os.listdir(cdir_p):
-                                    # Is filename in proper part format?
-                                    tok_p = fpart_pat.search(fname_p)
-                                    if tok_p:
-                                        lang = tok_p.group("lang")
-                                        part = tok_p.group("part")
-                                        fpath_p = os.path.join(cdir_p, fname_p)
-                                        with open(fpath_p, 'r') as f:
-                                            contents_p = f.read()
-
-                                        if lang not in parts:
-                                            parts[lang] = {}
-
-                                        if part not in parts[lang]:
-                                            parts[lang][part] = contents_p
-
-                        # Do the templating.
-                        langs = {}
-                        for lang in parts:
-                            rtemp, rparts = indent_distribute(contents_r,
-                                                              parts[lang],
-                                                              pref_r)
-                            template = Template(rtemp)
-                            rendered = template.safe_substitute(rparts)
-
-                            if lang not in langs:
-                                langs[lang] = rendered
-
-                        runners[key_r] = langs
-    return runners
+                tok = ftemp_pat.search(fname)
+                if tok:
+                    key = (tok.group("ext"), tok.group("prio"))
+                    if key not in temps:
+                        temps[key] = os.path.join(cdir, fname)
+                    continue
+
+                # Is filename in proper part format?
+                tok = fpart_pat.search(fname)
+                if tok:
+                    key = (tok.group("ext"), tok.group("prio"))
+                    lang_parts = parts.setdefault(key, {}) \
+                                      .setdefault(tok.group("lang"), {})
+                    if tok.group("part") not in lang_parts:
+                        lang_parts[tok.group("part")] = os.path.join(cdir,
+                                                                     fname)
+
+    return temps, parts
 
 
 # -- Sites --------------------------------------------------------------------
+def _plugin_load_module(fpath):
+    """Loads site-processor module and returns objects of all site-processor
+    classes it registers in ISiteRegistry.sites.
+    """
+    cdir, filename = os.path.split(fpath)
+    froot, _ = os.path.splitext(filename)
+    registered = len(ISiteRegistry.sites)
+
+    fname, fpath, fdescr = imp.find_module(froot, [cdir])
+    try:
+        imp.load_module(froot, fname, fpath, fdescr)
+    finally:
+        if fname:
+            fname.close()
+
+    return [site() for site in ISiteRegistry.sites[registered:]]
+
+
 def _plugin_discover_sites(dirs):
-    """Dynamically discovers all web-site processors in a given list of
-    directories.
+    """Discovers all web-site processors in a given list of directories.
 
-    Returns list of site-processor objects. When site processors in different
-    locations have the same filename, site processors occurring in an location
-    specified earlier in the input list take precedence.
+    Returns list of site-processor manifests (instances of SiteManifest).
+    When site processors in different locations have the same filename, site
+    processors occurring in an location specified earlier in the input list
+    take precedence.
 
-    All discovered classes are instantiated with empty constructor.
+    Site-processor modules are not loaded when their manifests are available
+    (see "plugin_load_site"). Modules without manifests are loaded right away
+    and all classes they register are instantiated with empty constructor.
     """
+    manifests = []
     registered = set()
     for cdir in dirs:
         if os.path.isdir(cdir):
-            for filename in os.listdir(cdir):
+            fnames = set(os.listdir(cdir))
+            for filename in sorted(fnames):
                 froot, fext = os.path.splitext(filename)
                 if (fext == ".py") and (froot not in registered):
-                    fname, fpath, fdescr = imp.find_module(froot, [cdir])
-                    if fname:
-                        # Register discovered site-processor module in
-                        # ISiteRegistry.sites
-                        mod = imp.load_module(froot, fname, fpath, fdescr)
-                        # Track registered sites
-                        registered.add(froot)
-    return [site() for site in ISiteRegistry.sites]
+                    fpath = os.path.join(cdir, filename)
+                    fmanifest = froot + os.extsep + "json"
+                    if fmanifest in fnames:
+                        with open(os.path.join(cdir, fmanifest), 'r') as f:
+                            attrs = json.load(f)
+                        manifests.append(SiteManifest(name=attrs['name'],
+                                                      id=attrs['id'],
+                                                      url=attrs['url'],
+                                                      path=fpath))
+                    else:
+                        for site in _plugin_load_module(fpath):
+                            manifests.append(SiteManifest(name=site.name,
+                                                          id=site.id,
+                                                          url=site.url,
+                                                          path=fpath,
+                                                          site=site))
+                    # Track registered sites
+                    registered.add(froot)
+    return manifests
+
+
+def plugin_load_site(manifest):
+    """Returns site-processor object described by the manifest (loads
+    site-processor module if needed).
+    """
+    if manifest.site is None:
+        for site in _plugin_load_module(manifest.path):
+            if site.url == manifest.url:
+                manifest.site = site
+    assert manifest.site, 'Manifest of "' + manifest.path + '" is invalid!'
+    return manifest.site
 
 
 def plugin_match_site(sites, conf):
@@ -256,14 +321,690 @@ def plugin_collect(paths, data_type):
     return plugin_discover([os.path.join(path, plugin_dir) for path in paths])
 
 
+def plugin_collect_parts(paths, runner):
+    """Collects (unrendered) runner templating parts of the runner template
+    "<RUNNER-EXTENSION>.<PRIORITY>" from the list of directories (earlier
+    paths take precedence, see "plugin_collect").
+
+    Returns dictionary mapping "<LANGUAGE-EXTENSION>" to the dictionary which
+    maps "<PART>" to the contents of the runner templating part.
+    """
+    plugin_dir = hac.SETTINGS_CONST["plugin_dir"][DataType.RUNNER]
+    sep_r = hac.SETTINGS_CONST['plugin_temp_sep'][DataType.RUNNER]
+    ext, prio = runner.split(sep_r)
+
+    _, parts = _plugin_index_runners([os.path.join(path, plugin_dir)
+                                      for path in paths])
+    langs = {}
+    for lang, lang_parts in parts.get((ext, prio), {}).items():
+        langs[lang] = {}
+        for part, fpath in lang_parts.items():
+            with open(fpath, 'r') as f:
+                langs[lang][part] = f.read()
+    return langs
+
+
+def _plugin_signature(paths):
+    """Returns signature of all plug-in directories: application version and
+    names, modification times and sizes of files in plug-in directories.
+
+    Byte-compiled files (created when site-processors are loaded) are not
+    part of the signature.
+    """
+    dirs = []
+    for path in paths:
+        for data_type in sorted(hac.SETTINGS_CONST["plugin_dir"]):
+            cdir = os.path.join(path,
+                                hac.SETTINGS_CONST["plugin_dir"][data_type])
+            if os.path.isdir(cdir):
+                files = []
+                for fname in sorted(os.listdir(cdir)):
+                    if fname == '__pycache__' or fname.endswith('.pyc'):
+                        continue
+                    fstat = os.stat(os.path.join(cdir, fname))
+                    files.append([fname, fstat.st_mtime, fstat.st_size])
+                dirs.append([cdir, files])
+    return {'version': hac.__version__, 'dirs': dirs}
+
+
+# Plug-ins collected by this process: {cache path: (signature, plug-ins)}.
+_plugin_collected = {}
+
+
+def plugin_collect_cached(paths, cache_path):
+    """Collects plug-ins of all types (languages, runners and sites) from the
+    list of directories (see "plugin_collect").
+
+    Collected plug-ins are saved in the "cache_path" file and reused (no
+    plug-in files are read and no runners are rendered) as long as the
+    signature of plug-in directories (see "_plugin_signature") stays the same.
+    Within the same process the very same objects are returned, so
+    site-processors loaded once stay loaded (until plug-ins change).
+
+    Returns tuple (languages, runners, sites).
+    """
+    signature = _plugin_signature(paths)
+
+    collected = _plugin_collected.get(cache_path)
+    if collected and collected[0] == signature:
+        return collected[1]
+    plugins = _plugin_collect_index(paths, cache_path, signature)
+    _plugin_collected[cache_path] = (signature, plugins)
+    return plugins
+
+
+def _plugin_collect_index(paths, cache_path, signature):
+    """Collects plug-ins through the index file (see "plugin_collect_cached").
+    """
+    try:
+        with open(cache_path, 'r') as f:
+            index = json.load(f)
+        if index['signature'] == signature:
+            return (index['langs'],
+                    index['runners'],
+                    [SiteManifest(**attrs) for attrs in index['sites']])
+    except (IOError, OSError, ValueError, KeyError, TypeError):
+        pass
+
+    langs = plugin_collect(paths, DataType.LANG)
+    runners = plugin_collect(paths, DataType.RUNNER)
+    sites = plugin_collect(paths, DataType.SITE)
+
+    index = {
+        'signature': signature,
+        'langs': langs,
+        'runners': runners,
+        'sites': [{k: site.__dict__[k]
+                   for k in SiteManifest.get_props(verbose=True)}
+                  for site in sites],
+    }
+    try:
+        if not os.path.isdir(os.path.dirname(cache_path)):
+            os.makedirs(os.path.dirname(cache_path))
+        # Temporary file is unique to each writer (processes as well as
+        # threads), so that concurrent readers never see partial index.
+        fd, cache_temp = tempfile.mkstemp(
+            prefix=os.path.basename(cache_path) + os.extsep,
+            suffix=os.extsep + 'tmp', dir=os.path.dirname(cache_path))
+        with os.fdopen(fd, 'w') as f:
+            json.dump(index, f)
+        os.rename(cache_temp, cache_path)
+    except (IOError, OSError):
+        pass
+
+    return langs, runners, sites
+
+
 # -- Web-data utilities -------------------------------------------------------
+class RequestsStore(object):
+    """Persistent (on-disk) store of fetched web-pages.
+
+    Every page is kept in two files named after the SHA-1 digest of its URL:
+
+        * <DIGEST>.json - metadata (URL, status code, validator headers, time
+          of the last fetch/revalidation),
+        * <DIGEST>.body - raw contents of the page.
+
+    Modification time of the metadata file denotes the time of the last
+    access. When total size of the store exceeds the limit, least recently
+    used pages are evicted.
+
+    Size of the store is scanned once and then tracked by saves, so the
+    store is scanned again only when the limit is exceeded (pages saved by
+    other processes are counted by the next scan).
+    """
+
+    _headers = ('content-type', 'etag', 'last-modified')
+
+    def __init__(self, path, size_kbyte):
+        self.path = path
+        self.size_kbyte = size_kbyte
+        self._size = None       # Tracked size in bytes (None if not scanned).
+        self._lock = threading.Lock()
+
+    def _fpath(self, url, ext):
+        digest = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.path, digest + os.extsep + ext)
+
+    def load(self, url):
+        """Returns (metadata, body) stored for the given URL (None if there
+        is no such page in the store).
+        """
+        fmeta = self._fpath(url, 'json')
+        fbody = self._fpath(url, 'body')
+        with tracer.span('page store load', 'fs', url=url):
+            try:
+                with open(fmeta, 'r') as f:
+                    meta = json.load(f)
+                with open(fbody, 'rb') as f:
+                    body = f.read()
+                os.utime(fmeta, None)
+            except (IOError, OSError, ValueError):
+                return None
+        return meta, body
+
+    def save(self, url, page, body=None, fetched=None):
+        """Stores page (instance of requests.Response). Body of the page can
+        be provided explicitly (when page is response to the conditional
+        request).
+        """
+        meta = {
+            'url': url,
+            'status_code': 200,
+            'encoding': page.encoding,
+            'headers': {h: page.headers[h] for h in RequestsStore._headers
+                                           if h in page.headers},
+            'time': fetched or time.time(),
+        }
+        body = page.content if body is None else body
+
+        with tracer.span('page store save', 'fs', url=url):
+            try:
+                os.makedirs(self.path)
+            except OSError:
+                # Created by the concurrent save.
+                if not os.path.isdir(self.path):
+                    raise
+
+            # Write to temporary files first (unique to each writer), so that
+            # concurrent readers never see partially written pages.
+            added = 0
+            for fpath, data, mode in ((self._fpath(url, 'body'), body, 'wb'),
+                                      (self._fpath(url, 'json'),
+                                       json.dumps(meta), 'w')):
+                try:
+                    added -= os.path.getsize(fpath)
+                except OSError:
+                    pass
+                fd, ftemp = tempfile.mkstemp(
+                    prefix=os.path.basename(fpath) + os.extsep,
+                    suffix=os.extsep + 'tmp', dir=self.path)
+                with os.fdopen(fd, mode) as f:
+                    f.write(data)
+                os.rename(ftemp, fpath)
+                added += len(data)
+
+            with self._lock:
+                if self._size is not None:
+                    self._size += added
+                exceeded = self._size is None or \
+                           self._size > self.size_kbyte * 2**10
+            if exceeded:
+                self.prune()
+
+    def prune(self):
+        """Evicts least recently used pages until the size of the store is
+        within the limit.
+        """
+        entries = []
+        total = 0
+        for fname in os.listdir(self.path):
+            froot, fext = os.path.splitext(fname)
+            if fext == os.extsep + 'json':
+                try:
+                    fmeta = os.stat(os.path.join(self.path, fname))
+                    fbody = os.stat(os.path.join(self.path, froot +
+                                                 os.extsep + 'body'))
+                except OSError:
+                    continue
+                size = fmeta.st_size + fbody.st_size
+                entries.append((fmeta.st_mtime, froot, size))
+                total += size
+
+        for _, froot, size in sorted(entries):
+            if total <= self.size_kbyte * 2**10:
+                break
+            for ext in ('json', 'body'):
+                try:
+                    os.remove(os.path.join(self.path, froot + os.extsep + ext))
+                except OSError:
+                    pass
+            total -= size
+
+        with self._lock:
+            self._size = total
+
+
+class RateLimiter(object):
+    """Token-bucket rate limiter (thread-safe). Allows at most "burst"
+    requests at once and "rate" requests per second on average (no limit if
+    "rate" is None).
+
+    When the server signals that it's overloaded, requests are blocked for a
+    while and the rate is halved; it's restored gradually with successful
+    requests.
+
+    >>> clock = [0.0]
+    >>> limiter = RateLimiter(2, burst=2, clock=lambda: clock[0])
+    >>> [limiter.delay() for _ in range(4)]
+    [0, 0, 0.5, 1.0]
+
+    >>> clock[0] = 10.0
+    >>> limiter.throttle(3)
+    >>> limiter.delay(), limiter.rate
+    (3.0, 1.0)
+    """
+
+    # Rate is never reduced below this fraction of the declared rate.
+    _rate_floor = 1.0 / 16
+
+    def __init__(self, rate=None, burst=1, clock=time.time):
+        self.rate_max = float(rate) if rate else None
+        self.rate = self.rate_max
+        self.burst = max(1, burst or 1)
+        self.clock = clock
+        self._tokens = float(self.burst)
+        self._stamp = clock()
+        self._blocked = 0.0
+        self._lock = threading.Lock()
+
+    def delay(self):
+        """Takes the token (tokens can be reserved in advance). Returns
+        number of seconds caller has to wait before the request.
+        """
+        with self._lock:
+            now = self.clock()
+            wait = 0
+            if self.rate:
+                self._tokens = min(self.burst, self._tokens +
+                                   (now - self._stamp) * self.rate) - 1
+                self._stamp = now
+                if self._tokens < 0:
+                    wait = -self._tokens / self.rate
+            return max(wait, self._blocked - now)
+
+    def acquire(self):
+        """Waits until the request is allowed. Returns number of seconds
+        waited.
+        """
+        wait = self.delay()
+        if wait > 0:
+            time.sleep(wait)
+        return max(wait, 0)
+
+    def throttle(self, seconds):
+        """Blocks requests for given number of seconds and halves the rate.
+        """
+        with self._lock:
+            self._blocked = max(self._blocked, self.clock() + seconds)
+            if self.rate:
+                self.rate = max(self.rate / 2,
+                                self.rate_max * RateLimiter._rate_floor)
+
+    def relax(self):
+        """Gradually restores the rate (after the successful request).
+        """
+        with self._lock:
+            if self.rate:
+                self.rate = min(self.rate_max,
+                                self.rate + self.rate_max / 10)
+
+
+def _retry_after(value, default):
+    """Returns number of seconds to wait according to the "Retry-After"
+    header (either number of seconds or HTTP date).
+
+    >>> _retry_after('3', 1)
+    3.0
+
+    >>> _retry_after(None, 2)
+    2
+    """
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        date = parsedate_tz(value)
+        return max(0.0, mktime_tz(date) - time.time()) if date else default
+
+
+def _host_key(host):
+    """Returns key of the host (or of the site URL) used to select the rate
+    limiter.
+
+    >>> _host_key('www.SPOJ.com:80')
+    'spoj.com'
+    """
+    host = host.lower().split(':')[0]
+    return host[4:] if host.startswith('www.') else host
+
+
+def requests_session(pool_size=1, retries=0):
+    """Creates HTTP session which keeps (at most "pool_size") connections
+    alive per host and reuses them for subsequent requests. Failed
+    connections and responses with server errors are retried (at most
+    "retries" times) with exponential backoff.
+    """
+    import requests
+    try:
+        from urllib3.util.retry import Retry
+    except ImportError:
+        from requests.packages.urllib3.util.retry import Retry
+
+    adapter = requests.adapters.HTTPAdapter(
+        pool_connections = pool_size,
+        pool_maxsize = pool_size,
+        max_retries = Retry(total=retries,
+                            backoff_factor=0.5,
+                            status_forcelist=(500, 502, 504),
+                            raise_on_status=False))
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
 class RequestsCache(object):
+    """Proxy for HTTP GET requests (shared by all site-processors).
+
+    Pages are fetched through the single pooled session and memoized (along
+    with their parsed HTML trees and JSON documents, see "get_tree" and
+    "get_json") until they are expired (see "expire"). If the on-disk store
+    is provided, pages
+    are persisted across runs: stored pages younger than "ttl" seconds are
+    used directly, older ones are revalidated with conditional requests
+    (ETag / Last-Modified). In offline mode only stored pages are used
+    (others are reported as 504 responses).
+
+    Requests to each site are rate limited (see "limit"). Responses 429 and
+    503 (server overloaded) are retried (at most "retries" times) after the
+    time given by the server (or with exponential backoff).
+    """
 
-    def __init__(self):
+    # Responses that signal that server is overloaded.
+    _status_throttle = (429, 503)
+
+    # Longest backoff (in seconds) after the server got overloaded.
+    _backoff_max = 120
+
+    def __init__(self, session=None, store=None, ttl=0, offline=False,
+                 timeout=None, pool_size=1, retries=0):
+        self.store = store
+        self.ttl = ttl or 0
+        self.offline = offline
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.retries = retries
+        self._session = session
         self._store = {}
+        self._fetched = {}
+        self._parsed = {}
+        self._limiters = {}
+        self._limiters_lock = threading.Lock()
+        self._local = threading.local()
+
+    def limit(self, site_url, rate=None, burst=1):
+        """Limits requests to the site (and its sub-domains) to at most
+        "burst" requests at once and "rate" requests per second on average.
+        Limiter of the site is kept if the limits didn't change.
+        """
+        limiter = RateLimiter(rate, burst)
+        with self._limiters_lock:
+            current = self._limiters.get(_host_key(site_url))
+            if not current or (current.rate_max, current.burst) != \
+                              (limiter.rate_max, limiter.burst):
+                self._limiters[_host_key(site_url)] = limiter
+
+    def _limiter(self, url):
+        """Returns rate limiter for the host of the URL (hosts without
+        declared limits get their own unlimited limiter).
+        """
+        host = _host_key(urlparse(url).netloc)
+        with self._limiters_lock:
+            for key, limiter in self._limiters.items():
+                if host == key or host.endswith('.' + key):
+                    return limiter
+            return self._limiters.setdefault(host, RateLimiter())
+
+    @property
+    def session(self):
+        """HTTP session (created on first use, so that nothing related to the
+        HTTP gets loaded when no pages are fetched).
+        """
+        if self._session is None:
+            self._session = requests_session(self.pool_size, self.retries)
+        return self._session
 
     def get(self, url):
-        if url not in self._store:
-            self._store[url] = requests.get(url)
-        return self._store[url]
+        start = time.time()
+        revalidate = getattr(self._local, 'revalidate', False)
+        if url in self._store and not revalidate:
+            page, cache = self._store[url], 'memory'
+        else:
+            page, cache, fetched = self._fetch(url, 0 if revalidate else
+                                                    self.ttl)
+            self._store[url] = page
+            self._fetched[url] = fetched
+        tracer.add(url, 'fetch', start, time.time() - start, cache=cache,
+                   status=page.status_code, bytes=len(page.content or b''))
+        return page
+
+    def get_tree(self, url):
+        """Returns tuple (page, parsed HTML tree of the page). Tree is None if
+        the page wasn't fetched successfully (status other than 200).
+
+        Each fetched page is parsed at most once per run, no matter how many
+        times (or by how many methods of the site-processor) it's requested.
+        """
+        return self._get_parsed(url, 'html', html_tree)
+
+    def get_json(self, url):
+        """Returns tuple (page, decoded JSON document of the page). Document
+        is None if the page wasn't fetched successfully or if it's not valid
+        JSON. Objects are decoded as ordered dictionaries.
+
+        Each fetched page is decoded at most once per run (see "get_tree").
+        """
+        return self._get_parsed(url, 'json', json_document)
+
+    @contextmanager
+    def revalidating(self):
+        """Within the context, pages requested by the current thread are
+        neither taken from memory nor considered fresh in the store: stored
+        pages are revalidated with conditional requests (other threads use
+        the proxy as usual). Fetched pages are memoized as usual.
+        """
+        outer = getattr(self._local, 'revalidate', False)
+        self._local.revalidate = True
+        try:
+            yield
+        finally:
+            self._local.revalidate = outer
+
+    def expire(self, age=None):
+        """Forgets memoized pages (and documents parsed from them) fetched more
+        than "age" seconds ago (all of them if "age" is not given). Pages that
+        weren't fetched successfully are always forgotten.
+
+        Used when the proxy outlives the single run (see "hac.server").
+        """
+        now = time.time()
+        for url, fetched in list(self._fetched.items()):
+            if age is None or now - fetched >= age or \
+               self._store[url].status_code != 200:
+                del self._store[url]
+                del self._fetched[url]
+        for key in list(self._parsed):
+            if key[1] not in self._store:
+                del self._parsed[key]
+
+    def _get_parsed(self, url, kind, parse):
+        page = self.get(url)
+        if page.status_code != 200:
+            return page, None
+
+        # Parsed document belongs to the response it was parsed from (page
+        # might have been fetched again in the meantime).
+        parsed = self._parsed.get((kind, url))
+        if parsed is None or parsed[0] is not page:
+            parsed = (page, parse(page))
+            self._parsed[(kind, url)] = parsed
+        return page, parsed[1]
+
+    def _fetch(self, url, ttl):
+        """Returns tuple (page, source of the page, time of the fetch): source
+        is "store" (stored page is younger than "ttl" seconds), "revalidated"
+        (stored page not modified), "miss" (page fetched), "offline" or
+        "error" (page not available).
+        """
+        store = self.store
+        stored = store and store.load(url)
+
+        if stored:
+            meta, body = stored
+            if self.offline or time.time() - meta['time'] < ttl:
+                return _response(url, meta, body), 'store', meta['time']
+
+        if self.offline:
+            warn('Page "' + url + '" not available offline!')
+            return _response(url, {'status_code': 504}, b''), 'offline', \
+                   time.time()
+
+        # Conditional request when page is stored.
+        headers = {}
+        if stored:
+            if 'etag' in meta['headers']:
+                headers['If-None-Match'] = meta['headers']['etag']
+            if 'last-modified' in meta['headers']:
+                headers['If-Modified-Since'] = meta['headers']['last-modified']
+
+        from requests.exceptions import RequestException
+        limiter = self._limiter(url)
+        for attempt in range(self.retries + 1):
+            start = time.time()
+            if limiter.acquire():
+                tracer.add('rate limit', 'wait', start, time.time() - start,
+                           url=url)
+            try:
+                page = self.session.get(url, headers=headers,
+                                        timeout=self.timeout)
+            except RequestException as e:
+                warn('Unable to fetch "' + url + '" (' + type(e).__name__ +
+                     ')!')
+                return _response(url, {'status_code': 504}, b''), 'error', \
+                       time.time()
+
+            if page.status_code not in RequestsCache._status_throttle:
+                limiter.relax()
+                break
+
+            # Server is overloaded, slow down all requests to the site.
+            backoff = min(RequestsCache._backoff_max,
+                          _retry_after(page.headers.get('retry-after'),
+                                       2 ** attempt))
+            limiter.throttle(backoff)
+            if attempt < self.retries:
+                warn('Site is overloaded (' + str(page.status_code) +
+                     '), retrying "' + url + '" in ' +
+                     '{0:.1f}'.format(backoff) + ' seconds.')
+
+        if stored and page.status_code == 304:
+            # Page not modified, refresh validators and the time of fetch.
+            meta['headers'].update({h: page.headers[h]
+                                    for h in RequestsStore._headers
+                                    if h in page.headers})
+            meta['time'] = time.time()
+            page = _response(url, meta, body)
+            store.save(url, page, body)
+            return page, 'revalidated', meta['time']
+        elif store and page.status_code == 200:
+            store.save(url, page)
+
+        return page, 'miss', time.time()
+
+
+def _response(url, meta, body):
+    """Reconstructs response object from the stored page.
+    """
+    import requests
+    page = requests.models.Response()
+    page.url = url
+    page.status_code = meta['status_code']
+    page.headers = requests.structures.CaseInsensitiveDict(
+                        meta.get('headers', {}))
+    page.encoding = meta.get('encoding')
+    page._content = body
+    return page
+
+
+_pattern_charset = re.compile(br'''charset\s*=\s*["']?\s*([\w.:-]+)''', re.I)
+
+_html_parsers = threading.local()
+
+
+def _html_encoding(page):
+    """Returns encoding of the HTML page: encoding given in the HTTP headers,
+    encoding declared at the beginning of the document or UTF-8 (in that
+    order). Unknown encodings are ignored.
+
+    >>> class Page(object): pass
+    >>> page = Page()
+    >>> page.headers = {'content-type': 'text/html; charset=windows-1251'}
+    >>> page.content = b'<html><head><meta charset="utf-8">'
+    >>> _html_encoding(page)
+    'windows-1251'
+
+    >>> page.headers = {'content-type': 'text/html; charset=unknown'}
+    >>> _html_encoding(page)
+    'utf-8'
+    """
+    content_type = page.headers.get('content-type', '').encode('latin-1')
+    for source in (content_type, page.content[:1024]):
+        match = _pattern_charset.search(source)
+        if match:
+            encoding = match.group(1).decode('ascii').lower()
+            try:
+                codecs.lookup(encoding)
+                return encoding
+            except LookupError:
+                pass
+    return 'utf-8'
+
+
+def html_tree(page):
+    """Parses HTML page (response object) into the element tree.
+
+    Page is parsed from bytes with the known encoding (see "_html_encoding"),
+    so that no time is spent detecting encoding of the page and decoding it
+    to text first. Parsers are reused (one per thread and encoding).
+    """
+    from lxml import etree, html
+
+    encoding = _html_encoding(page)
+    parsers = _html_parsers.__dict__
+    if encoding not in parsers:
+        parsers[encoding] = html.HTMLParser(encoding=encoding)
+    with tracer.span('html', 'parse', url=page.url):
+        return etree.fromstring(page.content, parsers[encoding])
+
+
+def json_document(page):
+    """Decodes JSON document from the page (response object). Returns None if
+    the page isn't valid JSON.
+    """
+    with tracer.span('json', 'parse', url=page.url):
+        try:
+            return json.loads(page.content.decode(page.encoding or 'utf-8'),
+                              object_pairs_hook=OrderedDict)
+        except (ValueError, LookupError):
+            return None
 
+
+def json_text(value):
+    """Returns value from the JSON document as text (empty if it's missing).
+    Decoded text is kept as it is (unicode in Python 2), so that non-ASCII
+    text isn't encoded with the default codec.
+
+    >>> text = b'Chef and Pr\\xc3\\xa9fix'.decode('utf-8')
+    >>> json_text(text) is text
+    True
+
+    >>> json_text(None), json_text(15)
+    ('', '15')
+    """
+    if value is None:
+        return ''
+    if isinstance(value, (str, text_type)):
+        return value
+    return str(value)
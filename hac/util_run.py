@@ -0,0 +1,708 @@
+# -*- coding: utf-8 -*-
+"""Utilities for compiling solutions and running them on testcases.
+
+Solutions are compiled and executed with the runner templating parts of the
+POSIX shell runner (parts "variables", "exec_compile" and "exec_run"), i.e.
+exactly the same way as the generated runners do it.
+"""
+import os
+import re
+import sys
+import math
+import time
+import shutil
+import hashlib
+import signal
+import zipfile
+import tempfile
+import resource
+import threading
+import subprocess
+from multiprocessing import Pool
+
+from hac.util_check import compare_files, compare_streams
+
+
+# Extension of the runner whose templating parts are used.
+runner_ext = "sh"
+
+# Variables that are defined by the runner template (and used by the parts).
+_runner_env = {
+    "EXT_IN": "in",
+    "EXT_OUT": "out",
+    "EXT_MYOUT": "my.out",
+}
+
+# Functions that are defined by the runner template (and used by the parts).
+_runner_prelude = """
+warn() {
+    echo "$*" >&2
+}
+die () {
+    echo "$*" >&2
+    exit 1
+}
+"""
+
+
+class Verdict(object):
+    """Testcase verdicts."""
+    OK = "OK"
+    WRONG_ANSWER = "WA"
+    RUNTIME_ERROR = "RE"
+    TIME_LIMIT = "TLE"
+    MEMORY_LIMIT = "MLE"
+    NO_ANSWER = "NA"
+
+
+# At most this many executables are kept in the build cache.
+_builds_max = 64
+
+# Solutions are started in the new session (process group), so that the whole
+# group can be killed.
+if sys.version_info >= (3, 2):
+    _new_session = {"start_new_session": True}
+else:
+    _new_session = {"preexec_fn": os.setsid}
+
+# Size of chunks in which archived inputs are fed to solutions.
+_pipe_chunk_size = 2**16
+
+# Solutions running longer than this many time-limits (wall time) are killed.
+_wall_limit_factor = 3
+
+# Process groups of the scripts running in this (worker) process.
+_running = set()
+
+
+# -- Testcases ----------------------------------------------------------------
+# Full testcases of the task are kept in the compressed archive
+# "<TASK>.tests.zip" (members "<N>.in" and "<N>.out"). Archived testcases are
+# labeled "t<N>".
+tests_archive_suffix = "tests.zip"
+_archive_label_prefix = "t"
+
+
+def tests_archive_write(path, tests):
+    """Writes testcases (pairs of input and output contents) to the
+    compressed archive one by one. Returns number of written testcases.
+    """
+    fd, path_tmp = tempfile.mkstemp(prefix=os.path.basename(path) + os.extsep,
+                                    suffix=os.extsep + 'tmp',
+                                    dir=os.path.dirname(path) or os.curdir)
+    count = 0
+    try:
+        with os.fdopen(fd, 'wb') as f, \
+             zipfile.ZipFile(f, 'w', zipfile.ZIP_DEFLATED,
+                             allowZip64=True) as archive:
+            for inp, out in tests:
+                count += 1
+                archive.writestr(str(count) + os.extsep +
+                                 _runner_env["EXT_IN"], inp)
+                archive.writestr(str(count) + os.extsep +
+                                 _runner_env["EXT_OUT"], out)
+        os.rename(path_tmp, path)
+    except BaseException:
+        # Partially written archive is discarded (e.g. when generating of
+        # testcases fails).
+        os.remove(path_tmp)
+        raise
+    return count
+
+
+def _archive_path(cdir, task):
+    """Returns path of the archive with full testcases of the task.
+    """
+    return os.path.join(cdir, task + os.extsep + tests_archive_suffix)
+
+
+def _archive_labels(cdir, task):
+    """Returns labels of the archived testcases of the task (only index of
+    the archive is read).
+    """
+    path = _archive_path(cdir, task)
+    if not os.path.isfile(path):
+        return []
+    pattern = re.compile(r"^(?P<tc>\d+)\." +
+                         re.escape(_runner_env["EXT_IN"]) + r"$")
+    with zipfile.ZipFile(path) as archive:
+        return [_archive_label_prefix + token.group("tc")
+                for token in map(pattern.search, archive.namelist()) if token]
+
+
+def testcases_find(cdir, task, selected=None):
+    """Finds testcases "<TASK>.<TESTCASE>.in" of the task in the directory
+    (and in the archive with full testcases of the task). Selected testcases
+    can be given by their <TESTCASE> labels.
+
+    Returns list of testcase names "<TASK>.<TESTCASE>" sorted by <TESTCASE>
+    (numerically where possible).
+    """
+    pattern = re.compile(r"^" + re.escape(task) + r"\.(?P<tc>[^.]+)\." +
+                         re.escape(_runner_env["EXT_IN"]) + r"$")
+    labels = set(_archive_labels(cdir, task))
+    for fname in os.listdir(cdir):
+        token = pattern.search(fname)
+        if token:
+            labels.add(token.group("tc"))
+    if selected:
+        labels = [label for label in labels if label in selected]
+
+    return [task + os.extsep + tc for tc in sorted(labels, key=_label_key)]
+
+
+def _label_key(label):
+    """Sorting key for testcase labels (numbers come first, in numerical
+    order, then labels with numerical suffix).
+
+    >>> sorted(['10', 'b', '2', 't10', 'a1', 't2'], key=_label_key)
+    ['2', '10', 'a1', 'b', 't2', 't10']
+    """
+    token = re.search(r"^(?P<prefix>\D*)(?P<num>\d+)$", label)
+    if token:
+        return (token.group("prefix") != "", token.group("prefix"),
+                int(token.group("num")))
+    return (True, label, -1)
+
+
+# -- Compiling and running ----------------------------------------------------
+def _script(parts, *names):
+    """Assembles shell script from the prelude and given templating parts.
+    """
+    return os.linesep.join([_runner_prelude, parts.get("variables", "")] +
+                           [parts.get(name, "") for name in names])
+
+
+def _env(task, **variables):
+    """Returns environment in which templating parts are executed (the
+    interpreter running hac is given in "HAC_PYTHON", so that helpers such as
+    "python -m hac.util_check" run with hac importable).
+    """
+    env = dict(os.environ)
+    env.update(_runner_env)
+    env.update(variables)
+    env["TASK"] = task
+    env["HAC_PYTHON"] = sys.executable
+    return env
+
+
+def _build_source(parts, cdir, task):
+    """Returns name of the source file (as defined by the "variables" part).
+    """
+    script = _script(parts) + '\nprintf "%s" "${TASK}.${EXT_SRC}"'
+    output = subprocess.check_output(["sh", "-c", script], cwd=cdir,
+                                     env=_env(task))
+    return output.decode('utf-8')
+
+
+def _build_key(kind, recipe, cdir, file_src):
+    """Returns key of the build (hash of the kind of the build, of the recipe
+    with compilation commands and of the source), None if the source can't
+    be read.
+    """
+    key = hashlib.sha1()
+    key.update("\n".join([kind, recipe, file_src, ""]).encode('utf-8'))
+    try:
+        with open(os.path.join(cdir, file_src), 'rb') as f:
+            key.update(f.read())
+    except (IOError, OSError):
+        return None
+    return key.hexdigest()
+
+
+def _build_snapshot(cdir):
+    """Returns modification times of the files in the directory (build
+    products are the files that are created or modified by the compilation).
+    """
+    snapshot = {}
+    for fname in os.listdir(cdir):
+        path = os.path.join(cdir, fname)
+        if os.path.isfile(path):
+            snapshot[fname] = os.path.getmtime(path)
+    return snapshot
+
+
+def _build_prune(cache_dir):
+    """Removes the least recently used builds from the build cache.
+    """
+    builds = [os.path.join(cache_dir, fname)
+              for fname in os.listdir(cache_dir)]
+    builds.sort(key=os.path.getmtime, reverse=True)
+    for build in builds[_builds_max:]:
+        if os.path.isdir(build):
+            shutil.rmtree(build, ignore_errors=True)
+        else:
+            try:
+                os.remove(build)
+            except OSError:
+                pass
+
+
+def build_restore(cache_dir, cdir, key):
+    """Restores all products of the build from the build cache into the
+    directory. Returns True if the build was cached.
+    """
+    build = os.path.join(cache_dir, key)
+    if not os.path.isdir(build):
+        return False
+    try:
+        for fname in os.listdir(build):
+            shutil.copy2(os.path.join(build, fname), os.path.join(cdir, fname))
+        os.utime(build, None)
+    except (IOError, OSError):
+        return False
+    return True
+
+
+def build_save(cache_dir, cdir, key, snapshot, exclude=()):
+    """Saves the products of the build (files in the directory created or
+    modified since the "snapshot", except the "exclude" files) to the build
+    cache. Builds without products aren't saved.
+    """
+    products = [fname for fname, mtime in _build_snapshot(cdir).items()
+                if snapshot.get(fname) != mtime and fname not in exclude]
+    if not products:
+        return
+    try:
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        build_tmp = tempfile.mkdtemp(prefix=key + os.extsep, dir=cache_dir)
+        for fname in products:
+            shutil.copy2(os.path.join(cdir, fname),
+                         os.path.join(build_tmp, fname))
+        try:
+            os.rename(build_tmp, os.path.join(cache_dir, key))
+        except OSError:
+            # Same build was saved concurrently.
+            shutil.rmtree(build_tmp, ignore_errors=True)
+        _build_prune(cache_dir)
+    except (IOError, OSError):
+        pass
+
+
+def solution_compile(parts, cdir, task, cache_dir=None):
+    """Compiles solution with the "exec_compile" part. Returns True if
+    compilation succeeded.
+
+    If "cache_dir" is given, build products (executable and any other files
+    created by the compilation) are kept there, keyed by the hash of the
+    compilation script and the source (see "build_save"). Compilation of the
+    unchanged source is skipped (products are restored from the cache).
+    """
+    script = _script(parts, "exec_compile")
+    key = None
+    if cache_dir:
+        file_src = _build_source(parts, cdir, task)
+        key = _build_key("exec", script, cdir, file_src)
+    if key and build_restore(cache_dir, cdir, key):
+        return True
+
+    snapshot = key and _build_snapshot(cdir)
+    ret = subprocess.call(["sh", "-c", script], cwd=cdir, env=_env(task))
+    if key and ret == 0:
+        build_save(cache_dir, cdir, key, snapshot, exclude=[file_src])
+    return ret == 0
+
+
+def _maxrss(usage):
+    """Returns peak resident set size [kbyte] from the resource usage (it's
+    reported in bytes on OS X).
+    """
+    if sys.platform == 'darwin':
+        return usage.ru_maxrss // 2**10
+    return usage.ru_maxrss
+
+
+def _kill(proc, killed):
+    """Kills process group of the process (and notes that it was killed).
+    """
+    killed.append(True)
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except OSError:
+        pass
+
+
+def _worker_init():
+    """Initializes the worker process: scripts it's running are killed (with
+    their process groups) when the worker is terminated, e.g. when the
+    consumer of results stops early. Otherwise they would be left running
+    (scripts run in their own sessions) and the wall time limit that kills
+    them would be gone with the worker.
+    """
+    def terminate(signum, frame):
+        for pid in list(_running):
+            try:
+                os.killpg(pid, signal.SIGKILL)
+            except OSError:
+                pass
+        os._exit(1)
+
+    signal.signal(signal.SIGTERM, terminate)
+
+
+def _feed(source, pipe):
+    """Copies input from the file object to the pipe in chunks (executed in
+    a separate thread).
+    """
+    try:
+        shutil.copyfileobj(source, pipe, _pipe_chunk_size)
+    except (IOError, OSError):
+        # Process exited without reading the whole input.
+        pass
+    finally:
+        try:
+            pipe.close()
+        except (IOError, OSError):
+            pass
+
+
+def _measured_call(script, cdir, env, time_limit_ms=None, source=None):
+    """Executes shell script and measures resources it used (including all of
+    its sub-processes). If "source" file object is given, it's fed to the
+    standard input of the script in chunks (through the pipe).
+
+    Returns tuple (exit code, wall time [ms], CPU time [ms], peak resident set
+    size [kbyte], baseline of the peak resident set size [kbyte], True if
+    killed due to the exceeded time-limit).
+
+    Peak resident set size of the calling (worker) process is inherited by
+    the script through the fork and the exec, so the measured value is exact
+    only if it's above this baseline. Otherwise the peak resident set size is
+    None (it's at most the baseline).
+    """
+    if time_limit_ms:
+        # CPU time is limited by the shell (so that nothing has to be
+        # executed in the forked process before the exec).
+        sec = int(math.ceil(time_limit_ms / 1000.0)) + 1
+        script = "ulimit -t " + str(sec) + "\n" + script
+
+    killed = []
+    with open(os.devnull, 'r+b') as devnull:
+        start = time.time()
+        proc = subprocess.Popen(["sh", "-c", script], cwd=cdir, env=env,
+                                stdin=subprocess.PIPE if source else devnull,
+                                stderr=devnull, **_new_session)
+        _running.add(proc.pid)
+        # Taken after the script was started (peak only grows), so that it
+        # covers everything allocated before the exec.
+        baseline = _maxrss(resource.getrusage(resource.RUSAGE_SELF))
+        feeder = None
+        if source:
+            feeder = threading.Thread(target=_feed,
+                                      args=(source, proc.stdin))
+            feeder.start()
+        timer = None
+        if time_limit_ms:
+            timer = threading.Timer(
+                        _wall_limit_factor * time_limit_ms / 1000.0,
+                        _kill, [proc, killed])
+            timer.start()
+
+        try:
+            _, status, usage = os.wait4(proc.pid, 0)
+        except BaseException:
+            # E.g. the worker is interrupted, the script isn't left behind.
+            if timer:
+                timer.cancel()
+            _kill(proc, killed)
+            raise
+        finally:
+            _running.discard(proc.pid)
+        wall = time.time() - start
+        if timer:
+            timer.cancel()
+        if feeder:
+            feeder.join()
+
+    if os.WIFSIGNALED(status):
+        proc.returncode = -os.WTERMSIG(status)
+    else:
+        proc.returncode = os.WEXITSTATUS(status)
+
+    maxrss = _maxrss(usage)
+    return (proc.returncode,
+            int(round(wall * 1000)),
+            int(round((usage.ru_utime + usage.ru_stime) * 1000)),
+            maxrss if maxrss > baseline else None,
+            baseline,
+            bool(killed))
+
+
+def _testcase_run(args):
+    """Runs solution on a single testcase (executed in worker processes).
+    Returns dictionary with testcase results.
+    """
+    script, cdir, task, tc, time_limit_ms, memory_limit_kbyte, check = args
+    file_in = tc + os.extsep + _runner_env["EXT_IN"]
+    file_out = tc + os.extsep + _runner_env["EXT_OUT"]
+    file_myout = tc + os.extsep + _runner_env["EXT_MYOUT"]
+    limits = (time_limit_ms, memory_limit_kbyte)
+
+    if os.path.isfile(os.path.join(cdir, file_in)):
+        try:
+            answer = open(os.path.join(cdir, file_out), 'rb')
+        except (IOError, OSError):
+            answer = None
+        try:
+            return _testcase_check(script, cdir, task, tc, file_in, None,
+                                   answer, file_myout, limits, check)
+        finally:
+            if answer:
+                answer.close()
+
+    # Archived testcases are streamed from the archive: input is fed to the
+    # solution through the pipe and output is compared with the answer
+    # decompressed on the fly. Output is kept only if the testcase didn't
+    # pass.
+    label = tc[len(task) + 1:][len(_archive_label_prefix):]
+    tmpdir = tempfile.mkdtemp(prefix='hac-')
+    file_tmpout = os.path.join(tmpdir, _runner_env["EXT_MYOUT"])
+    try:
+        with zipfile.ZipFile(_archive_path(cdir, task)) as archive:
+            try:
+                answer = archive.open(label + os.extsep +
+                                      _runner_env["EXT_OUT"])
+            except KeyError:
+                answer = None
+            try:
+                with archive.open(label + os.extsep +
+                                  _runner_env["EXT_IN"]) as source:
+                    result = _testcase_check(script, cdir, task, tc,
+                                             "/dev/stdin", source, answer,
+                                             file_tmpout, limits, check)
+            finally:
+                if answer:
+                    answer.close()
+
+        if result["verdict"] != Verdict.OK and os.path.isfile(file_tmpout):
+            shutil.move(file_tmpout, os.path.join(cdir, file_myout))
+        return result
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+def _testcase_check(script, cdir, task, tc, file_in, source, answer,
+                    file_myout, limits, check):
+    """Runs solution on the testcase input (file "file_in" or file object
+    "source" fed through the pipe) and compares its output with the answer
+    (file object, None if there's no answer). Returns dictionary with
+    testcase results.
+    """
+    time_limit_ms, memory_limit_kbyte = limits
+    env = _env(task, FILE_IN=file_in, FILE_MYOUT=file_myout)
+    exit_code, wall_ms, cpu_ms, memory_kbyte, baseline_kbyte, killed = \
+        _measured_call(script, cdir, env, time_limit_ms, source)
+
+    result = {
+        "testcase": tc,
+        "exit_code": exit_code,
+        "wall_ms": wall_ms,
+        "cpu_ms": cpu_ms,
+        "memory_kbyte": memory_kbyte,
+        "memory_baseline_kbyte": baseline_kbyte,
+        "details": None,
+    }
+    if killed or (time_limit_ms and cpu_ms > time_limit_ms):
+        result["verdict"] = Verdict.TIME_LIMIT
+    elif memory_limit_kbyte and (memory_kbyte or 0) > memory_limit_kbyte:
+        result["verdict"] = Verdict.MEMORY_LIMIT
+    elif exit_code != 0:
+        result["verdict"] = Verdict.RUNTIME_ERROR
+        result["details"] = "exit code " + str(exit_code)
+    elif not answer:
+        result["verdict"] = Verdict.NO_ANSWER
+        result["details"] = 'answer for "' + tc + '" does not exist'
+    elif not os.path.isfile(os.path.join(cdir, file_myout)):
+        result["verdict"] = Verdict.WRONG_ANSWER
+        result["details"] = 'file "' + file_myout + '" does not exist'
+    else:
+        with open(os.path.join(cdir, file_myout), 'rb') as output:
+            mismatch = compare_streams(answer, output, **check)
+        result["verdict"] = Verdict.WRONG_ANSWER if mismatch else Verdict.OK
+        result["details"] = mismatch
+    return result
+
+
+def testcases_run(parts, cdir, task, testcases, jobs=1, time_limit_ms=None,
+                  memory_limit_kbyte=None, check=None):
+    """Runs compiled solution on testcases (concurrently, in at most "jobs"
+    processes) with the "exec_run" part and compares its outputs to the
+    expected answers (with options "check" of the "compare_streams").
+
+    Wall time, CPU time and peak resident set size are measured for each
+    testcase, and time and memory limits (if given) are enforced.
+
+    Generates dictionaries with testcase results in the order of testcases.
+    """
+    script = _script(parts, "exec_run")
+    args = [(script, cdir, task, tc, time_limit_ms, memory_limit_kbyte,
+             check or {}) for tc in testcases]
+
+    if (jobs or 1) <= 1 or len(testcases) <= 1:
+        for arg in args:
+            yield _testcase_run(arg)
+        return
+
+    pool = Pool(min(jobs, len(testcases)), _worker_init)
+    try:
+        for result in pool.imap(_testcase_run, args):
+            yield result
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+# -- Stress testing -----------------------------------------------------------
+def _stress_iteration(args):
+    """Runs single iteration of the stress test (executed in worker
+    processes). Returns dictionary with iteration results.
+    """
+    programs, tmpdir, seed, time_limit_ms, check = args
+    path = os.path.join(tmpdir, str(seed))
+    file_seed = path + os.extsep + "seed"
+    file_in = path + os.extsep + _runner_env["EXT_IN"]
+    file_out = path + os.extsep + _runner_env["EXT_OUT"]
+    file_myout = path + os.extsep + _runner_env["EXT_MYOUT"]
+
+    def call(program, fin, fout, limit_ms=None):
+        script, cdir, task = program
+        env = _env(task, FILE_IN=fin, FILE_MYOUT=fout, HAC_SEED=str(seed))
+        return _measured_call(script, cdir, env, limit_ms)
+
+    result = {
+        "seed": seed,
+        "input": file_in,
+        "answer": file_out,
+        "failed": None,
+        "details": None,
+    }
+
+    # 1) Generate input (seed is given on the standard input and in the
+    #    environment variable HAC_SEED) and 2) get the expected answer from
+    #    the reference solution.
+    with open(file_seed, 'w') as f:
+        f.write(str(seed) + "\n")
+    for name, program, fin, fout in [("generator", programs[0], file_seed,
+                                      file_in),
+                                     ("reference", programs[2], file_in,
+                                      file_out)]:
+        exit_code, _, cpu_ms, _, _, killed = call(program, fin, fout,
+                                                  time_limit_ms)
+        timeout = killed or (time_limit_ms and cpu_ms > time_limit_ms)
+        if timeout or exit_code != 0:
+            result["failed"] = name
+            if timeout:
+                result["verdict"] = Verdict.TIME_LIMIT
+                result["details"] = name + ": time limit exceeded"
+            else:
+                result["verdict"] = Verdict.RUNTIME_ERROR
+                result["details"] = name + ": exit code " + str(exit_code)
+            return result
+
+    # 3) Run the solution and compare its output with the answer.
+    exit_code, _, cpu_ms, _, _, killed = call(programs[1], file_in,
+                                              file_myout, time_limit_ms)
+    if killed or (time_limit_ms and cpu_ms > time_limit_ms):
+        result["verdict"] = Verdict.TIME_LIMIT
+    elif exit_code != 0:
+        result["verdict"] = Verdict.RUNTIME_ERROR
+        result["details"] = "exit code " + str(exit_code)
+    elif not os.path.isfile(file_myout):
+        result["verdict"] = Verdict.WRONG_ANSWER
+        result["details"] = "no output"
+    else:
+        mismatch = compare_files(file_out, file_myout, **check)
+        result["verdict"] = Verdict.WRONG_ANSWER if mismatch else Verdict.OK
+        result["details"] = mismatch
+
+    # Files of passed iterations aren't needed anymore.
+    if result["verdict"] == Verdict.OK:
+        for fpath in [file_seed, file_in, file_out, file_myout]:
+            os.remove(fpath)
+    return result
+
+
+def stress_run(generator, solution, reference, tmpdir, iterations, jobs=1,
+               time_limit_ms=None, check=None, seed=1):
+    """Stress-tests compiled solution: in each iteration generator creates
+    the input (from the seed of the iteration) on which outputs of the
+    solution and of the reference solution are compared. Programs are given
+    as tuples (templating parts, directory, task) and iterations are
+    executed concurrently, in at most "jobs" processes. Files of iterations
+    are created in "tmpdir". Iterations use consecutive seeds starting with
+    "seed".
+
+    Time limit applies to all programs (generator and reference solution
+    are killed after the time limit as well, so they can't hang the
+    stress-test).
+
+    Generates dictionaries with iteration results as iterations finish (not
+    necessarily in the order of seeds). Consumer should stop (and close the
+    generator) at the first iteration that didn't pass.
+    """
+    programs = [(_script(parts, "exec_run"), cdir, task)
+                for parts, cdir, task in [generator, solution, reference]]
+    args = ((programs, tmpdir, seed, time_limit_ms, check or {})
+            for seed in range(seed, seed + iterations))
+
+    if (jobs or 1) <= 1 or iterations <= 1:
+        for arg in args:
+            yield _stress_iteration(arg)
+        return
+
+    pool = Pool(min(jobs, iterations), _worker_init)
+    try:
+        for result in pool.imap_unordered(_stress_iteration, args):
+            yield result
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def main(argv=None):
+    """Restores the build from the build cache and saves it there (used by
+    the shell runner, whose script is the recipe of the build):
+
+        * "restore" exits with 0 if the build was restored, otherwise it
+          exits with 1 and prints the state of the directory before the
+          compilation (exits with 2 if the build can't be cached),
+        * "save" (executed after the compilation) reads that state from the
+          standard input and saves the build.
+    """
+    import json
+    import argparse
+    parser = argparse.ArgumentParser(prog="python -m hac.util_run")
+    parser.add_argument("action", choices=["restore", "save"])
+    parser.add_argument("cache_dir")
+    parser.add_argument("kind")
+    parser.add_argument("recipe")
+    parser.add_argument("source")
+    args = parser.parse_args(argv)
+
+    if args.action == "save":
+        key = sys.stdin.readline().strip()
+        snapshot = json.loads(sys.stdin.readline())
+        build_save(args.cache_dir, ".", key, snapshot,
+                   exclude=[args.source, os.path.basename(args.recipe)])
+        return 0
+
+    try:
+        with open(args.recipe, 'rb') as f:
+            recipe = f.read().decode('utf-8', 'replace')
+    except (IOError, OSError):
+        return 2
+    key = _build_key(args.kind, recipe, ".", args.source)
+    if key is None:
+        return 2
+    if build_restore(args.cache_dir, ".", key):
+        return 0
+    print(key)
+    print(json.dumps(_build_snapshot(".")))
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""Utilities for timing stages of the application (profiling).
+
+Tracing is disabled by default (recording is then a no-op). When enabled,
+spans (stages, fetches, parsing, file-system work) are recorded with the
+thread they ran in, so that they can be summarized or written out in the
+Chrome trace format (viewable in "chrome://tracing" or Perfetto).
+"""
+import os
+import json
+import time
+import threading
+
+
+class _NullSpan(object):
+    """Span which records nothing (used when tracing is disabled).
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **args):
+        pass
+
+
+class _Span(object):
+    """Span recorded on exit (arguments can be added while it runs).
+    """
+
+    def __init__(self, tracer, name, cat, args):
+        self.tracer = tracer
+        self.name = name
+        self.cat = cat
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.time()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer.add(self.name, self.cat, self.start,
+                        time.time() - self.start, **self.args)
+        return False
+
+    def set(self, **args):
+        self.args.update(args)
+
+
+_null_span = _NullSpan()
+
+
+class Tracer(object):
+    """Recorder of timed events (thread-safe).
+
+    >>> tracer = Tracer()
+    >>> with tracer.span('fetch', 'stage'):
+    ...     pass
+    >>> tracer.events
+    []
+
+    >>> tracer.enable()
+    >>> with tracer.span('fetch', 'stage') as span:
+    ...     span.set(problems=3)
+    >>> [(e['name'], e['cat'], e['args']) for e in tracer.events]
+    [('fetch', 'stage', {'problems': 3})]
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.events = []
+        self.origin = time.time()
+        self._lock = threading.Lock()
+
+    def enable(self):
+        if not self.enabled:
+            self.enabled = True
+            self.origin = time.time()
+
+    def reset(self):
+        """Disables tracing and forgets recorded events.
+        """
+        with self._lock:
+            self.enabled = False
+            self.events = []
+
+    def span(self, name, cat, **args):
+        """Returns context manager which records the time spent in it.
+        """
+        if not self.enabled:
+            return _null_span
+        return _Span(self, name, cat, args)
+
+    def add(self, name, cat, start, duration, **args):
+        """Records event which started at "start" (seconds since the epoch)
+        and lasted "duration" seconds.
+        """
+        if not self.enabled:
+            return
+        event = {
+            'name': name,
+            'cat': cat,
+            'start': start - self.origin,
+            'duration': duration,
+            'thread': threading.current_thread().name,
+            'args': args,
+        }
+        with self._lock:
+            self.events.append(event)
+
+    def summary(self, slowest=5):
+        """Returns summary of recorded events: time spent in every stage,
+        statistics of fetched pages (latency, size, cache hits), parsing and
+        file-system work, and the slowest fetches.
+        """
+        with self._lock:
+            events = list(self.events)
+
+        lines = ["Profile (times in milliseconds):"]
+        totals = {}
+        for e in events:
+            if e['cat'] != 'fetch':
+                total = totals.setdefault((e['cat'], e['name']),
+                                          [0, 0.0, e['start']])
+                total[0] += 1
+                total[1] += e['duration']
+                total[2] = min(total[2], e['start'])
+        # Stages first (in the order they started), then the others.
+        for (cat, name), (count, duration, _) in sorted(
+                totals.items(),
+                key=lambda item: (_cat_order(item[0][0]), item[1][2])):
+            lines.append("  {0:<6} {1:<24} {2:>5}x {3:>10.1f}".format(
+                         cat, name, count, duration * 1000))
+
+        fetches = [e for e in events if e['cat'] == 'fetch']
+        if fetches:
+            sources = {}
+            for e in fetches:
+                sources[e['args']['cache']] = \
+                    sources.get(e['args']['cache'], 0) + 1
+            network = [e for e in fetches if e['args']['cache'] in
+                       ('miss', 'revalidated', 'error')]
+            # Waiting for the rate limiters is part of the fetch.
+            waited = sum(e['duration'] for e in events if e['cat'] == 'wait')
+            lines.append("  {0:<6} {1} pages ({2}), {3:.1f} KiB, "
+                         "{4:.1f} ms on network".format(
+                    'fetch', len(fetches),
+                    ", ".join("{0} {1}".format(sources[s], s)
+                              for s in sorted(sources)),
+                    sum(e['args']['bytes'] for e in fetches) / 1024.0,
+                    (sum(e['duration'] for e in network) - waited) * 1000))
+            for e in sorted(network, key=lambda e: -e['duration'])[:slowest]:
+                lines.append("  {0:<6} {1:>10.1f}  {2}".format(
+                             '', e['duration'] * 1000, e['name']))
+        return os.linesep.join(lines)
+
+    def write_chrome(self, path):
+        """Writes recorded events to the file in the Chrome trace format.
+        """
+        with self._lock:
+            events = list(self.events)
+
+        threads = {}
+        trace = []
+        for e in events:
+            tid = threads.setdefault(e['thread'], len(threads) + 1)
+            trace.append({
+                'name': e['name'],
+                'cat': e['cat'],
+                'ph': 'X',
+                'ts': int(e['start'] * 1e6),
+                'dur': int(e['duration'] * 1e6),
+                'pid': os.getpid(),
+                'tid': tid,
+                'args': e['args'],
+            })
+        for name, tid in threads.items():
+            trace.append({'name': 'thread_name', 'ph': 'M',
+                          'pid': os.getpid(), 'tid': tid,
+                          'args': {'name': name}})
+
+        with open(os.path.expanduser(path), 'w') as f:
+            json.dump({'traceEvents': trace, 'displayTimeUnit': 'ms'}, f)
+
+
+def _cat_order(cat):
+    """Order of categories in the summary.
+    """
+    order = ['stage', 'wait', 'parse', 'fs']
+    return order.index(cat) if cat in order else len(order)
+
+
+# Tracer shared by the whole application.
+tracer = Tracer()
@@ -13,7 +13,7 @@ class PyTest(TestCommand):
         # TODO: remove hac/config/{lang,runner} directories from test
         self.test_args = [
             '--doctest-modules', '--verbose',
-            './hac',
+            './hac', './tests',
         ]
         self.test_suite = True
 
@@ -29,7 +29,7 @@ def long_description():
 entry_points = {
     'console_scripts': [
         # When installed this way, not going through "__main__.py"
-        'hac = hac.core:main',
+        'hac = hac.server:main',
     ],
 }
 
@@ -48,7 +48,8 @@ setup(
     package_data={'hac': ['config/hacrc',
                           'config/lang/*',
                           'config/runner/*',
-                          'config/site/*.py']},
+                          'config/site/*.py',
+                          'config/site/*.json']},
     entry_points=entry_points,
     extras_require={},
     install_requires=[
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""Fixtures shared by the tests.
+"""
+import re
+from os.path import dirname, join, realpath
+
+import pytest
+import requests
+
+import hac
+import hac.core
+import hac.util_data
+from hac.util_data import RequestsCache, _plugin_load_module
+
+
+DIR_ROOT = dirname(dirname(realpath(__file__)))
+
+# Synthetic pages of the web-sites (shared with the benchmarks, see
+# "bench/fixtures/README").
+DIR_FIXTURES = join(DIR_ROOT, "bench", "fixtures")
+
+DIR_SITES = join(DIR_ROOT, "hac", "config", "site")
+
+# Loaded site-processors by their ids.
+_sites = {}
+
+
+def fixture_read(name):
+    """Returns content of the synthetic page.
+    """
+    with open(join(DIR_FIXTURES, name), 'rb') as f:
+        return f.read()
+
+
+def text(value):
+    """Returns (UTF-8 encoded) string literal as the decoded text (unicode in
+    Python 2), since u'' literals are not supported by Python 3.2.
+    """
+    return value.decode('utf-8') if isinstance(value, bytes) else value
+
+
+def site_load(site_id):
+    """Returns site-processor (its module is loaded once).
+    """
+    if site_id not in _sites:
+        _sites[site_id] = _plugin_load_module(
+                              join(DIR_SITES, site_id + ".py"))[0]
+    return _sites[site_id]
+
+
+class PagesAdapter(requests.adapters.BaseAdapter):
+    """Transport adapter which serves given pages (see "route") instead of
+    fetching them from the web. Requested URLs are recorded. Conditional
+    requests of pages served with the "ETag" header are answered with 304
+    (not modified) while the tag matches.
+    """
+
+    content_types = {
+        b'{': 'application/json;charset=UTF-8',
+        b'<': 'text/html; charset=utf-8',
+    }
+
+    def __init__(self):
+        super(PagesAdapter, self).__init__()
+        self.routes = []
+        self.requested = []
+
+    def route(self, pattern, page, status=200, headers=None):
+        """Serves page (bytes) with the given headers on URLs that match the
+        pattern (routes added later take precedence).
+        """
+        self.routes.insert(0, (re.compile(pattern), status, page,
+                               headers or {}))
+
+    def send(self, request, **kwargs):
+        self.requested.append(request.url)
+        response = requests.models.Response()
+        response.request = request
+        response.url = request.url
+        response.connection = self
+        response.status_code = 404
+        response._content = b''
+        for pattern, status, page, headers in self.routes:
+            if pattern.search(request.url):
+                response.status_code = status
+                response.headers['content-type'] = \
+                    self.content_types.get(page[:1], 'text/plain')
+                response.headers.update(headers)
+                response._content = page
+                if 'etag' in response.headers and \
+                   request.headers.get('if-none-match') == \
+                   response.headers['etag']:
+                    response.status_code = 304
+                    response._content = b''
+                break
+        response.encoding = requests.utils.get_encoding_from_headers(
+                                response.headers)
+        return response
+
+    def close(self):
+        pass
+
+
+def pages_session(adapter):
+    """Returns HTTP session which fetches pages through the adapter.
+    """
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+@pytest.fixture
+def config_dir(tmpdir, monkeypatch):
+    """Keeps user's configuration (and cache) in the temporary directory and
+    forgets configuration and proxies kept by the previous tests.
+    """
+    path = str(tmpdir.join("config"))
+    monkeypatch.setitem(hac.SETTINGS_CONST, "config_user_path", path)
+    monkeypatch.setattr(hac.core, '_config_cached', {})
+    monkeypatch.setattr(hac.core, '_proxies', {})
+    return path
+
+
+@pytest.fixture
+def pages(monkeypatch):
+    """Returns adapter through which all pages are fetched (see
+    "PagesAdapter").
+    """
+    adapter = PagesAdapter()
+
+    def session(*args, **kwargs):
+        return pages_session(adapter)
+    monkeypatch.setattr(hac.util_data, 'requests_session', session)
+    return adapter
+
+
+@pytest.fixture
+def proxy(pages):
+    """Returns HTTP proxy (without the on-disk store) which fetches pages
+    through the adapter (see "pages").
+    """
+    return RequestsCache(session=pages_session(pages))
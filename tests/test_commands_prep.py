@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""Tests of the "prep" command preparing problems as they are fetched
+(hac.commands).
+"""
+import json
+import threading
+import time
+
+from hac.commands import _command_prep
+from hac.core import _contest_fetch
+from hac.data import ISite, Contest, Problem
+
+
+class OutOfOrderSite(ISite):
+    """Site whose problems are fetched in the reverse order ("C" first).
+    Problem "B" can't be fetched. Problem "A" is fetched only after the info
+    of the problem "C" is written into the directory.
+    """
+
+    def __init__(self, workdir):
+        super(OutOfOrderSite, self).__init__()
+        self.workdir = workdir
+        self.fetched = {id: threading.Event() for id in "ABC"}
+        self.completed = []
+        self.prepared_before = None
+
+    def match_contest(self, conf):
+        return "http://stub.org/contest"
+
+    def get_contest(self, url):
+        return Contest(id="contest", url=url)
+
+    def match_problems(self, conf):
+        return ["http://stub.org/" + id for id in "ABC"]
+
+    def get_problem(self, url):
+        id = url[-1]
+        if id != "C":
+            # Wait (at most a while) for the problem after this one.
+            self.fetched[chr(ord(id) + 1)].wait(5)
+        if id == "A":
+            deadline = time.time() + 5
+            while not self.workdir.join("C.json").exists() and \
+                  time.time() < deadline:
+                time.sleep(0.01)
+            self.prepared_before = self.workdir.join("C.json").exists()
+        self.completed.append(id)
+        self.fetched[id].set()
+        if id == "B":
+            return None
+        return Problem(id=id, url=url, inputs=[id + " in"],
+                       outputs=[id + " out"], time_limit_ms=1000)
+
+
+def prep(site, workdir):
+    conf = {
+        "location": "http://stub.org/contest",
+        "problems": [],
+        "jobs": 3,
+        "workdir": str(workdir),
+        "subdir_depth": 0,
+        "force": False,
+        "lang": [],
+        "runner": [],
+        "tests": 1,
+    }
+    contest, problems = _contest_fetch(site, conf, lazy=True, ordered=False)
+    return _command_prep(conf_all=conf, site_obj=site, contest_obj=contest,
+                         problems_objs=problems, plugin_langs={},
+                         plugin_runners={})
+
+
+def test_prep_out_of_order(tmpdir):
+    site = OutOfOrderSite(tmpdir)
+    prep(site, tmpdir)
+    assert site.completed == ["C", "B", "A"]
+    # Problem is prepared as soon as it's fetched.
+    assert site.prepared_before
+
+    # Problem that couldn't be fetched doesn't drop the others.
+    assert sorted(path.basename for path in tmpdir.listdir()) == \
+           ["A.1.in", "A.1.out", "A.json", "C.1.in", "C.1.out", "C.json"]
+    assert tmpdir.join("C.1.in").read() == "C in"
+    assert tmpdir.join("A.1.out").read() == "A out"
+    for id in "AC":
+        info = json.loads(tmpdir.join(id + ".json").read())
+        assert info["id"] == id
+        assert info["url"] == "http://stub.org/" + id
+        assert info["time_limit_ms"] == 1000
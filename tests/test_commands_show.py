@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""Tests of the machine-readable output of the "show" command ("--format"
+option, hac.commands).
+"""
+import json
+
+import pytest
+
+from hac.commands import _command_show
+from hac.core import _contest_fetch
+from hac.data import ISite, Contest, Problem
+
+
+class StubSite(ISite):
+    def __init__(self):
+        super(StubSite, self).__init__(name="Stub", id="stub",
+                                       url="http://stub.org")
+
+    def match_contest(self, conf):
+        return "http://stub.org/contest"
+
+    def get_contest(self, url):
+        return Contest(id="contest", url=url)
+
+    def match_problems(self, conf):
+        return ["http://stub.org/" + id for id in "ABC"]
+
+    def get_problem(self, url):
+        return Problem(id=url[-1], url=url, inputs=["1"], outputs=["2"])
+
+
+def show(output_format, verbose=False):
+    conf = {"location": "http://stub.org/contest", "problems": [], "jobs": 3,
+            "verbose": verbose, "format": output_format}
+    site = StubSite()
+    contest, problems = _contest_fetch(site, conf, lazy=True)
+    return _command_show(conf_all=conf, conf_global={"jobs": 1},
+                         conf_user={"jobs": 3}, site_obj=site,
+                         contest_obj=contest, problems_objs=problems,
+                         plugin_langs={"py.0": ""},
+                         plugin_runners={"sh.0": {"py": ""}},
+                         plugin_sites=[])
+
+
+def test_show_json(capsys):
+    show("json")
+    data = json.loads(capsys.readouterr().out)
+    assert sorted(data) == ["conf_all", "contest_obj", "problems_objs",
+                            "site_obj"]
+    assert data["site_obj"] == {"id": "stub", "url": "http://stub.org"}
+    assert data["contest_obj"]["url"] == "http://stub.org/contest"
+    assert [p["id"] for p in data["problems_objs"]] == ["A", "B", "C"]
+
+
+def test_show_json_verbose(capsys):
+    show("json", verbose=True)
+    data = json.loads(capsys.readouterr().out)
+    assert data["conf_user"] == {"jobs": 3}
+    assert data["plugin_langs"] == ["py.0"]
+    assert data["plugin_runners"] == {"sh.0": ["py"]}
+    assert data["problems_objs"][0]["inputs"] == ["1"]
+
+
+@pytest.mark.parametrize("verbose, types", [
+    (False, ["conf_all", "site", "contest"]),
+    (True, ["conf_global", "conf_user", "conf_all", "plugin_langs",
+            "plugin_runners", "plugin_sites", "site", "contest"]),
+])
+def test_show_ndjson(capsys, verbose, types):
+    show("ndjson", verbose)
+    lines = capsys.readouterr().out.splitlines()
+    # One record per line: entries in the order of their labels, then every
+    # problem in the order of the problems.
+    records = [json.loads(line) for line in lines]
+    assert [r["type"] for r in records] == types + ["problem"] * 3
+    assert [r["data"]["id"] for r in records[-3:]] == ["A", "B", "C"]
+    assert records[types.index("site")]["data"]["id"] == "stub"
+    assert all(sorted(r) == ["data", "type"] for r in records)
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""Tests of the configuration (hacrc files overridden by the command-line,
+hac.core).
+"""
+import os
+
+import pytest
+
+import hac.core as core
+from hac.util_common import dict_override
+
+
+def conf_resolve(config_dir, hacrc, args):
+    """Returns configuration resolved from the user's hacrc (list of lines)
+    and command-line arguments.
+    """
+    if not os.path.isdir(config_dir):
+        os.makedirs(config_dir)
+    with open(os.path.join(config_dir, "hacrc"), "w") as f:
+        f.write("\n".join(hacrc) + "\n")
+    parser_cli, _, conf_user = core._config_read(LANGS, RUNNERS)
+    return dict_override(conf_user, vars(parser_cli.parse_args(args)))
+
+
+# Choices of the templates used by the global hacrc.
+LANGS = ["cpp", "cpp.5", "py", "py.5"]
+RUNNERS = ["sh", "sh.5"]
+
+# Switches (store_true options) that can be given in hacrc files.
+SWITCHES = [("--offline", "offline"),
+            ("--ignore-case", "ignore_case"),
+            ("--wait", "wait"),
+            ("--server", "server")]
+
+
+@pytest.mark.parametrize("option, dest", SWITCHES)
+def test_hacrc_switch(config_dir, option, dest):
+    conf = conf_resolve(config_dir, [option, "--abs-eps=0.5"],
+                        ["show", "codeforces.com/contest/512"])
+    assert conf[dest] is True
+    assert conf["abs_eps"] == 0.5
+
+
+@pytest.mark.parametrize("option, dest", SWITCHES)
+def test_cli_switch(config_dir, option, dest):
+    conf = conf_resolve(config_dir, [], ["show", "codeforces.com/contest/512"])
+    assert not conf[dest]
+    conf = conf_resolve(config_dir, [],
+                        ["show", "codeforces.com/contest/512", option])
+    assert conf[dest] is True
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""Tests of waiting for the problems of the contest (hac.core._contest_wait).
+"""
+import sys
+import threading
+from contextlib import contextmanager
+
+import pytest
+
+import hac.core as core
+from hac.util_common import warn, map_parallel
+
+
+class StubProxy(object):
+    offline = False
+    ttl = 3600
+
+    def __init__(self):
+        self.revalidated = []
+
+    @contextmanager
+    def revalidating(self):
+        self.revalidated.append(threading.current_thread())
+        yield
+
+
+class StubSite(object):
+    """Site whose problems are published after "polls" polls (never if
+    None). Every poll warns.
+    """
+
+    def __init__(self, polls=None):
+        self._proxy = StubProxy()
+        self.polls = polls
+        self.calls = 0
+
+    def match_problems(self, conf):
+        self.calls += 1
+        warn("poll " + str(self.calls))
+        if self.polls is not None and self.calls >= self.polls:
+            return ["A"]
+        return []
+
+
+@pytest.fixture(autouse=True)
+def fast_polls(monkeypatch):
+    monkeypatch.setattr(core, '_wait_interval', (0.01, 0.02))
+
+
+def test_wait_published(capsys):
+    stderr = sys.stderr
+    site = StubSite(polls=3)
+    assert core._contest_wait(site, {"location": "contest"})
+    assert sys.stderr is stderr
+    assert site._proxy.ttl == 3600
+    assert len(site._proxy.revalidated) == 3
+    # Only warnings of the last poll are printed.
+    assert capsys.readouterr().err == "WARNING: poll 3\n"
+
+
+def test_wait_cancelled_in_threads(capsys):
+    cancelled = threading.Event()
+    sites = [StubSite() for _ in range(3)]
+
+    def wait(site):
+        return core._contest_wait(site, {"location": "contest"}, cancelled)
+
+    timer = threading.Timer(0.2, cancelled.set)
+    timer.start()
+    assert map_parallel(wait, sites, len(sites)) == [False] * 3
+    timer.join()
+    assert all(site.calls > 1 for site in sites)
+    err = capsys.readouterr().err
+    assert err.count("interrupted!") == 3
+    # Each thread prints only the warnings of its own last poll.
+    assert err.count("WARNING:") == 3
+
+
+def test_warnings_captured_per_thread(capsys):
+    from hac.util_common import warnings_captured
+    with warnings_captured() as captured:
+        thread = threading.Thread(target=warn, args=("other thread",))
+        thread.start()
+        thread.join()
+        warn("this thread")
+    assert captured == ["WARNING: this thread\n"]
+    assert capsys.readouterr().err == "WARNING: other thread\n"
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""Tests of the batch of contests ("--batch" option, hac.core).
+"""
+import pytest
+
+import hac.core as core
+from hac import ExitStatus
+
+
+@pytest.fixture
+def batch(tmpdir):
+    path = tmpdir.join("batch.txt")
+    path.write("http://localhost/good A\n"
+               "http://localhost/bad A\n")
+    return str(path)
+
+
+@pytest.fixture
+def fetch_raising(monkeypatch):
+    """Returns function which makes fetching of the contest "bad" raise the
+    given exception.
+    """
+    contest_fetch = core._contest_fetch
+
+    def set_error(e):
+        def fetch(site_obj, conf, *args, **kwargs):
+            if conf["location"].endswith("/bad"):
+                raise e
+            return contest_fetch(site_obj, conf, *args, **kwargs)
+        monkeypatch.setattr(core, '_contest_fetch', fetch)
+    return set_error
+
+
+@pytest.mark.parametrize("command", ["run", "stress"])
+def test_batch_local_command(config_dir, batch, capsys, command):
+    with pytest.raises(SystemExit) as e:
+        core.main([command, "--batch", batch])
+    assert e.value.code == ExitStatus.ERROR
+    assert 'Option "--batch" can\'t be used with the "' + command + \
+           '" command!' in capsys.readouterr().err
+
+
+def test_batch_fetch_error(config_dir, batch, fetch_raising, capsys):
+    fetch_raising(ValueError("unexpected page"))
+    assert core.main(["show", "--batch", batch]) == ExitStatus.ERROR
+    out, err = capsys.readouterr()
+    assert "Prepared 1/2 contests" in out
+    assert 'Contest "http://localhost/bad": fetching failed (unexpected ' \
+           'page)!' in err
+
+
+@pytest.mark.parametrize("error", [NameError, KeyError, IndexError,
+                                   TypeError])
+def test_batch_site_error(config_dir, batch, fetch_raising, error):
+    fetch_raising(error("site-processor failed"))
+    with pytest.raises(error):
+        core.main(["show", "--batch", batch])
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+"""Tests of profiling ("--profile" option, hac.core).
+"""
+import os
+
+import pytest
+
+import hac.core as core
+from hac import ExitStatus
+from hac.util_trace import tracer
+
+
+@pytest.fixture(autouse=True)
+def tracer_reset(monkeypatch):
+    monkeypatch.delenv("HAC_TRACE", raising=False)
+    yield
+    tracer.reset()
+
+
+def show():
+    return core.main(["show", "http://localhost/contest", "A"])
+
+
+def test_profile_cli(config_dir, capsys):
+    assert core.main(["show", "http://localhost/contest", "A",
+                      "--profile"]) == ExitStatus.OK
+    assert "Profile (times in milliseconds):" in capsys.readouterr().err
+
+
+def test_profile_hacrc(config_dir, capsys):
+    os.makedirs(config_dir)
+    with open(os.path.join(config_dir, "hacrc"), "w") as f:
+        f.write("--profile\n")
+    assert show() == ExitStatus.OK
+    err = capsys.readouterr().err
+    assert "Profile (times in milliseconds):" in err
+    # Stages before the configuration was read are traced as well.
+    assert "plugins" in err
+
+
+def test_no_profile(config_dir, capsys):
+    assert show() == ExitStatus.OK
+    assert "Profile" not in capsys.readouterr().err
+    assert not tracer.enabled and not tracer.events
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""Tests of the site-processor interface (hac.data.ISite).
+"""
+import pytest
+
+from hac.core import _contest_fetch
+from hac.data import ISite, Contest, Problem
+
+
+class StubSite(ISite):
+    def match_contest(self, conf):
+        return "http://stub.org/contest"
+
+    def get_contest(self, url):
+        return Contest(id="contest", url=url)
+
+    def match_problems(self, conf):
+        return ["http://stub.org/" + id for id in "ABC"]
+
+
+class ProblemSite(StubSite):
+    def get_problem(self, url):
+        if url.endswith("B"):
+            return None
+        return Problem(id=url[-1], url=url)
+
+
+class LegacySite(StubSite):
+    """Site-processor written against the interface without "get_problem".
+    """
+
+    def get_problems(self, urls):
+        return [Problem(id=url[-1], url=url) for url in urls]
+
+
+class IncompleteSite(StubSite):
+    pass
+
+
+CONF = {"location": "http://stub.org/contest", "problems": [], "jobs": 4}
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_get_problem(lazy):
+    _, problems = _contest_fetch(ProblemSite(), CONF, lazy=lazy)
+    assert [p.id for p in problems] == ["A", "C"]
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_legacy_get_problems(lazy):
+    site = LegacySite()
+    _, problems = _contest_fetch(site, CONF, lazy=lazy)
+    assert [p.id for p in problems] == ["A", "B", "C"]
+    assert [p.id for p in site.get_problems(site.match_problems(CONF))] == \
+           ["A", "B", "C"]
+
+
+def test_incomplete_site():
+    site = IncompleteSite()
+    with pytest.raises(NotImplementedError) as e:
+        site.get_problems(site.match_problems(CONF), 2)
+    assert 'neither "get_problem(self, url)"' in str(e.value)
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""Tests of the hac server (hac.server) driven by clients over the socket in
+the temporary directory.
+"""
+import os
+import json
+import time
+import signal
+import socket
+import threading
+
+import pytest
+
+import hac.core
+from hac import ExitStatus
+from hac.server import serve, forward
+
+from conftest import fixture_read
+
+
+SHOW = ["show", "codeforces.com/contest/512", "A"]
+
+
+@pytest.fixture
+def server(config_dir, tmpdir):
+    """Returns function which serves on the socket (in the main thread) while
+    the client (function of the socket path) runs in another thread. Returns
+    result of the client.
+    """
+    path = str(tmpdir.join("server.sock"))
+
+    def run(client):
+        result, errors = [], []
+
+        def target():
+            try:
+                while not listening(path):
+                    time.sleep(0.01)
+                result.append(client(path))
+            except Exception as e:
+                errors.append(e)
+            finally:
+                os.kill(os.getpid(), signal.SIGTERM)
+
+        thread = threading.Thread(target=target)
+        thread.start()
+        assert serve(path) == ExitStatus.OK
+        thread.join()
+        assert not os.path.exists(path)
+        if errors:
+            raise errors[0]
+        return result[0]
+    return run
+
+
+def listening(path):
+    """Returns True if the server accepts connections on the socket.
+    """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+        return True
+    except socket.error:
+        return False
+    finally:
+        sock.close()
+
+
+def request_raw(path, line):
+    """Sends the raw line to the server. Returns reply of the server.
+    """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.connect(path)
+    try:
+        sock.sendall(line)
+        return json.loads(sock.makefile('rb').readline().decode('utf-8'))
+    finally:
+        sock.close()
+
+
+def test_forward_reuses_config_and_proxy(server, pages, monkeypatch, capsys):
+    pages.route(r"codeforces\.com/api/contest\.standings",
+                fixture_read("codeforces-api-standings.json"))
+    pages.route(r"codeforces\.com/contest/\d+/problem/\w+$",
+                fixture_read("codeforces-problem.html"))
+    config_read = hac.core._config_read
+    reads = []
+    monkeypatch.setattr(hac.core, '_config_read',
+                        lambda *args: reads.append(args) or config_read(*args))
+
+    def client(path):
+        first = forward(SHOW, path)
+        requested = len(pages.requested)
+        second = forward(SHOW, path)
+        return first, second, requested
+
+    first, second, requested = server(client)
+    assert first == second == ExitStatus.OK
+    assert requested > 0
+    # Configuration is read once, memoized pages are reused.
+    assert len(reads) == 1
+    assert len(pages.requested) == requested
+    assert len(hac.core._proxies) == 1
+    assert capsys.readouterr().out.count("http://codeforces.com/contest/512") \
+           >= 2
+
+
+def test_forward_exit_status(server, capsys):
+    def client(path):
+        return forward(["--version"], path), forward(["--unknown"], path)
+
+    assert server(client) == (ExitStatus.OK, 2)
+    captured = capsys.readouterr()
+    assert "hac v" in captured.out
+    assert "unrecognized arguments: --unknown" in captured.err
+
+
+def test_malformed_request(server, capsys):
+    def client(path):
+        return (request_raw(path, b'not json\n'),
+                request_raw(path, b'{"args": 5}\n'),
+                request_raw(path, b'\xff\n'),
+                forward(["--version"], path))
+
+    assert server(client) == ({"status": None}, {"status": None},
+                              {"status": None}, ExitStatus.OK)
+    assert capsys.readouterr().err.count("Invalid request") == 3
+
+
+def test_disconnect_interrupts_command(server, monkeypatch):
+    started, interrupted = threading.Event(), []
+
+    def execute(args, served=False):
+        if args == ["--ok"]:
+            return ExitStatus.OK
+        started.set()
+        try:
+            while True:
+                time.sleep(0.01)
+        except KeyboardInterrupt:
+            interrupted.append(args)
+            raise
+    monkeypatch.setattr(hac.core, 'main', execute)
+
+    def client(path):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(path)
+        sock.sendall(json.dumps({"args": ["--block"], "prog": "hac",
+                                 "cwd": os.getcwd(),
+                                 "env": dict(os.environ)}).encode() + b'\n')
+        started.wait(10)
+        sock.close()
+        # Server keeps serving the other clients.
+        return forward(["--ok"], path)
+
+    assert server(client) == ExitStatus.OK
+    assert interrupted == [["--block"]]
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""Tests of the CodeChef site-processor against the saved responses of its
+JSON endpoints.
+"""
+import json
+
+import pytest
+
+from conftest import fixture_read, site_load, text
+
+
+CONTEST = "https://www.codechef.com/LTIME22"
+
+API_CONTEST = r"codechef\.com/api/contests/LTIME22$"
+API_PROBLEM = r"codechef\.com/api/contests/LTIME22/problems/\w+$"
+
+
+def document(fixture, **changes):
+    """Returns saved JSON document with changed fields.
+    """
+    data = json.loads(fixture_read(fixture).decode('utf-8'))
+    data.update(changes)
+    return json.dumps(data).encode('utf-8')
+
+
+@pytest.fixture
+def site(proxy, pages):
+    pages.route(API_CONTEST, fixture_read("codechef-api-contest.json"))
+    pages.route(API_PROBLEM, fixture_read("codechef-api-problem.json"))
+    site = site_load("codechef")
+    site._proxy = proxy
+    return site
+
+
+def conf(location=CONTEST, problems=()):
+    return {"location": location, "problems": list(problems)}
+
+
+def test_match_contest(site):
+    assert site.match_contest(conf("codechef.com/ltime22/problems/SUBINC")) \
+           == CONTEST
+
+
+def test_get_contest(site):
+    contest = site.get_contest(CONTEST)
+    assert contest.id == "LTIME22"
+    assert contest.name == "August Lunchtime 2015"
+
+
+def test_get_contest_non_ascii(site, pages):
+    pages.route(API_CONTEST, document("codechef-api-contest.json",
+                                      name=text("Lunchtime été")))
+    assert site.get_contest(CONTEST).name == text("Lunchtime été")
+
+
+def test_get_contest_failed(site, pages):
+    pages.route(API_CONTEST, b'{"status": "error"}')
+    contest = site.get_contest(CONTEST)
+    assert contest.id == "LTIME22" and contest.name is None
+
+
+def test_match_problems_dict(site):
+    urls = site.match_problems(conf())
+    assert len(urls) == 10
+    assert urls[0] == CONTEST + "/problems/SUBINC"
+
+
+def test_match_problems_list(site, pages):
+    pages.route(API_CONTEST, document("codechef-api-contest.json", problems=[
+        {"code": "SUBINC"}, {"code": "WDTBAM"}, {"code": "TIMEASR"}]))
+    assert site.match_problems(conf(problems=["b", "3"])) == \
+           [CONTEST + "/problems/TIMEASR", CONTEST + "/problems/WDTBAM"]
+
+
+def test_match_problems_selected(site):
+    assert site.match_problems(conf(CONTEST + "/problems/subinc")) == \
+           [CONTEST + "/problems/SUBINC"]
+
+
+@pytest.mark.parametrize("page, status", [
+    (b'{"status": "error", "message": "contest does not exist"}', 200),
+    (b'<html>Not found</html>', 404),
+    (b'not json', 200),
+])
+def test_match_problems_failed(site, pages, capsys, page, status):
+    pages.route(API_CONTEST, page, status)
+    assert site.match_problems(conf()) == []
+    assert "Unable to fetch: " + CONTEST in capsys.readouterr().err
+
+
+def test_get_problem_statement_samples(site):
+    problem = site.get_problem(CONTEST + "/problems/SUBINC")
+    assert problem.id == "SUBINC"
+    assert problem.name == "Subsequence Inc"
+    assert problem.time_limit_ms == 1000
+    assert problem.source_limit_kbyte == 50
+    assert problem.inputs and len(problem.inputs) == len(problem.outputs)
+
+
+def test_get_problem_sample_test_cases(site, pages):
+    pages.route(API_PROBLEM, document(
+        "codechef-api-problem.json", problem_name=text("Préfix"),
+        problemComponents={"sampleTestCases": [
+            {"input": "1\n2 3\n", "output": "5\n"},
+            {"input": "0\n", "output": "0\n", "isDeleted": True},
+            {"input": "2\n", "output": "7\n"}]}))
+    problem = site.get_problem(CONTEST + "/problems/SUBINC")
+    assert problem.name == text("Préfix")
+    assert problem.inputs == ["1\n2 3", "2"]
+    assert problem.outputs == ["5", "7"]
+
+
+def test_get_problem_failed(site, pages, capsys):
+    pages.route(API_PROBLEM, b'{"status": "error"}')
+    assert site.get_problem(CONTEST + "/problems/SUBINC") is None
+    assert 'Problem "SUBINC" does not exist' in capsys.readouterr().err
+
+
+def test_match_problems_unexpected(site, pages):
+    pages.route(API_CONTEST, document("codechef-api-contest.json",
+                                      problems=[{"name": "SUBINC"}]))
+    with pytest.raises(ValueError):
+        site.match_problems(conf())
+
+
+def test_get_problem_unexpected_samples(site, pages):
+    pages.route(API_PROBLEM, document(
+        "codechef-api-problem.json",
+        problemComponents={"sampleTestCases": [{"input": "1\n"}]}))
+    with pytest.raises(ValueError):
+        site.get_problem(CONTEST + "/problems/SUBINC")
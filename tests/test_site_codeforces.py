@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""Tests of the Codeforces site-processor against the saved API response and
+pages (the contest page is used only when the API fails).
+"""
+import json
+
+import pytest
+
+from conftest import fixture_read, site_load, text
+
+
+CONTEST = "http://codeforces.com/contest/512"
+NAME = "Codeforces Round #290 (Div. 1)"
+IDS = ["A", "B", "C", "D", "E", "F"]
+
+API = r"codeforces\.com/api/contest\.standings\?contestId=512&"
+PAGE_CONTEST = r"codeforces\.com/contest/512$"
+PAGE_PROBLEM = r"codeforces\.com/contest/512/problem/\w+$"
+
+
+@pytest.fixture
+def site(proxy, pages):
+    pages.route(API, fixture_read("codeforces-api-standings.json"))
+    pages.route(PAGE_CONTEST, fixture_read("codeforces-contest.html"))
+    pages.route(PAGE_PROBLEM, fixture_read("codeforces-problem.html"))
+    site = site_load("codeforces")
+    site._proxy = proxy
+    return site
+
+
+def conf(location=CONTEST, problems=()):
+    return {"location": location, "problems": list(problems)}
+
+
+def contest_page_requested(pages):
+    return any(url.endswith("/contest/512") for url in pages.requested)
+
+
+def test_api(site, pages):
+    assert site.get_contest(CONTEST).name == NAME
+    assert site.match_problems(conf()) == \
+           [CONTEST + "/problem/" + id for id in IDS]
+    # Contest page isn't needed, API is requested once.
+    assert not contest_page_requested(pages)
+    assert len(pages.requested) == 1
+
+
+def test_api_non_ascii(site, pages):
+    data = json.loads(fixture_read("codeforces-api-standings.json")
+                      .decode('utf-8'))
+    data["result"]["contest"]["name"] = text("Раунд 290")
+    pages.route(API, json.dumps(data).encode('utf-8'))
+    assert site.get_contest(CONTEST).name == text("Раунд 290")
+
+
+@pytest.mark.parametrize("page, status", [
+    (b'{"status": "FAILED", "comment": "contestId: Contest with id 512 '
+     b'has not started"}', 400),
+    (b'<html>Codeforces is temporarily unavailable</html>', 503),
+    (b'not json', 200),
+    (b'{"status": "OK", "result": {}}', 200),
+])
+def test_api_failed_fallback(site, pages, page, status):
+    pages.route(API, page, status)
+    assert site.get_contest(CONTEST).name == NAME
+    assert site.match_problems(conf(problems=["b", "6"])) == \
+           [CONTEST + "/problem/B", CONTEST + "/problem/F"]
+    assert contest_page_requested(pages)
+
+
+def test_api_and_page_failed(site, pages, capsys):
+    pages.route(API, b'{"status": "FAILED"}', 400)
+    pages.route(PAGE_CONTEST, b'<html>Not found</html>', 404)
+    assert site.get_contest(CONTEST).name is None
+    assert site.match_problems(conf()) == []
+    assert "Unable to fetch: " + CONTEST in capsys.readouterr().err
+
+
+def test_match_problems_not_available(site, capsys):
+    assert site.match_problems(conf(CONTEST + "/problem/a", ["z"])) == \
+           [CONTEST + "/problem/A"]
+    assert 'Problem "Z" does not exist' in capsys.readouterr().err
+
+
+def test_get_problem(site):
+    problem = site.get_problem(CONTEST + "/problem/A")
+    assert problem.id == "A"
+    assert problem.name == "A. Fox And Names"
+    assert problem.time_limit_ms == 2000
+    assert problem.memory_limit_kbyte == 256 * 2**10
+    assert problem.inputs and len(problem.inputs) == len(problem.outputs)
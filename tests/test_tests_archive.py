@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""Tests of full testcases (ISite.get_tests): preparing them into the archive
+and running the solution on the archived testcases (hac.util_run).
+"""
+import os
+import zipfile
+
+import pytest
+
+from hac.commands import _command_prep
+from hac.data import ISite, Contest, Problem
+import hac.util_run as util_run
+from hac.util_run import Verdict
+
+
+class ArchiveSite(ISite):
+    """Site whose problems have full testcases "<N>" -> "<2 * N>" (None if
+    testcases aren't available). Testcases are generated lazily.
+    """
+
+    def __init__(self, count=None):
+        self.count = count
+        self.generated = 0
+
+    def match_contest(self, conf):
+        return "http://stub.org/contest"
+
+    def get_contest(self, url):
+        return Contest(id="contest", url=url)
+
+    def match_problems(self, conf):
+        return ["http://stub.org/A"]
+
+    def get_tests(self, problem):
+        if self.count is None:
+            return None
+        return self._tests()
+
+    def _tests(self):
+        for i in range(1, self.count + 1):
+            self.generated += 1
+            yield (str(i) + "\n").encode(), (str(2 * i) + "\n").encode()
+
+
+def prep(site, workdir, problem_id="A"):
+    conf = {
+        "workdir": str(workdir),
+        "subdir_depth": 0,
+        "force": False,
+        "lang": [],
+        "runner": [],
+        "tests": 2,
+    }
+    return _command_prep(conf_all=conf, site_obj=site,
+                         contest_obj=Contest(id="contest"),
+                         problems_objs=[Problem(id=problem_id)],
+                         plugin_langs={}, plugin_runners={})
+
+
+def double(cdir, tc):
+    """Returns result of the solution which doubles the input on the
+    testcase.
+    """
+    parts = {"exec_run": 'echo $((2 * $(cat "$FILE_IN"))) >"$FILE_MYOUT"'}
+    result, = util_run.testcases_run(parts, cdir, "A", [tc])
+    return result
+
+
+def test_archive_write(tmpdir):
+    path = str(tmpdir.join("A.tests.zip"))
+    count = util_run.tests_archive_write(path, iter([(b"1", b"2"),
+                                                     (b"3", b"4")]))
+    assert count == 2
+    with zipfile.ZipFile(path) as archive:
+        assert sorted(archive.namelist()) == ["1.in", "1.out", "2.in",
+                                              "2.out"]
+        assert archive.read("2.in") == b"3"
+    assert os.listdir(str(tmpdir)) == ["A.tests.zip"]
+
+
+def test_archive_write_failed(tmpdir):
+    def tests():
+        yield b"1", b"2"
+        raise ValueError("generator failed")
+
+    path = str(tmpdir.join("A.tests.zip"))
+    with pytest.raises(ValueError):
+        util_run.tests_archive_write(path, tests())
+    # Partially written archive isn't left behind.
+    assert os.listdir(str(tmpdir)) == []
+
+
+def test_prep_tests(tmpdir):
+    site = ArchiveSite(count=12)
+    prep(site, tmpdir)
+    assert site.generated == 12
+    with zipfile.ZipFile(str(tmpdir.join("A.tests.zip"))) as archive:
+        assert archive.read("12.in") == b"12\n"
+        assert archive.read("12.out") == b"24\n"
+
+
+def test_prep_tests_unavailable(tmpdir, capsys):
+    prep(ArchiveSite(), tmpdir)
+    assert not tmpdir.join("A.tests.zip").exists()
+    assert 'Full testcases for problem "A" are not available!' in \
+           capsys.readouterr().err
+
+
+def test_find_archived(tmpdir):
+    prep(ArchiveSite(count=10), tmpdir)
+    tmpdir.join("A.1.in").write("1")
+    tmpdir.join("A.x.in").write("1")
+    cdir = str(tmpdir)
+    assert util_run.testcases_find(cdir, "A") == \
+           ["A.1"] + ["A.t" + str(i) for i in range(1, 11)] + ["A.x"]
+    assert util_run.testcases_find(cdir, "A", selected=["t2", "t10"]) == \
+           ["A.t2", "A.t10"]
+
+
+def test_run_archived(tmpdir):
+    prep(ArchiveSite(count=3), tmpdir)
+    cdir = str(tmpdir)
+    result = double(cdir, "A.t3")
+    assert result["verdict"] == Verdict.OK
+    # Outputs of passed testcases aren't kept.
+    assert sorted(os.listdir(cdir)) == ["A.json", "A.tests.zip"]
+
+
+def test_run_archived_failed(tmpdir):
+    cdir = str(tmpdir)
+    util_run.tests_archive_write(str(tmpdir.join("A.tests.zip")),
+                                 [(b"1\n", b"3\n"), (b"2\n", b"4\n")])
+    result = double(cdir, "A.t1")
+    assert result["verdict"] == Verdict.WRONG_ANSWER
+    assert result["details"] == 'line 1, column 1: expected "3", found "2"'
+    # Output of the failed testcase is kept next to the archive.
+    assert tmpdir.join("A.t1.my.out").read() == "2\n"
+
+
+def test_run_archived_no_answer(tmpdir):
+    cdir = str(tmpdir)
+    path = str(tmpdir.join("A.tests.zip"))
+    with zipfile.ZipFile(path, 'w') as archive:
+        archive.writestr("1.in", b"1\n")
+    result = double(cdir, "A.t1")
+    assert result["verdict"] == Verdict.NO_ANSWER
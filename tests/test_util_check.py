@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""Tests of the streaming comparison of outputs (hac.util_check) against the
+naive comparison of whole files.
+"""
+import re
+import random
+from io import BytesIO
+
+import pytest
+
+import hac.util_check as util_check
+from hac.util_check import compare_streams, _tokens_equal, _quoted
+
+
+@pytest.fixture
+def small_sizes(monkeypatch):
+    """Returns function which sets small sizes of chunks and pieces (so that
+    tokens and batches are split in every possible way).
+    """
+    def set_sizes(chunk, piece):
+        monkeypatch.setattr(util_check, '_chunk_size', chunk)
+        monkeypatch.setattr(util_check, '_piece_size', piece)
+        monkeypatch.setattr(util_check, '_pattern_long', re.compile(
+            b'[^' + util_check._whitespace + b']{' + str(piece).encode() +
+            b'}'))
+    return set_sizes
+
+
+def naive_tokens(data, lines, piece):
+    """Returns list of tuples (token, (line, column)) of the whole file and
+    the position of its end. Long tokens are split into pieces (aligned with
+    the beginning of the token, the last piece is never a tuple).
+    """
+    def position(offset):
+        nl = data.rfind(b'\n', 0, offset)
+        return (data.count(b'\n', 0, offset) + 1,
+                offset - nl if nl >= 0 else offset + 1)
+
+    tokens = []
+    line_last = None
+    for match in re.finditer(b'[^' + util_check._whitespace + b']+', data):
+        line = data.count(b'\n', 0, match.start()) + 1
+        if lines and line_last is not None and line != line_last:
+            tokens.append((b'\n', position(match.start())))
+        line_last = line
+
+        token, start = match.group(), match.start()
+        full = len(token) // piece
+        for k in range(full):
+            tokens.append(((token[k * piece:(k + 1) * piece],),
+                           position(start + k * piece)))
+        tokens.append((token[full * piece:], position(start + full * piece)))
+    return tokens, position(len(data))
+
+
+def naive_compare(answer, output, lines, piece, ignore_case):
+    """Compares whole files (see "compare_streams").
+    """
+    ans, _ = naive_tokens(answer, lines, piece)
+    out, end = naive_tokens(output, lines, piece)
+    for k in range(max(len(ans), len(out))):
+        if k >= len(out):
+            return "line {0}, column {1}: ".format(*end) + "expected " + \
+                   _quoted(ans[k][0]) + ", found end of output"
+        where = "line {0}, column {1}: ".format(*out[k][1])
+        if k >= len(ans):
+            return where + "expected end of output, found " + \
+                   _quoted(out[k][0])
+        a, o = ans[k][0], out[k][0]
+        if _tokens_equal(a, o, ignore_case):
+            continue
+        if a == b'\n':
+            return where + "expected line break before " + _quoted(o)
+        if o == b'\n':
+            return where + "expected " + _quoted(a) + " on the same line"
+        return where + "expected " + _quoted(a) + ", found " + _quoted(o)
+    return None
+
+
+def test_compare_long_token_trailing_whitespace():
+    token = b'7' * 200000
+    assert compare_streams(BytesIO(token + b'\n'), BytesIO(token)) is None
+    assert compare_streams(BytesIO(token), BytesIO(b'  ' + token + b' ')) \
+           is None
+
+
+def test_compare_long_token_ignore_case():
+    assert compare_streams(BytesIO(b'a' * 200000), BytesIO(b'A' * 200000),
+                           ignore_case=True) is None
+    assert compare_streams(BytesIO(b'a' * 200000), BytesIO(b'A' * 200000)) \
+           == 'line 1, column 1: expected "aaaaaaaaaaaaaaaaa...", ' \
+              'found "AAAAAAAAAAAAAAAAA..."'
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_compare_random_small_sizes(small_sizes, seed):
+    rng = random.Random(seed)
+    alphabet = [b'1', b'2', b'a', b'A', b' ', b'\t', b'\r', b'\n']
+
+    def text(n):
+        return b''.join(rng.choice(alphabet) for _ in range(n))
+
+    def whitespace_changed(data):
+        return re.sub(b'[ \t\r\n]', lambda m: rng.choice(
+                          [b' ', b'  ', b'\r', b'\n', b'', m.group()]), data)
+
+    for _ in range(3000):
+        chunk, piece = rng.randint(1, 7), rng.randint(2, 7)
+        small_sizes(chunk, piece)
+        answer = text(rng.randint(0, 20))
+        output = rng.choice([answer, whitespace_changed(answer),
+                             text(rng.randint(0, 20))])
+        lines, ignore_case = rng.random() < 0.5, rng.random() < 0.3
+
+        assert compare_streams(BytesIO(answer), BytesIO(output), lines=lines,
+                               ignore_case=ignore_case) == \
+               naive_compare(answer, output, lines, piece, ignore_case), \
+               (chunk, piece, lines, ignore_case, answer, output)
@@ -0,0 +1,331 @@
+# -*- coding: utf-8 -*-
+"""Tests of the HTTP proxy (hac.util_data.RequestsCache) and of its on-disk
+store (hac.util_data.RequestsStore).
+"""
+import os
+import threading
+import time
+from email.utils import formatdate
+
+import pytest
+import requests
+
+import hac
+from conftest import PagesAdapter, pages_session
+from hac.util_data import RequestsCache, RequestsStore, _plugin_collect_index
+
+
+URL = "http://codeforces.com/contest/512"
+
+
+@pytest.fixture(autouse=True)
+def contest(pages):
+    pages.route(r"/contest/512$", b'<html>contest</html>')
+
+
+def test_expire(proxy, pages):
+    proxy.get(URL)
+    proxy.get(URL)
+    assert len(pages.requested) == 1
+
+    # Pages younger than the age are kept.
+    proxy.expire(60)
+    proxy.get(URL)
+    assert len(pages.requested) == 1
+
+    proxy._fetched[URL] -= 120
+    proxy.expire(60)
+    proxy.get(URL)
+    assert len(pages.requested) == 2
+
+    proxy.expire()
+    proxy.get(URL)
+    assert len(pages.requested) == 3
+
+
+def test_expire_failed(proxy, pages):
+    url = "http://codeforces.com/contest/513"
+    assert proxy.get(url).status_code == 404
+    proxy.expire(60)
+    proxy.get(url)
+    assert len(pages.requested) == 2
+
+
+def test_expire_parsed(proxy):
+    page, tree = proxy.get_tree(URL)
+    assert proxy.get_tree(URL)[1] is tree
+    proxy.expire()
+    assert proxy.get_tree(URL)[1] is not tree
+
+
+def test_limit_kept(proxy):
+    proxy.limit("codeforces.com", 5, 2)
+    limiter = proxy._limiter(URL)
+    proxy.limit("codeforces.com", 5, 2)
+    assert proxy._limiter(URL) is limiter
+    assert proxy._limiter("http://m.codeforces.com/") is limiter
+
+    proxy.limit("codeforces.com", 1)
+    assert proxy._limiter(URL) is not limiter
+    assert proxy._limiter(URL).burst == 1
+
+
+class OverloadedAdapter(PagesAdapter):
+    """Adapter which answers the first requests with given responses of the
+    overloaded server (pairs (status, "Retry-After" header)), then serves
+    pages as usual.
+    """
+
+    def __init__(self, overloaded):
+        super(OverloadedAdapter, self).__init__()
+        self.overloaded = list(overloaded)
+
+    def send(self, request, **kwargs):
+        if not self.overloaded:
+            return super(OverloadedAdapter, self).send(request, **kwargs)
+        self.requested.append(request.url)
+        status, retry_after = self.overloaded.pop(0)
+        response = requests.models.Response()
+        response.request = request
+        response.url = request.url
+        response.status_code = status
+        response._content = b''
+        if retry_after is not None:
+            response.headers['retry-after'] = retry_after
+        return response
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Returns list of the seconds slept (sleeping is skipped).
+    """
+    slept = []
+    monkeypatch.setattr(time, 'sleep', slept.append)
+    return slept
+
+
+def proxy_overloaded(overloaded, retries):
+    adapter = OverloadedAdapter(overloaded)
+    adapter.route(r"/contest/512$", b'<html>contest</html>')
+    return RequestsCache(session=pages_session(adapter),
+                         retries=retries), adapter
+
+
+@pytest.mark.parametrize("status", [429, 503])
+def test_retry_overloaded(sleeps, capsys, status):
+    proxy, adapter = proxy_overloaded([(status, None), (status, None)], 3)
+    page = proxy.get(URL)
+    assert (page.status_code, page.content) == (200, b'<html>contest</html>')
+    assert len(adapter.requested) == 3
+    # Exponential backoff.
+    assert sleeps == [pytest.approx(1, abs=0.1), pytest.approx(2, abs=0.1)]
+    assert 'Site is overloaded (' + str(status) + '), retrying "' + URL + \
+           '" in 1.0 seconds.' in capsys.readouterr().err
+
+
+@pytest.mark.parametrize("retry_after, backoff", [
+    ("3", 3),
+    ("0", 0),
+    ("1000", RequestsCache._backoff_max),
+    ("soon", 1),
+])
+def test_retry_after(sleeps, retry_after, backoff):
+    proxy, adapter = proxy_overloaded([(429, retry_after)], 1)
+    assert proxy.get(URL).status_code == 200
+    assert sum(sleeps) == pytest.approx(backoff, abs=0.1)
+
+
+def test_retry_after_date(sleeps):
+    date = formatdate(time.time() + 30, usegmt=True)
+    proxy, adapter = proxy_overloaded([(503, date)], 1)
+    assert proxy.get(URL).status_code == 200
+    assert sleeps == [pytest.approx(30, abs=1.5)]
+
+
+def test_retry_limit(sleeps, capsys):
+    proxy, adapter = proxy_overloaded([(429, "5")] * 4, 2)
+    page = proxy.get(URL)
+    # Gives up and returns the last response of the overloaded server.
+    assert page.status_code == 429
+    assert len(adapter.requested) == 3
+    assert len(sleeps) == 2
+    assert capsys.readouterr().err.count("Site is overloaded") == 2
+
+
+def test_retry_disabled(sleeps):
+    proxy, adapter = proxy_overloaded([(429, None)], 0)
+    assert proxy.get(URL).status_code == 429
+    assert len(adapter.requested) == 1
+    assert not sleeps
+
+
+def page_make(size):
+    page = requests.models.Response()
+    page.status_code = 200
+    page._content = b'x' * size
+    return page
+
+
+@pytest.fixture
+def store(tmpdir):
+    return RequestsStore(str(tmpdir.join("pages")), 4)
+
+
+def proxy_stored(pages, store, **kwargs):
+    """Returns HTTP proxy with the on-disk store (new proxy for each run of
+    hac, the store is shared by the runs).
+    """
+    return RequestsCache(session=pages_session(pages), store=store, **kwargs)
+
+
+def test_store_round_trip(store):
+    page = page_make(10)
+    page.encoding = 'utf-8'
+    page.headers['content-type'] = 'text/html; charset=utf-8'
+    page.headers['etag'] = '"v1"'
+    page.headers['set-cookie'] = 'session=1'
+    store.save(URL, page, fetched=1000.0)
+
+    meta, body = store.load(URL)
+    assert body == b'x' * 10
+    assert meta['url'] == URL
+    assert meta['status_code'] == 200
+    assert meta['encoding'] == 'utf-8'
+    assert meta['time'] == 1000.0
+    # Only validators and the content type are stored.
+    assert meta['headers'] == {'content-type': 'text/html; charset=utf-8',
+                               'etag': '"v1"'}
+    assert store.load("http://codeforces.com/contest/513") is None
+
+
+def test_stored_fresh(pages, store):
+    page = proxy_stored(pages, store, ttl=60).get(URL)
+    stored, source, _ = proxy_stored(pages, store, ttl=60)._fetch(URL, 60)
+    assert source == 'store'
+    assert len(pages.requested) == 1
+    assert (stored.status_code, stored.content) == (200, page.content)
+    assert stored.headers['content-type'] == page.headers['content-type']
+
+
+def test_stored_expired(pages, store):
+    # Page without validators is fetched again.
+    store.save(URL, proxy_stored(pages, store).get(URL),
+               fetched=time.time() - 120)
+    page, source, _ = proxy_stored(pages, store, ttl=60)._fetch(URL, 60)
+    assert (source, page.content) == ('miss', b'<html>contest</html>')
+    assert len(pages.requested) == 2
+    assert store.load(URL)[0]['time'] > time.time() - 60
+
+
+def test_stored_revalidated(pages, store):
+    pages.route(r"/contest/512$", b'<html>contest</html>',
+                headers={'ETag': '"v1"'})
+    proxy_stored(pages, store).get(URL)
+    fetched = store.load(URL)[0]['time']
+
+    page, source, _ = proxy_stored(pages, store)._fetch(URL, 0)
+    assert len(pages.requested) == 2
+    assert source == 'revalidated'
+    assert (page.status_code, page.content) == (200, b'<html>contest</html>')
+    assert page.headers['etag'] == '"v1"'
+    # Time of the fetch is refreshed by the revalidation.
+    assert store.load(URL)[0]['time'] >= fetched
+
+    # Modified page replaces the stored one.
+    pages.route(r"/contest/512$", b'<html>changed</html>',
+                headers={'ETag': '"v2"'})
+    page, source, _ = proxy_stored(pages, store)._fetch(URL, 0)
+    assert (source, page.content) == ('miss', b'<html>changed</html>')
+    meta, body = store.load(URL)
+    assert (meta['headers']['etag'], body) == ('"v2"', b'<html>changed</html>')
+
+
+def test_stored_revalidating(pages, store):
+    pages.route(r"/contest/512$", b'<html>contest</html>',
+                headers={'ETag': '"v1"'})
+    proxy = proxy_stored(pages, store, ttl=60)
+    proxy.get(URL)
+    proxy.get(URL)
+    assert len(pages.requested) == 1
+    with proxy.revalidating():
+        assert proxy.get(URL).content == b'<html>contest</html>'
+    assert len(pages.requested) == 2
+
+
+def test_offline_stored(pages, store):
+    proxy_stored(pages, store).get(URL)
+    # Stored pages are used no matter how old they are.
+    page = proxy_stored(pages, store, offline=True).get(URL)
+    assert (page.status_code, page.content) == (200, b'<html>contest</html>')
+    assert len(pages.requested) == 1
+
+
+def test_offline_miss(pages, store, capsys):
+    url = "http://codeforces.com/contest/513"
+    page, source, _ = proxy_stored(pages, store, offline=True)._fetch(url, 0)
+    assert (source, page.status_code, page.content) == ('offline', 504, b'')
+    assert not pages.requested
+    assert 'Page "' + url + '" not available offline!' in \
+           capsys.readouterr().err
+
+
+def test_store_prune_tracked(store, monkeypatch):
+    scans = []
+    prune = store.prune
+    monkeypatch.setattr(store, 'prune', lambda: scans.append(1) or prune())
+
+    for i in range(3):
+        store.save("http://a.org/" + str(i), page_make(1000))
+    # Store is scanned once, then its size is tracked.
+    assert len(scans) == 1
+    store.save("http://a.org/0", page_make(1000))
+    assert len(scans) == 1
+
+    store.save("http://a.org/3", page_make(1000))
+    assert len(scans) == 2
+    assert store.load("http://a.org/1") is None
+    assert store.load("http://a.org/3") is not None
+    assert store._size <= 4 * 2**10
+
+
+def test_store_concurrent_saves(store):
+    errors = []
+
+    def save(i):
+        try:
+            for _ in range(20):
+                store.save("http://a.org/", page_make(i))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=save, args=(i,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert len(store.load("http://a.org/")[1]) in range(4)
+    # No temporary files are left behind.
+    assert sorted(os.path.splitext(fname)[1]
+                  for fname in os.listdir(store.path)) == ['.body', '.json']
+
+
+def test_plugin_index_concurrent_writes(tmpdir):
+    paths = [os.path.join(hac.SETTINGS_CONST["hac_root_path"],
+                          hac.SETTINGS_CONST["config_dir"])]
+    cache_path = str(tmpdir.join("cache", "plugins.json"))
+    collected = []
+    threads = [threading.Thread(target=lambda: collected.append(
+                   _plugin_collect_index(paths, cache_path, "signature")))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # No temporary files are left behind and the index is reused.
+    assert os.listdir(str(tmpdir.join("cache"))) == ["plugins.json"]
+    langs, runners, sites = _plugin_collect_index(paths, cache_path,
+                                                  "signature")
+    assert sorted(langs) == sorted(collected[0][0])
+    assert [site.id for site in sites] == [site.id for site in collected[0][2]]
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""Tests of the measurement and stress-testing of solutions (hac.util_run).
+"""
+import os
+import sys
+import time
+
+import pytest
+
+import hac.util_run as util_run
+from hac.util_run import Verdict, _env, _measured_call, stress_run
+
+
+def test_memory_below_baseline(tmpdir):
+    _, _, _, memory, baseline, killed = \
+        _measured_call("exit 0", str(tmpdir), dict(os.environ))
+    assert memory is None
+    assert baseline > 0
+    assert not killed
+
+
+def test_memory_above_baseline(tmpdir):
+    size = 300 * 2**20
+    script = '"' + sys.executable + '" -c "b = bytearray(' + str(size) + \
+             '); b[::4096] = b\'x\' * len(b[::4096])"'
+    exit_code, _, _, memory, baseline, _ = \
+        _measured_call(script, str(tmpdir), dict(os.environ))
+    assert exit_code == 0
+    assert memory > baseline
+    assert memory >= size // 2**10
+
+
+def test_time_limit(tmpdir):
+    exit_code, wall_ms, _, _, _, killed = \
+        _measured_call("while :; do :; done", str(tmpdir), dict(os.environ),
+                       time_limit_ms=100)
+    assert killed
+    assert exit_code != 0
+    assert wall_ms < 5000
+
+
+def _program(cdir, command):
+    return {"exec_run": command + ' <"$FILE_IN" >"$FILE_MYOUT"'}, cdir, "a"
+
+
+def test_stress_seeds(tmpdir):
+    cdir = str(tmpdir)
+    results = list(stress_run(_program(cdir, "cat"), _program(cdir, "cat"),
+                              _program(cdir, "cat"), cdir, 3, seed=41))
+    assert sorted(result["seed"] for result in results) == [41, 42, 43]
+    assert all(result["verdict"] == Verdict.OK for result in results)
+
+
+def test_stress_generator_time_limit(tmpdir):
+    cdir = str(tmpdir)
+    result, = stress_run(_program(cdir, "sleep 30; cat"),
+                         _program(cdir, "cat"), _program(cdir, "cat"), cdir,
+                         1, time_limit_ms=100)
+    assert result["failed"] == "generator"
+    assert result["verdict"] == Verdict.TIME_LIMIT
+
+
+def test_env_python():
+    assert _env("A")["HAC_PYTHON"] == sys.executable
+
+
+def _alive(pid):
+    """Returns True if the process is running (zombies aren't running).
+    """
+    try:
+        with open("/proc/" + str(pid) + "/stat") as f:
+            return f.read().rsplit(")", 1)[1].split()[0] != "Z"
+    except (IOError, OSError):
+        return False
+
+
+def _pids(path):
+    with open(path) as f:
+        return [int(line) for line in f.read().split()]
+
+
+@pytest.mark.skipif(not os.path.isdir("/proc"), reason="needs /proc")
+def test_testcases_run_stopped(tmpdir):
+    cdir, pids = str(tmpdir), str(tmpdir.join("pids"))
+    for tc in ("1", "2"):
+        tmpdir.join("A." + tc + ".in").write(tc)
+        tmpdir.join("A." + tc + ".out").write(tc)
+    # Solution of the 2nd testcase runs until it's killed.
+    parts = {"exec_run": 'echo $$ >>"' + pids + '"; '
+                         'if [ "$(cat "$FILE_IN")" = 2 ]; then sleep 60; '
+                         'else sleep 0.5; fi; cp "$FILE_IN" "$FILE_MYOUT"'}
+    results = util_run.testcases_run(parts, cdir, "A", ["A.1", "A.2"], jobs=2)
+    assert next(results)["verdict"] == Verdict.OK
+    results.close()
+
+    assert len(_pids(pids)) == 2
+    time.sleep(0.2)
+    assert not any(_alive(pid) for pid in _pids(pids))
+
+
+@pytest.mark.skipif(not os.path.isdir("/proc"), reason="needs /proc")
+def test_stress_stopped(tmpdir):
+    cdir, pids = str(tmpdir), str(tmpdir.join("pids"))
+    # Solution fails on the 1st seed, on the others it runs until killed.
+    solution = ({"exec_run": 'echo $$ >>"' + pids + '"; '
+                             'if [ "$(cat "$FILE_IN")" = 1 ]; then sleep 0.5; '
+                             'echo 0 >"$FILE_MYOUT"; else sleep 60; fi'},
+                cdir, "a")
+    results = stress_run(_program(cdir, "cat"), solution,
+                         _program(cdir, "cat"), cdir, 4, jobs=2)
+    assert next(results)["verdict"] == Verdict.WRONG_ANSWER
+    results.close()
+
+    assert len(_pids(pids)) >= 2
+    time.sleep(0.2)
+    assert not any(_alive(pid) for pid in _pids(pids))
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""Tests of the build cache (hac.util_run).
+"""
+import os
+import sys
+import json
+import subprocess
+
+import pytest
+
+from hac.util_run import solution_compile
+
+
+# Compilation produces several files (like Java inner classes) and counts
+# how many times it was executed.
+PARTS = {
+    "variables": 'EXT_SRC=java\nFILE_EXEC="${TASK}.class"',
+    "exec_compile": 'cat "${TASK}.java" > "${TASK}.class"\n'
+                    'echo inner > "${TASK}\\$Inner.class"\n'
+                    'echo x >> "$COMPILED_LOG"',
+}
+
+
+@pytest.fixture
+def cdir(tmpdir, monkeypatch):
+    monkeypatch.setenv("COMPILED_LOG", str(tmpdir.join("compiled.log")))
+    tmpdir.mkdir("A").join("A.java").write("class A {}")
+    return str(tmpdir.join("A"))
+
+
+def compiled():
+    with open(os.environ["COMPILED_LOG"]) as f:
+        return len(f.readlines())
+
+
+def products_remove(cdir):
+    for fname in ["A.class", "A$Inner.class"]:
+        os.remove(os.path.join(cdir, fname))
+
+
+def test_compile_restores_all_products(cdir, tmpdir):
+    cache = str(tmpdir.join("cache"))
+    assert solution_compile(PARTS, cdir, "A", cache)
+    products_remove(cdir)
+    assert solution_compile(PARTS, cdir, "A", cache)
+    assert compiled() == 1
+    assert open(os.path.join(cdir, "A$Inner.class")).read() == "inner\n"
+    assert open(os.path.join(cdir, "A.class")).read() == "class A {}"
+
+
+def test_compile_changed_source(cdir, tmpdir):
+    cache = str(tmpdir.join("cache"))
+    assert solution_compile(PARTS, cdir, "A", cache)
+    with open(os.path.join(cdir, "A.java"), "w") as f:
+        f.write("class A { int x; }")
+    assert solution_compile(PARTS, cdir, "A", cache)
+    assert compiled() == 2
+    assert open(os.path.join(cdir, "A.class")).read() == "class A { int x; }"
+
+
+def test_cli_restore_save(cdir, tmpdir):
+    """Shell runner restores and saves builds with the same cache."""
+    cache = str(tmpdir.join("cache"))
+    recipe = os.path.join(cdir, "A.java.sh")
+    with open(recipe, "w") as f:
+        f.write("g++ ...\n")
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=root, TASK="A")
+
+    def cli(action, stdin=None):
+        proc = subprocess.Popen(
+            [sys.executable, "-m", "hac.util_run", action, cache, "exec",
+             recipe, "A.java"], cwd=cdir, env=env, stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE)
+        out = proc.communicate(stdin)[0]
+        return proc.returncode, out
+
+    ret, state = cli("restore")
+    assert ret == 1
+    key, snapshot = state.decode().splitlines()
+    assert "A.java" in json.loads(snapshot)
+
+    subprocess.check_call(["sh", "-c", PARTS["exec_compile"]], cwd=cdir,
+                          env=env)
+    assert cli("save", state)[0] == 0
+    assert sorted(os.listdir(os.path.join(cache, key))) == \
+        ["A$Inner.class", "A.class"]
+
+    products_remove(cdir)
+    assert cli("restore")[0] == 0
+    assert os.path.isfile(os.path.join(cdir, "A$Inner.class"))